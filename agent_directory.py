@@ -0,0 +1,187 @@
+import threading
+import time
+
+import metrics
+from phone_numbers import phone_key as canonical_phone_key, phone_variants
+
+
+# Process-wide, in-memory view of an agents collection
+class AgentDirectory:
+    """
+    Keeps phone number -> agent and cpId -> agent indexes for one Firestore collection.
+    The indexes are filled by the first snapshot of an on_snapshot listener and then
+    updated incrementally from its change events, so resolving an agent is a dict
+    lookup. Misses, and lookups while the listener is down and the data is older than
+    max_staleness seconds, fall back to a direct Firestore query. Phone numbers are
+    indexed by their canonical form, so "98765 43210" and "+919876543210" find the same agent.
+    """
+
+    def __init__(self, db, collection, phone_field, cpid_field="cpId", max_staleness=900,
+                 warm_timeout=30, phone_key=None):
+        self._db = db
+        self._collection = collection
+        self._phone_field = phone_field
+        self._cpid_field = cpid_field
+        self._max_staleness = max_staleness
+        self._warm_timeout = warm_timeout
+        self._phone_key = phone_key or canonical_phone_key
+        self._lock = threading.Lock()
+        self._subscribe_lock = threading.Lock()
+        self._docs = {}
+        self._by_phone = {}
+        self._by_cpid = {}
+        self._watch = None
+        self._fresh_watch = False
+        self._last_subscribe = 0
+        self._warmed = threading.Event()
+        self.last_synced = None
+        self.fallback_queries = 0
+        self.last_error = None
+
+    def _ref(self):
+        return self._db.collection(self._collection)
+
+    def _index(self, doc_id, agent):
+        self._docs[doc_id] = agent
+        phone = agent.get(self._phone_field)
+        if phone:
+            self._by_phone[self._phone_key(phone)] = agent
+        cp_id = agent.get(self._cpid_field)
+        if cp_id:
+            self._by_cpid[cp_id] = agent
+
+    def _unindex(self, doc_id):
+        agent = self._docs.pop(doc_id, None)
+        if agent is None:
+            return
+        phone = agent.get(self._phone_field)
+        if phone and self._by_phone.get(self._phone_key(phone)) is agent:
+            del self._by_phone[self._phone_key(phone)]
+        cp_id = agent.get(self._cpid_field)
+        if cp_id and self._by_cpid.get(cp_id) is agent:
+            del self._by_cpid[cp_id]
+
+    def _load(self, documents):
+        with self._lock:
+            self._docs, self._by_phone, self._by_cpid = {}, {}, {}
+            for doc in documents:
+                self._index(doc.id, doc.to_dict() or {})
+            self.last_synced = time.time()
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # The first snapshot of a (re)started listener carries the whole collection
+        if self._fresh_watch:
+            self._fresh_watch = False
+            self._load(docs)
+            self._warmed.set()
+            return
+        with self._lock:
+            for change in changes:
+                doc_id = change.document.id
+                self._unindex(doc_id)
+                if change.type.name != "REMOVED":
+                    self._index(doc_id, change.document.to_dict() or {})
+            self.last_synced = time.time()
+
+    def _subscribe(self, min_interval=0):
+        # Lookups on several threads may notice a dropped listener at once; only one resubscribes
+        with self._subscribe_lock:
+            if self._last_subscribe and time.time() - self._last_subscribe < min_interval:
+                return
+            if self._watch is not None:
+                self._watch.unsubscribe()
+            self._last_subscribe = time.time()
+            self._fresh_watch = True
+            metrics.count(f"firestore.{self._collection}.on_snapshot")
+            try:
+                self._watch = self._ref().on_snapshot(self._on_snapshot)
+            except Exception as e:
+                self._watch = None
+                self.last_error = str(e)
+
+    def start(self):
+        """Subscribe to the collection and wait for the initial snapshot."""
+        self._subscribe()
+        if not self._warmed.wait(self._warm_timeout):
+            # Listener is slow or unavailable: warm with a one-off read instead
+            metrics.count(f"firestore.{self._collection}.stream")
+            self._load(self._ref().stream())
+        return self
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    @property
+    def is_live(self):
+        return self._watch is not None and self._watch.is_active
+
+    def staleness(self):
+        """Seconds since the indexes last received data, or None if never warmed."""
+        if self.last_synced is None:
+            return None
+        return time.time() - self.last_synced
+
+    def _usable(self):
+        if self.last_synced is None:
+            return False
+        if self.is_live:
+            return True
+        # Listener dropped: resubscribe (at most every 30s) and only trust recent indexes
+        self._subscribe(min_interval=30)
+        return self.staleness() <= self._max_staleness
+
+    def _query(self, field, value):
+        self.fallback_queries += 1
+        metrics.count(f"firestore.{self._collection}.query")
+        with metrics.span(f"{self._collection}.query"):
+            if field == self._phone_field:
+                # Stored numbers are not canonical, so try the usual spellings in one query
+                query = self._ref().where(field, "in", phone_variants(value))
+            else:
+                query = self._ref().where(field, "==", value)
+            doc = next(iter(query.limit(1).stream()), None)
+        if doc is None:
+            return None
+        agent = doc.to_dict() or {}
+        with self._lock:
+            # Indexed by document ID like snapshot entries, so later changes and removals replace it;
+            # a document the listener already delivered is left as the listener has it
+            if doc.id not in self._docs:
+                self._index(doc.id, agent)
+        return agent
+
+    def find_by_phone(self, phone):
+        if not phone:
+            return None
+        if self._usable():
+            agent = self._by_phone.get(self._phone_key(phone))
+            if agent is not None:
+                return agent
+        return self._query(self._phone_field, phone)
+
+    def find_by_cpid(self, cp_id):
+        if not cp_id:
+            return None
+        if self._usable():
+            agent = self._by_cpid.get(cp_id)
+            if agent is not None:
+                return agent
+        return self._query(self._cpid_field, cp_id)
+
+    def stats(self):
+        return {
+            "agents": len(self._docs),
+            "live": self.is_live,
+            "staleness": self.staleness(),
+            "fallback_queries": self.fallback_queries,
+            "last_error": self.last_error,
+        }
+
+
+def describe_stats(stats):
+    """Short human readable summary of AgentDirectory.stats() for the UI."""
+    state = "live" if stats["live"] else "listener down"
+    age = "never synced" if stats["staleness"] is None else f"last update {stats['staleness']:.0f}s ago"
+    return f"{stats['agents']} agents · {state} · {age} · {stats['fallback_queries']} direct queries"
@@ -0,0 +1,32 @@
+import time
+
+import streamlit as st
+
+
+# Enquiry analytics page shared by the sale and rental apps
+def render_analytics(analytics, title="Enquiry Analytics", top=20):
+    import pandas as pd
+
+    st.title(title)
+    with st.spinner("Updating aggregates..."):
+        analytics.refresh()
+
+    total = analytics.total()
+    st.metric("Total enquiries", f"{total:,}")
+    if analytics.last_refreshed:
+        st.caption(f"Updated {time.strftime('%H:%M:%S', time.localtime(analytics.last_refreshed))}")
+    if not total:
+        st.info("No enquiries yet.")
+        return
+
+    for dimension in analytics.dimensions:
+        if dimension == "Day":
+            st.subheader("Enquiries per day")
+            frame = pd.DataFrame(analytics.counts(dimension), columns=["Day", "Enquiries"]).set_index("Day")
+            st.line_chart(frame)
+            continue
+        st.subheader(f"Enquiries per {dimension.lower()} (top {top})")
+        frame = pd.DataFrame(analytics.counts(dimension, top=top), columns=[dimension, "Enquiries"])
+        left, right = st.columns([2, 1])
+        left.bar_chart(frame.set_index(dimension))
+        right.dataframe(frame, use_container_width=True, hide_index=True)
@@ -0,0 +1,38 @@
+import streamlit as st
+from dotenv import load_dotenv
+
+import enq
+import enquiry_core
+import rental_app
+from service_panel import render_metrics_panel
+
+# Sale and rental trackers in one Streamlit process: both pipelines share the pooled
+# Firestore and gspread clients, the agent directories, the Sheets quota and the metrics.
+# Run with `streamlit run app.py`; enq.py and rent-enq.py still run each tracker alone.
+
+st.set_page_config(
+    page_title="Enquiry Tracker",
+    page_icon="./logo.jpg",
+)
+
+load_dotenv()
+
+# Both pipelines start building in the background as soon as any page is opened
+enquiry_core.warm_up("sale")
+enquiry_core.warm_up("rental")
+
+page = st.navigation({
+    "Sale": [
+        st.Page(enq.enquiry_page, title="Sale Enquiry", icon="🏢", url_path="sale", default=True),
+        st.Page(enq.analytics_page, title="Sale Analytics", icon="📈", url_path="sale-analytics"),
+    ],
+    "Rental": [
+        st.Page(rental_app.enquiry_page, title="Rental Enquiry", icon="🏠", url_path="rental"),
+        st.Page(rental_app.search_page, title="Rental Search", icon="🔎", url_path="rental-search"),
+        st.Page(rental_app.analytics_page, title="Rental Analytics", icon="📊", url_path="rental-analytics"),
+    ],
+})
+
+st.sidebar.markdown("[Micromarket Finder](https://micromarket-finder.onrender.com/)")
+page.run()
+render_metrics_panel()
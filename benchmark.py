@@ -0,0 +1,246 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+from agent_directory import AgentDirectory
+from enquiry_core import SALE_HEADERS, SaleEnquiryService, build_enquiry_data, build_sheet_row, get_last_enquiry_id
+from duplicate_index import DuplicateIndex
+from enquiry_counts import PropertyEnquiryIndex
+from fakes import FakeFirestore, FakeLatency, FakeWorksheet
+from id_allocator import FileLockIdAllocator
+from inventory_cache import InventoryCache
+from sheet_mirror import SheetMirror
+from write_queue import SheetWriteQueue
+
+# Offline benchmark of the sale enquiry pipeline against in-memory Firestore / Sheets fakes.
+# Each sweep grows one dimension (sheet rows, agents, properties) with the others held at
+# their first value, and reports submit latency and API calls per submit as JSON.
+
+
+def _phone(i):
+    return f"+91{9000000000 + i}"
+
+
+def build_dataset(sheet_rows, agents, properties, latency, seed=7):
+    rng = random.Random(seed)
+    db = FakeFirestore(latency)
+    db.collection("agents").load(
+        {"phonenumber": _phone(i), "cpId": f"CP{i}", "name": f"Agent {i}", "kam": f"KAM {i % 20}"}
+        for i in range(agents)
+    )
+    db.collection("ACN123").load(
+        {
+            "propertyId": f"P{i:06d}",
+            "nameOfTheProperty": f"Property {i}",
+            "cpCode": f"CP{rng.randrange(agents)}",
+            "status": "Available",
+            "dateOfStatusLastChecked": 1735689600,
+        }
+        for i in range(properties)
+    )
+    sheet = FakeWorksheet(headers=SALE_HEADERS, latency=latency)
+    sheet.load(
+        [f"EQB{1438 + i:04}", "01/Jan/2025", _phone(rng.randrange(agents)), "", "", "",
+         f"P{rng.randrange(properties):06d}", "", "", "", "", 1, "", "", ""]
+        for i in range(sheet_rows)
+    )
+    return db, sheet
+
+
+def submit_inputs(count, agents, properties, seed=11):
+    rng = random.Random(seed)
+    return [(f"p{rng.randrange(properties):06d}", str(9000000000 + rng.randrange(agents))) for _ in range(count)]
+
+
+def reset_calls(db, sheet):
+    db.calls.clear()
+    sheet.calls.clear()
+
+
+def api_calls(db, sheet):
+    calls = Counter({f"firestore.{name}": count for name, count in db.calls.items()})
+    calls.update({f"sheets.{name}": count for name, count in sheet.calls.items()})
+    return dict(sorted(calls.items()))
+
+
+# The pre-optimisation submit path: full-sheet reads, sequential queries, append_row
+def legacy_submit(db, sheet, property_id, buyer_number):
+    records = sheet.get_all_records()
+    last_enquiry_id = records[-1].get("Enquiry ID", "EQB1437") if records else "EQB1437"
+    property_id = property_id.upper()
+    buyer_number = "+91" + buyer_number
+    property_details = next((d.to_dict() for d in db.collection("ACN123").where("propertyId", "==", property_id).stream()), None)
+    if not property_details:
+        return None
+    agents_ref = db.collection("agents")
+    seller_details = next((d.to_dict() for d in agents_ref.where("cpId", "==", property_details.get("cpCode")).stream()), None)
+    buyer_details = next((d.to_dict() for d in agents_ref.where("phonenumber", "==", buyer_number).stream()), None)
+    if not buyer_details:
+        return None
+    data = build_enquiry_data(property_id, buyer_number, property_details, seller_details, buyer_details)
+    data["enquiryId"] = f"EQB{int(last_enquiry_id[3:]) + 1:04}"
+    records = sheet.get_all_records()
+    times_enquired = sum(1 for record in records if record["Property ID"] == property_id) + 1
+    sheet.append_row(build_sheet_row(data, times_enquired))
+    return data
+
+
+def build_service(db, sheet, workdir):
+    mirror = SheetMirror(sheet, "sale", SALE_HEADERS, path=os.path.join(workdir, "mirror.sqlite3"), sync_interval=0).start()
+    write_queue = SheetWriteQueue(sheet, "sale", path=os.path.join(workdir, "queue.sqlite3"), flush_interval=0.2).start()
+    id_column, property_column = SALE_HEADERS.index("Enquiry ID"), SALE_HEADERS.index("Property ID")
+    enquiry_index = PropertyEnquiryIndex(
+        mirror, reconcile_interval=0,
+        pending=lambda: [(row[id_column], row[property_column]) for row in write_queue.pending_rows()],
+    ).start()
+    return SaleEnquiryService(
+        db,
+        inventory=InventoryCache(db, "ACN123").start(),
+        agents=AgentDirectory(db, "agents", phone_field="phonenumber").start(),
+        id_allocator=FileLockIdAllocator(
+            os.path.join(workdir, "ids.json"), "EQB", seed=lambda: get_last_enquiry_id(mirror, "EQB1437")
+        ),
+        write_queue=write_queue,
+        enquiry_index=enquiry_index,
+        mirror=mirror,
+        # Repeated random pairs must go through the whole pipeline, not the duplicate check
+        duplicates=DuplicateIndex(window=0),
+    )
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def run_case(scenario, sheet_rows, agents, properties, submits, latency):
+    db, sheet = build_dataset(sheet_rows, agents, properties, latency)
+    inputs = submit_inputs(submits, agents, properties)
+    result = {"scenario": scenario, "sheet_rows": sheet_rows, "agents": agents, "properties": properties, "submits": submits}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        reset_calls(db, sheet)
+        started = time.perf_counter()
+        service = build_service(db, sheet, workdir) if scenario == "service" else None
+        result["cold_start_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        result["cold_start_api_calls"] = api_calls(db, sheet)
+
+        reset_calls(db, sheet)
+        latencies = []
+        for property_id, buyer_number in inputs:
+            started = time.perf_counter()
+            if service is None:
+                legacy_submit(db, sheet, property_id, buyer_number)
+            else:
+                service.create(property_id, buyer_number)
+            latencies.append(time.perf_counter() - started)
+        if service is not None:
+            # Background sheet writes are part of the API budget
+            service.write_queue.stop(drain=True)
+            service.agents.stop()
+            service.inventory.stop()
+        calls = api_calls(db, sheet)
+
+    result["latency"] = summarize(latencies)
+    result["api_calls"] = calls
+    result["api_calls_per_submit"] = round(sum(calls.values()) / submits, 3)
+    return result
+
+
+def case_key(result):
+    return (result["scenario"], result["sheet_rows"], result["agents"], result["properties"])
+
+
+def compare(results, baseline_path, threshold):
+    """Print p50/p95 ratios against a previous run; returns True if anything regressed."""
+    with open(baseline_path) as f:
+        baseline = {case_key(r): r for r in json.load(f)["results"]}
+    regressed = False
+    for result in results:
+        before = baseline.get(case_key(result))
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            old, new = before["latency"][metric], result["latency"][metric]
+            ratio = new / old if old else 1.0
+            flag = "REGRESSION" if ratio > threshold else "ok"
+            regressed |= ratio > threshold
+            print(f"{case_key(result)} {metric}: {old:.3f} -> {new:.3f} ({ratio:.2f}x) {flag}", file=sys.stderr)
+        if result["api_calls_per_submit"] > before["api_calls_per_submit"]:
+            regressed = True
+            print(f"{case_key(result)} api calls/submit: {before['api_calls_per_submit']} -> "
+                  f"{result['api_calls_per_submit']} REGRESSION", file=sys.stderr)
+    return regressed
+
+
+def _sizes(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark enquiry submits against in-memory Firestore/Sheets fakes")
+    parser.add_argument("--rows", type=_sizes, default=[1000, 10000, 100000], help="sheet sizes to sweep")
+    parser.add_argument("--agents", type=_sizes, default=[1000, 10000], help="agent collection sizes to sweep")
+    parser.add_argument("--properties", type=_sizes, default=[5000, 50000], help="inventory sizes to sweep")
+    parser.add_argument("--submits", type=int, default=50)
+    parser.add_argument("--scenarios", default="legacy,service")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated round trip per API call")
+    parser.add_argument("--row-latency-us", type=float, default=2.0, help="simulated transfer cost per row returned")
+    parser.add_argument("--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="latency ratio counted as a regression")
+    args = parser.parse_args()
+
+    latency = FakeLatency(per_call=args.latency_ms / 1000, per_row=args.row_latency_us / 1_000_000)
+    base_rows, base_agents, base_properties = args.rows[0], args.agents[0], args.properties[0]
+    cases = [(rows, base_agents, base_properties) for rows in args.rows]
+    cases += [(base_rows, agents, base_properties) for agents in args.agents[1:]]
+    cases += [(base_rows, base_agents, properties) for properties in args.properties[1:]]
+
+    results = []
+    for scenario in args.scenarios.split(","):
+        for sheet_rows, agents, properties in cases:
+            result = run_case(scenario, sheet_rows, agents, properties, args.submits, latency)
+            print(f"{scenario:8} rows={sheet_rows:<7} agents={agents:<6} properties={properties:<7} "
+                  f"p50={result['latency']['p50_ms']:.2f}ms calls/submit={result['api_calls_per_submit']}",
+                  file=sys.stderr)
+            results.append(result)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "latency_ms": args.latency_ms,
+            "row_latency_us": args.row_latency_us,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import csv
+import io
+import sys
+
+import lookups
+import metrics
+from enquiry_core import build_enquiry_data, get_sale_service
+from phone_numbers import canonicalize_many
+
+PROPERTY_ID_COLUMNS = ("property id", "propertyid", "property_id")
+BUYER_NUMBER_COLUMNS = ("buyer agent number", "buyer number", "buyer_agent_number", "phone", "phone number")
+
+
+# Look up each distinct value once, side by side on the shared lookup pool
+def _submit_each(lookup, values):
+    return {value: lookups.submit(lookup, value) for value in set(values) if value}
+
+
+def _collect(futures):
+    return {value: future.result() for value, future in futures.items()}
+
+
+def read_enquiry_csv(file):
+    """
+    Read (property ID, buyer agent number) pairs from a CSV file or file-like object.
+    Columns are matched by header name, falling back to the first two columns.
+    """
+    if isinstance(file, (bytes, bytearray)):
+        file = io.StringIO(file.decode("utf-8-sig"))
+    elif hasattr(file, "read") and isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding="utf-8-sig")
+    rows = list(csv.reader(file))
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    property_column = next((header.index(name) for name in PROPERTY_ID_COLUMNS if name in header), None)
+    number_column = next((header.index(name) for name in BUYER_NUMBER_COLUMNS if name in header), None)
+    if property_column is None or number_column is None:
+        property_column, number_column = 0, 1
+    else:
+        rows = rows[1:]
+    return [
+        (row[property_column].strip(), row[number_column].strip())
+        for row in rows
+        if len(row) > max(property_column, number_column) and any(cell.strip() for cell in row)
+    ]
+
+
+@metrics.timed("bulk_import")
+def run_bulk_import(service, pairs):
+    """
+    Create one sale enquiry per (property ID, buyer agent number) pair.
+    Property IDs and phone numbers are deduplicated and resolved through the service's
+    inventory cache and agent directory (so numbers match in any stored spelling, and
+    warm lookups cost no Firestore reads), IDs are reserved as one block and all rows are persisted in one call (the
+    write queue sends them with append_rows in batches). Returns a per-row report.
+    """
+    report = []
+    valid = []
+    seen = {}
+    canonical_numbers = canonicalize_many(number for _, number in pairs)
+    for row_number, ((property_id, buyer_number), canonical) in enumerate(zip(pairs, canonical_numbers), start=1):
+        entry = {
+            "Row": row_number,
+            "Property ID": property_id,
+            "Buyer Agent Number": buyer_number,
+            "Status": "failed",
+            "Enquiry ID": "",
+            "Error": "",
+        }
+        report.append(entry)
+        property_id = property_id.strip().upper()
+        if not property_id:
+            entry["Error"] = "Missing Property ID"
+            continue
+        if canonical is None:
+            entry["Error"] = "Invalid Buyer Agent Number: Invalid mobile number format"
+            continue
+        # Same pair earlier in this file, or enquired recently through any channel
+        if (canonical, property_id) in seen:
+            entry["Status"] = "duplicate"
+            entry["Error"] = f"Duplicate of row {seen[(canonical, property_id)]}"
+            continue
+        seen[(canonical, property_id)] = row_number
+        duplicate = service.duplicates.find(canonical, property_id)
+        if duplicate:
+            entry["Status"] = "duplicate"
+            entry["Enquiry ID"] = duplicate[0]
+            entry["Error"] = "Enquiry already created recently"
+            continue
+        valid.append((entry, property_id, canonical))
+
+    property_futures = _submit_each(service.inventory.get, [v[1] for v in valid])
+    buyer_futures = _submit_each(service.agents.find_by_phone, [v[2] for v in valid])
+    properties = _collect(property_futures)
+    seller_futures = _submit_each(
+        service.agents.find_by_cpid, [p.get("cpCode") for p in properties.values() if p]
+    )
+    buyers = _collect(buyer_futures)
+    sellers = _collect(seller_futures)
+
+    resolved = []
+    for entry, property_id, buyer_number in valid:
+        property_details = properties.get(property_id)
+        if not property_details:
+            entry["Error"] = "No property found for the given Property ID."
+            continue
+        buyer_details = buyers.get(buyer_number)
+        if not buyer_details:
+            entry["Error"] = "Buyer Agent details not found."
+            continue
+        seller_details = sellers.get(property_details.get("cpCode"))
+        resolved.append((entry, build_enquiry_data(property_id, buyer_number, property_details, seller_details, buyer_details)))
+
+    if not resolved:
+        return report
+
+    try:
+        enquiry_ids = service.id_allocator.reserve_ids(len(resolved))
+    except Exception as e:
+        for entry, _ in resolved:
+            entry["Error"] = f"Could not allocate an enquiry ID: {e}"
+        return report
+
+    for (entry, data), enquiry_id in zip(resolved, enquiry_ids):
+        data["enquiryId"] = enquiry_id
+    try:
+        service.persist([data for _, data in resolved])
+    except Exception as e:
+        for entry, _ in resolved:
+            entry["Error"] = f"Error saving to Google Sheet: {e}"
+        return report
+
+    for entry, data in resolved:
+        entry["Status"] = "ok"
+        entry["Enquiry ID"] = data["enquiryId"]
+    return report
+
+
+def write_report(report, file):
+    writer = csv.DictWriter(file, fieldnames=["Row", "Property ID", "Buyer Agent Number", "Status", "Enquiry ID", "Error"])
+    writer.writeheader()
+    writer.writerows(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-create sale enquiries from a CSV of Property ID, Buyer Agent Number")
+    parser.add_argument("csv_file")
+    parser.add_argument("--report", help="Write the per-row report to this CSV file (default: stdout)")
+    args = parser.parse_args()
+
+    service = get_sale_service()
+    with open(args.csv_file, newline="") as f:
+        pairs = read_enquiry_csv(f)
+    report = run_bulk_import(service, pairs)
+
+    # The report comes first: the enquiries are already persisted, so a failed flush must not lose it
+    if args.report:
+        with open(args.report, "w", newline="") as f:
+            write_report(report, f)
+    else:
+        write_report(report, sys.stdout)
+    succeeded = sum(1 for entry in report if entry["Status"] == "ok")
+    print(f"{succeeded} of {len(report)} enquiries created", file=sys.stderr)
+    try:
+        service.write_queue.stop(drain=True)
+    except Exception as e:
+        # The rows stay queued and go out with the next app or projector flush
+        print(f"Could not flush to Google Sheets: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
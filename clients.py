@@ -0,0 +1,117 @@
+import os
+import threading
+
+import metrics
+
+# Process-wide client pool shared by the Streamlit pages, the HTTP API and the CLI tools.
+# firebase_admin and gspread are imported on first use, so importing this module (and
+# rendering a page) does not pay for them.
+# Each client is built under its own lock, so opening one does not hold up the others
+_lock = threading.Lock()
+_locks = {}
+_clients = {}
+
+
+# Service account dict built from <PREFIX>_* environment variables
+def service_account_info(prefix):
+    return {
+        "type": "service_account",
+        "project_id": os.getenv(f"{prefix}_PROJECT_ID"),
+        "private_key_id": os.getenv(f"{prefix}_PRIVATE_KEY_ID"),
+        "private_key": os.getenv(f"{prefix}_PRIVATE_KEY", "").replace("\\n", "\n"),
+        "client_email": os.getenv(f"{prefix}_CLIENT_EMAIL"),
+        "client_id": os.getenv(f"{prefix}_CLIENT_ID"),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/v1/certs",
+        "client_x509_cert_url": os.getenv(f"{prefix}_CLIENT_X509_CERT_URL")
+    }
+
+
+def _pooled(name, factory):
+    with _lock:
+        lock = _locks.setdefault(name, threading.RLock())
+    with lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def get_firestore():
+    def create():
+        import firebase_admin
+        from firebase_admin import firestore
+
+        from credentials_provider import firebase_credential
+
+        with metrics.span("init_firebase"):
+            if not firebase_admin._apps:
+                # Access tokens come from the shared on-disk cache instead of a fresh exchange
+                firebase_admin.initialize_app(firebase_credential("FIREBASE"))
+            return firestore.client()
+    return _pooled("firestore", create)
+
+
+def get_gspread():
+    def create():
+        import gspread
+
+        from credentials_provider import SHEETS_SCOPES, cached_credentials
+
+        return gspread.authorize(cached_credentials("GSPREAD", SHEETS_SCOPES))
+    return _pooled("gspread", create)
+
+
+# One Sheets quota budget (token buckets, retries, read coalescing) for the whole process
+def get_sheets_limiter():
+    def create():
+        from sheets_client import SheetsRateLimiter
+        return SheetsRateLimiter()
+    return _pooled("sheets_limiter", create)
+
+
+def open_spreadsheet(open_fn, *args):
+    """Open a spreadsheet through the shared limiter; its worksheets are rate limited too."""
+    from sheets_client import RateLimitedSpreadsheet
+
+    limiter = get_sheets_limiter()
+    return RateLimitedSpreadsheet(limiter.call("read", open_fn, *args, api="open"), limiter)
+
+
+def get_sale_sheet():
+    from enquiry_core import SALE_HEADERS
+
+    @metrics.timed("init_google_sheets")
+    def create():
+        sheet = open_spreadsheet(get_gspread().open_by_key, os.getenv("GSPREAD_SHEET_ID")).sheet1
+        # Initialize the sheet if empty; only the header row is read
+        with metrics.span("sheet.row_values"):
+            header = sheet.row_values(1)
+        if not header:
+            sheet.append_row(SALE_HEADERS)
+        return sheet
+    return _pooled("sale_sheet", create)
+
+
+def get_rental_sheet():
+    from enquiry_core import RENTAL_HEADERS
+
+    @metrics.timed("init_google_sheet")
+    def create():
+        import gspread
+
+        client = get_gspread()
+        # try by key, fallback to sheet title
+        try:
+            sh = open_spreadsheet(client.open_by_key, os.getenv("RENTAL_SHEET_ID"))
+        except gspread.exceptions.SpreadsheetNotFound:
+            sh = open_spreadsheet(client.open, "Enquiry Tracking Rental")
+        try:
+            sheet = sh.worksheet("Sheet1")
+        except gspread.exceptions.WorksheetNotFound:
+            raise RuntimeError("Rename a tab exactly to 'Sheet1'")
+        if sheet.row_values(1) != RENTAL_HEADERS:
+            sheet.clear()
+            sheet.append_row(RENTAL_HEADERS)
+        return sheet
+    return _pooled("rental_sheet", create)
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_WINDOW = int(os.getenv("DUPLICATE_WINDOW_SECONDS", "600"))
+
+
+def _digest(buyer_number, property_id):
+    return hashlib.blake2b(f"{buyer_number}|{property_id}".encode("utf-8"), digest_size=8).digest()
+
+
+# Recent (buyer, property) pairs, for rejecting resubmitted enquiries
+class DuplicateIndex:
+    """
+    Maps a hash of (canonical buyer number, property ID) to the enquiry ID and time
+    of the last enquiry for that pair. find() is a dict lookup, so a resubmission is
+    caught before any Firestore or Sheets call. Entries older than `window` seconds
+    are pruned in insertion order; window=0 disables the check.
+
+    rebuild() restores the index after a restart from the rows the write path recorded
+    with their submission times (Firestore createdAt or the local queue), so the sheet
+    columns do not need to carry a time of day.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        # digest -> (enquiry_id, recorded_at), oldest first
+        self._entries = OrderedDict()
+        self.hits = 0
+
+    def _prune(self, now):
+        while self._entries:
+            digest, (_, recorded_at) = next(iter(self._entries.items()))
+            if now - recorded_at <= self.window:
+                break
+            del self._entries[digest]
+
+    def find(self, buyer_number, property_id, now=None):
+        """(enquiry_id, recorded_at) of the same pair within the window, or None."""
+        if not self.window:
+            return None
+        now = time.time() if now is None else now
+        with self._lock:
+            self._prune(now)
+            entry = self._entries.get(_digest(buyer_number, property_id))
+            if entry is None:
+                return None
+            self.hits += 1
+            return entry
+
+    def record(self, buyer_number, property_id, enquiry_id, at=None):
+        if not self.window:
+            return
+        at = time.time() if at is None else at
+        digest = _digest(buyer_number, property_id)
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._entries[digest] = (enquiry_id, at)
+
+    def rebuild(self, rows, headers, buyer_key=str, now=None):
+        """
+        Reload from (sheet row, submitted at) pairs, oldest first. `buyer_key`
+        canonicalizes the stored buyer numbers the same way new submissions are.
+        """
+        now = time.time() if now is None else now
+        buyer_column = headers.index("Buyer Agent Number")
+        property_column = headers.index("Property ID")
+        id_column = headers.index("Enquiry ID")
+        recent = [
+            (row, recorded_at) for row, recorded_at in rows
+            if now - recorded_at <= self.window and len(row) > max(buyer_column, property_column, id_column)
+        ]
+        with self._lock:
+            self._entries.clear()
+            for row, recorded_at in recent:
+                digest = _digest(buyer_key(row[buyer_column]), str(row[property_column]).strip().upper())
+                self._entries.pop(digest, None)
+                self._entries[digest] = (row[id_column], recorded_at)
+        return len(recent)
+
+    def __len__(self):
+        return len(self._entries)
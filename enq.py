@@ -1,223 +1,68 @@
-import os
-import re
+import io
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, firestore
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from datetime import datetime
 import streamlit.components.v1 as components  # For embedding HTML/JS
+from bulk_import import read_enquiry_csv, run_bulk_import, write_report
+import enquiry_core
+from analytics_page import render_analytics
+from service_panel import render_metrics_panel, render_property_finder, render_service_status
+from enquiry_core import DuplicateEnquiry, EnquiryError
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-# Initialize Firebase
+# Sale enquiry pipeline (pooled Firestore/gspread clients, caches, ID allocator, write queue)
 @st.cache_resource
-def init_firebase():
+def init_service():
     try:
-        if not firebase_admin._apps:
-            firebase_cred = credentials.Certificate({
-                "type": "service_account",
-                "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-                "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-                "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace("\\n", "\n"),
-                "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-                "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token",
-                "auth_provider_x509_cert_url": "https://www.googleapis.com/v1/certs",
-                "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL")
-            })
-            firebase_admin.initialize_app(firebase_cred)
-        return firestore.client()
+        return enquiry_core.get_sale_service()
     except Exception as e:
-        st.error(f"Error initializing Firebase: {e}")
+        st.error(f"Error initializing Firebase and Google Sheets: {e}")
         st.stop()
 
-# Initialize Google Sheets
-@st.cache_resource
-def init_google_sheets():
-    try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        google_creds = {
-            "type": "service_account",
-            "project_id": os.getenv("GSPREAD_PROJECT_ID"),
-            "private_key_id": os.getenv("GSPREAD_PRIVATE_KEY_ID"),
-            "private_key": os.getenv("GSPREAD_PRIVATE_KEY").replace("\\n", "\n"),
-            "client_email": os.getenv("GSPREAD_CLIENT_EMAIL"),
-            "client_id": os.getenv("GSPREAD_CLIENT_ID"),
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "auth_provider_x509_cert_url": "https://www.googleapis.com/v1/certs",
-            "client_x509_cert_url": os.getenv("GSPREAD_CLIENT_X509_CERT_URL")
-        }
-        client = gspread.service_account_from_dict(google_creds)
-        sheet = client.open_by_key(os.getenv("GSPREAD_SHEET_ID")).sheet1
-
-        # Initialize the sheet if empty
-        if not sheet.get_all_records():
-            sheet.append_row([
-                "Enquiry ID", "Added", "Buyer Agent Number", "CP_ID", "Buyer Agent Name", "Buyer Agent KAM",
-                "Property ID", "Property Name", "Seller Agent Number", "Seller Agent Name", "Seller Agent KAM",
-                "# Times Property ID Enquired", "Date of Status Last Checked for the Inventory Enquired", 
-                "Last Modified", "Status"
-            ])
-        return sheet
-    except Exception as e:
-        st.error(f"Error initializing Google Sheets: {e}")
-        st.stop()
-
-# Normalize mobile number
-def normalize_mobile_number(number):
-    """
-    Normalize a mobile number by ensuring it starts with '+91' and removing unwanted characters.
-    If exactly 10 digits are present (even if they start with 91), the number is prefixed with +91.
-    """
-    # Remove all non-digit characters
-    cleaned_number = re.sub(r"[^\d]", "", number)
-    
-    # If the cleaned number has exactly 10 digits, add the +91 prefix
-    if len(cleaned_number) == 10:
-        return f"+91{cleaned_number}"
-    # If it already starts with 91 and has 12 digits, just add '+' in front
-    elif len(cleaned_number) == 12 and cleaned_number.startswith("91"):
-        return f"+{cleaned_number}"
-    else:
-        raise ValueError("Invalid mobile number format")
-
 # Save data to Google Sheet (Batch Processing)
-def batch_save_to_google_sheet(sheet, data_list):
+# Rows go to the durable write queue; its flusher sends them with append_rows
+def batch_save_to_google_sheet(service, data_list):
     try:
-        # Fetch existing data to calculate times property enquired
-        records = sheet.get_all_records()
-
-        for data in data_list:
-            property_id = data.get("propertyId", "")
-            # Calculate times property ID enquired
-            times_enquired = sum(1 for record in records if record["Property ID"] == property_id) + 1
-
-            # Append the row with updated data
-            sheet.append_row([
-                data.get("enquiryId", ""),
-                data.get("added", ""),
-                data.get("buyerAgentNumber", ""),
-                data.get("cpId", ""),
-                data.get("buyerAgentName", ""),
-                data.get("buyerAgentKAM", ""),
-                data.get("propertyId", ""),
-                data.get("propertyName", ""),
-                data.get("sellerAgentNumber", ""),
-                data.get("sellerAgentName", ""),
-                data.get("sellerAgentKAM", ""),
-                times_enquired,  # Dynamically calculated
-                data.get("dateOfStatusLastChecked", ""),
-                data.get("lastModified", ""),
-                data.get("status", "")
-            ])
+        service.persist(data_list)
+        return True
     except Exception as e:
         st.error(f"Error saving to Google Sheet: {e}")
+        return False
 
-# Fetch the last enquiry ID dynamically from Google Sheets
-def get_last_enquiry_id(sheet):
+# Fetch property, seller and buyer details from Firebase
+# Resolved documents are cached by the service's lookup cache; the enquiry ID is assigned afterwards
+def fetch_data_and_save(service, property_id, buyer_agent_number):
     try:
-        records = sheet.get_all_records()
-        if not records:
-            return "EQB1437"  # Default starting ID
-        last_row = records[-1]
-        return last_row.get("Enquiry ID", "EQB1437")
-    except Exception as e:
-        st.error(f"Error fetching the last enquiry ID: {e}")
-        return "EQB1437"  # Fallback in case of error
-
-# Fetch data from Firebase and save to Google Sheets
-@st.cache_data(ttl=600)
-def fetch_data_and_save(_db, property_id, buyer_agent_number, last_enquiry_id):
-    try:
-        property_id = property_id.upper()
-
-        # Normalize the buyer agent number
-        try:
-            buyer_agent_number = normalize_mobile_number(buyer_agent_number)
-        except ValueError as e:
-            st.error(f"Invalid Buyer Agent Number: {e}")
-            return None
-
-        # Fetch property details
-        inventories_ref = _db.collection("ACN123")
-        inventory_query = inventories_ref.where("propertyId", "==", property_id).stream()
-        property_details = next((doc.to_dict() for doc in inventory_query), None)
-
-        if not property_details:
-            st.error("No property found for the given Property ID.")
-            return None
-
-        # Extract details
-        property_name = property_details.get("nameOfTheProperty", "Unknown")  # Use correct key for property name
-        unix_timestamp = property_details.get("dateOfStatusLastChecked")
-        date_of_status_last_checked = datetime.fromtimestamp(unix_timestamp).strftime('%Y-%m-%d') if unix_timestamp else "Unknown"
-
-        # Fetch seller agent details
-        cp_id = property_details.get("cpCode")
-        agents_ref = _db.collection("agents")
-        seller_query = agents_ref.where("cpId", "==", cp_id).stream()
-        seller_details = next((doc.to_dict() for doc in seller_query), None)
-
-        # Fetch buyer agent details
-        buyer_query = agents_ref.where("phonenumber", "==", buyer_agent_number).stream()
-        buyer_details = next((doc.to_dict() for doc in buyer_query), None)
-        
-        # Prevent enquiry if buyer agent details are not found
-        if not buyer_details:
-            st.error("Buyer Agent details not found. Enquiry cannot proceed.")
-            return None
-
-        # Generate next enquiry ID
-        prefix = last_enquiry_id[:3]
-        numeric_part = int(last_enquiry_id[3:]) + 1
-        new_enquiry_id = f"{prefix}{numeric_part:04}"
-
-        # Prepare enquiry data
-        enquiry_data = {
-            "enquiryId": new_enquiry_id,
-            "added": datetime.now().strftime('%d/%b/%Y'),  # Format: 26/Jan/2025
-            "buyerAgentNumber": buyer_agent_number,
-            "cpId": buyer_details.get("cpId", "Unknown"),
-            "buyerAgentName": buyer_details.get("name", "Unknown"),
-            "buyerAgentKAM": buyer_details.get("kam", "Unknown"),
-            "propertyId": property_id,
-            "propertyName": property_name,
-            "sellerAgentNumber": seller_details.get("phonenumber", "Unknown") if seller_details else "Unknown",
-            "sellerAgentName": seller_details.get("name", "Unknown") if seller_details else "Unknown",
-            "sellerAgentKAM": seller_details.get("kam", "Unknown") if seller_details else "Unknown",
-            "timesEnquired": 1,  # Initial value; calculated dynamically in batch_save_to_google_sheet
-            "dateOfStatusLastChecked": date_of_status_last_checked,
-            "lastModified": datetime.now().strftime('%Y-%m-%d'),
-            "status": property_details.get("status", "Unknown")
-        }
-
-        return enquiry_data
-
+        return service.lookup(property_id, buyer_agent_number)
+    except DuplicateEnquiry as e:
+        st.warning(str(e))
+        return None
+    except EnquiryError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Error fetching and saving data: {e}")
         return None
 
-# Streamlit app
-def main():
-    st.sidebar.title("Navigation")
-    st.sidebar.markdown("[Micromarket Finder](https://micromarket-finder.onrender.com/)")
-    st.title("Property Enquiry System")
+# Sale analytics page
+def analytics_page():
+    enquiry_core.warm_up("sale")
+    render_analytics(init_service().analytics, "Sale Enquiry Analytics")
 
-    # Initialize Firebase and Google Sheets
-    db = init_firebase()
-    sheet = init_google_sheets()
+# Sale enquiry page (also served by app.py)
+def enquiry_page():
+    # Connect to Firebase and Google Sheets in the background; the form renders meanwhile
+    enquiry_core.warm_up("sale")
 
-    # Get the last enquiry ID
-    last_enquiry_id = get_last_enquiry_id(sheet)
+    st.title("Property Enquiry System")
+
+    # Picking a suggestion fills in the form's Property ID
+    render_property_finder("sale", "sale_property_id")
 
     # Form for input
     with st.form("enquiry_form"):
-        property_id = st.text_input("Property ID", placeholder="Enter the Property ID")
+        property_id = st.text_input("Property ID", placeholder="Enter the Property ID", key="sale_property_id")
         buyer_agent_number = st.text_input("Buyer Agent Number", placeholder="Enter the Buyer's Phone Number")
         submitted = st.form_submit_button("Submit")
 
@@ -227,12 +72,20 @@ def main():
             st.error("Please fill in all required fields.")
         else:
             with st.spinner("Fetching data..."):
-                enquiry_data = fetch_data_and_save(db, property_id, buyer_agent_number, last_enquiry_id)
+                service = init_service()
+                enquiry_data = fetch_data_and_save(service, property_id, buyer_agent_number)
                 if enquiry_data:
-                    # Save to Google Sheet in batch
-                    batch_save_to_google_sheet(sheet, [enquiry_data])
+                    try:
+                        enquiry_data["enquiryId"] = service.id_allocator.next_id()
+                    except Exception as e:
+                        st.error(f"Error allocating an enquiry ID: {e}")
+                        st.stop()
+
+                    # Queue for Google Sheet; the row is durable once this returns
+                    if not batch_save_to_google_sheet(service, [enquiry_data]):
+                        st.stop()
 
-                    st.success("Enquiry data saved successfully!")
+                    st.success(f"Enquiry {enquiry_data['enquiryId']} saved successfully!")
 
                     # Display fetched details
                     st.subheader("Fetched Details")
@@ -259,11 +112,46 @@ def main():
                         </button>
                     """, height=150)
 
+    # Bulk import from CSV
+    with st.expander("Bulk Import (CSV)"):
+        st.caption("Upload a CSV with `Property ID` and `Buyer Agent Number` columns.")
+        uploaded = st.file_uploader("Enquiries CSV", type="csv")
+        if uploaded is not None and st.button("Import Enquiries"):
+            with st.spinner("Importing enquiries..."):
+                report = run_bulk_import(init_service(), read_enquiry_csv(uploaded))
+            succeeded = sum(1 for entry in report if entry["Status"] == "ok")
+            st.success(f"{succeeded} of {len(report)} enquiries created.")
+            st.dataframe(report, use_container_width=True)
+            report_csv = io.StringIO()
+            write_report(report, report_csv)
+            st.download_button("Download Report", report_csv.getvalue(), file_name="bulk-import-report.csv", mime="text/csv")
+
+    # Enquiry history, answered from the local mirror of the sheet
+    with st.expander("Enquiry History"):
+        query = st.text_input("Property ID, Buyer Agent Number or Enquiry ID", key="history_query")
+        if query:
+            matches = init_service().mirror.search(query)
+            st.caption(f"{len(matches)} matching enquiries")
+            st.dataframe(matches, use_container_width=True)
+
+    render_service_status("sale")
+
     st.markdown("### View Enquiry Sheet")
     st.markdown(
         "[Open Google Sheet](https://docs.google.com/spreadsheets/d/1mt-Uj3CvVgLsEBibwv34wwhbcoMjI0Co_ReownIYjSA/edit?gid=0) ",
         unsafe_allow_html=True
     )
 
+# Streamlit app (sale tracker on its own)
+def main():
+    st.sidebar.title("Navigation")
+    st.sidebar.markdown("[Micromarket Finder](https://micromarket-finder.onrender.com/)")
+    page = st.sidebar.radio("Page", ["Enquiry", "Analytics"], label_visibility="collapsed")
+    if page == "Analytics":
+        analytics_page()
+    else:
+        enquiry_page()
+    render_metrics_panel()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Dimension name -> sheet header, per enquiry sheet
+SALE_DIMENSIONS = {
+    "Property": "Property ID",
+    "Buyer KAM": "Buyer Agent KAM",
+    "Seller KAM": "Seller Agent KAM",
+    "Day": "Added",
+}
+
+RENTAL_DIMENSIONS = {
+    "Property": "Property ID",
+    "Micromarket": "Micromarket",
+    "Configuration": "Configuration",
+    "Day": "Added",
+}
+
+# The 'Added' column is written as 26/Jan/2025
+ADDED_FORMAT = "%d/%b/%Y"
+
+
+def _day(value):
+    try:
+        return datetime.strptime(str(value).strip(), ADDED_FORMAT).strftime("%Y-%m-%d")
+    except ValueError:
+        return "Unknown"
+
+
+def _label(value):
+    return str(value).strip() or "Unknown"
+
+
+# Enquiry counts per dimension, kept current from a SheetMirror
+class EnquiryAnalytics:
+    """
+    Counters of enquiries per property, KAM, micromarket, configuration and day.
+    The first refresh() builds them column-wise with pandas from the mirror; later
+    refreshes only fold in the rows mirrored since (plain Counter updates), and a full
+    rebuild happens again only when the mirror repaired existing rows. Rows still in
+    the write queue are overlaid at read time, so a new enquiry shows up at once;
+    those already folded in from the mirror are skipped by Enquiry ID.
+    """
+
+    def __init__(self, mirror, dimensions, pending=None, min_sync_interval=15):
+        self._mirror = mirror
+        self._dimensions = dict(dimensions)
+        # Optional callable returning rows accepted but not yet written to the sheet
+        self._pending = pending
+        self._min_sync_interval = min_sync_interval
+        self._lock = threading.Lock()
+        self._counts = {name: Counter() for name in self._dimensions}
+        self._total = 0
+        self._watermark = None
+        self._generation = None
+        self.last_refreshed = None
+        self.last_rebuild_seconds = None
+
+    def _columns(self):
+        headers = self._mirror.headers
+        return {name: headers.index(header) for name, header in self._dimensions.items() if header in headers}
+
+    def _rebuild(self):
+        import pandas as pd
+
+        started = time.perf_counter()
+        generation = self._mirror.generation
+        row_numbers, columns = self._mirror.read_columns(set(self._dimensions.values()))
+        counts = {}
+        for name, header in self._dimensions.items():
+            if header not in columns:
+                counts[name] = Counter()
+                continue
+            column = pd.Series(columns[header], dtype=object).fillna("").astype(str).str.strip()
+            if header == "Added":
+                column = pd.to_datetime(column, format=ADDED_FORMAT, errors="coerce").dt.strftime("%Y-%m-%d")
+            column = column.fillna("Unknown").replace("", "Unknown")
+            counts[name] = Counter(column.value_counts().to_dict())
+        self._counts = counts
+        self._total = len(row_numbers)
+        self._watermark = row_numbers[-1] if row_numbers else 1
+        self._generation = generation
+        self.last_rebuild_seconds = time.perf_counter() - started
+
+    def _value(self, name, index, row):
+        value = row[index] if index < len(row) else ""
+        return _day(value) if self._dimensions[name] == "Added" else _label(value)
+
+    def _add(self, counts, row):
+        for name, index in self._columns().items():
+            counts[name][self._value(name, index, row)] += 1
+
+    def refresh(self):
+        """Catch up with the mirror: a pandas rebuild the first time, row deltas afterwards."""
+        synced = self._mirror.last_synced
+        if synced is None or time.time() - synced > self._min_sync_interval:
+            self._mirror.sync()
+        with self._lock:
+            if self._watermark is None or self._generation != self._mirror.generation:
+                self._rebuild()
+            else:
+                new_rows = self._mirror.rows_after(self._watermark)
+                for _, row in new_rows:
+                    self._add(self._counts, row)
+                self._total += len(new_rows)
+                if new_rows:
+                    self._watermark = new_rows[-1][0]
+            self.last_refreshed = time.time()
+
+    def _pending_rows(self):
+        rows = list(self._pending()) if self._pending is not None else []
+        headers = self._mirror.headers
+        if not rows or "Enquiry ID" not in headers:
+            return rows
+        with self._lock:
+            watermark = self._watermark
+        if watermark is None:
+            return rows
+        # A row can reach the sheet (and the counts) before the write path stops reporting it
+        id_index = headers.index("Enquiry ID")
+        counted = self._mirror.mirrored_enquiry_ids(
+            [row[id_index] for row in rows if id_index < len(row)], up_to_row=watermark
+        )
+        return [row for row in rows if id_index >= len(row) or row[id_index] not in counted]
+
+    def total(self):
+        with self._lock:
+            total = self._total
+        return total + len(self._pending_rows())
+
+    def counts(self, dimension, top=None):
+        """(value, count) pairs, busiest first; 'Day' is returned in date order instead."""
+        with self._lock:
+            counter = Counter(self._counts[dimension])
+        index = self._columns().get(dimension)
+        if index is not None:
+            for row in self._pending_rows():
+                counter[self._value(dimension, index, row)] += 1
+        if self._dimensions[dimension] == "Added":
+            return sorted(counter.items())
+        return counter.most_common(top)
+
+    @property
+    def dimensions(self):
+        return list(self._dimensions)
@@ -0,0 +1,179 @@
+import argparse
+import hmac
+import json
+import os
+import shutil
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from dotenv import load_dotenv
+
+import enquiry_core
+import metrics
+from enquiry_core import EnquiryError
+from enquiry_export import EXPORT_FORMATS, SHEETS, csv_blocks, iter_export_chunks, write_parquet
+
+SERVICES = {
+    "sale": enquiry_core.get_sale_service,
+    "rental": enquiry_core.get_rental_service,
+}
+
+
+# JSON endpoint over the enquiry core, for the WhatsApp bot and other integrations
+class EnquiryRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /enquiries/sale and POST /enquiries/rental with
+    {"propertyId": "...", "buyerAgentNumber": "..."} create an enquiry and return it.
+    GET /health reports write queue status and GET /metrics serves stage latencies and
+    API call counts in Prometheus text format. GET /exports/sale.csv (or rental,
+    .parquet) streams filtered enquiries, e.g. ?from=2025-01-01&to=2025-01-31&kam=Asha;
+    repeat a filter for several values. Set ENQUIRY_API_KEY to require an
+    X-API-Key header; exports are refused until it is set. Every request reuses the process-wide pooled clients.
+    """
+
+    server_version = "EnquiryAPI/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        api_key = os.getenv("ENQUIRY_API_KEY")
+        if not api_key:
+            return True
+        return hmac.compare_digest(self.headers.get("X-API-Key", ""), api_key)
+
+    def _send_text(self, status, text):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_export(self, name, query):
+        kind, _, fmt = name.partition(".")
+        if kind not in SHEETS or fmt not in EXPORT_FORMATS:
+            return self._send_json(404, {"error": "Not found"})
+        filters = parse_qs(query)
+        start, end = filters.pop("from", [None])[0], filters.pop("to", [None])[0]
+        try:
+            mirror = SERVICES[kind]().mirror
+        except Exception as e:
+            return self._send_json(503, {"error": f"Enquiry service unavailable: {e}"})
+        try:
+            chunks = iter_export_chunks(mirror, kind, start=start, end=end, filters=filters)
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+        try:
+            mirror.sync()
+        except Exception as e:
+            # Quota or network trouble reaching the sheet; nothing has been sent yet
+            return self._send_json(503, {"error": f"Could not sync the enquiry sheet: {e}"})
+        headers = SHEETS[kind][0]
+        with metrics.span("api.export"):
+            if fmt == "csv":
+                # No Content-Length: the body is streamed chunk by chunk and ends when the connection closes
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv; charset=utf-8")
+                self.send_header("Content-Disposition", f'attachment; filename="{kind}-enquiries.csv"')
+                self.end_headers()
+                for block in csv_blocks(chunks, headers):
+                    self.wfile.write(block.encode("utf-8"))
+                return
+            # Parquet needs its footer written last, so it is spooled to disk first
+            with tempfile.TemporaryFile() as f:
+                write_parquet(chunks, headers, f)
+                size = f.tell()
+                f.seek(0)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/vnd.apache.parquet")
+                self.send_header("Content-Disposition", f'attachment; filename="{kind}-enquiries.parquet"')
+                self.send_header("Content-Length", str(size))
+                self.end_headers()
+                shutil.copyfileobj(f, self.wfile)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith("/exports/"):
+            # Exports hand out every enquiry, so they are never served without a key
+            if not os.getenv("ENQUIRY_API_KEY"):
+                return self._send_json(403, {"error": "Exports are disabled until ENQUIRY_API_KEY is set"})
+            if not self._authorized():
+                return self._send_json(401, {"error": "Invalid API key"})
+            return self._send_export(url.path[len("/exports/"):], url.query)
+        if self.path.rstrip("/") == "/metrics":
+            return self._send_text(200, metrics.prometheus_text())
+        if self.path.rstrip("/") != "/health":
+            return self._send_json(404, {"error": "Not found"})
+        queues = {
+            kind: service.write_queue.status()
+            for kind, service in enquiry_core.active_services().items()
+        }
+        self._send_json(200, {"status": "ok", "queues": queues})
+
+    def do_POST(self):
+        if not self._authorized():
+            return self._send_json(401, {"error": "Invalid API key"})
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "enquiries" or parts[1] not in SERVICES:
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            return self._send_json(400, {"error": "Request body must be JSON"})
+        if not isinstance(payload, dict):
+            return self._send_json(400, {"error": "Request body must be a JSON object"})
+
+        property_id = str(payload.get("propertyId", "")).strip()
+        buyer_agent_number = str(payload.get("buyerAgentNumber", "")).strip()
+        if not property_id or not buyer_agent_number:
+            return self._send_json(400, {"error": "propertyId and buyerAgentNumber are required"})
+
+        try:
+            with metrics.span(f"api.{parts[1]}"):
+                enquiry = SERVICES[parts[1]]().create(property_id, buyer_agent_number)
+        except EnquiryError as e:
+            payload = {"error": str(e)}
+            if getattr(e, "enquiry_id", None):
+                payload["enquiryId"] = e.enquiry_id
+            if getattr(e, "suggestions", None):
+                payload["suggestions"] = e.suggestions
+            return self._send_json(e.status, payload)
+        except Exception as e:
+            return self._send_json(500, {"error": f"Error creating enquiry: {e}"})
+        self._send_json(201, enquiry)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="HTTP JSON endpoint for creating enquiries")
+    parser.add_argument("--host", default=os.getenv("ENQUIRY_API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("ENQUIRY_API_PORT", "8080")))
+    args = parser.parse_args()
+
+    # Build clients and caches while the server starts accepting connections
+    for kind in SERVICES:
+        enquiry_core.warm_up(kind)
+    server = ThreadingHTTPServer((args.host, args.port), EnquiryRequestHandler)
+    server.daemon_threads = True
+    print(f"Enquiry API listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        # Flush queued rows before exiting
+        for service in enquiry_core.active_services().values():
+            service.write_queue.stop(drain=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+import re
+import threading
+import time
+from datetime import datetime
+
+import clients
+import lookups
+import metrics
+from agent_directory import AgentDirectory
+from enquiry_analytics import RENTAL_DIMENSIONS, SALE_DIMENSIONS, EnquiryAnalytics
+from duplicate_index import DuplicateIndex
+from enquiry_counts import PropertyEnquiryIndex
+from enquiry_store import make_write_queue
+from id_allocator import make_id_allocator
+from inventory_cache import InventoryCache
+from lookup_cache import LookupCache
+from phone_numbers import canonical_phone, phone_key
+from property_suggest import PropertySuggestIndex
+from rental_search import RentalSearchIndex
+from sheet_mirror import SheetMirror
+from sheet_shards import make_sharded_worksheet
+
+SALE_HEADERS = [
+    "Enquiry ID", "Added", "Buyer Agent Number", "CP_ID", "Buyer Agent Name", "Buyer Agent KAM",
+    "Property ID", "Property Name", "Seller Agent Number", "Seller Agent Name", "Seller Agent KAM",
+    "# Times Property ID Enquired", "Date of Status Last Checked for the Inventory Enquired",
+    "Last Modified", "Status"
+]
+
+RENTAL_HEADERS = [
+    "Enquiry ID", "Added", "Buyer Agent Number", "Buyer Agent CPID",
+    "Buyer Agent Name", "Property ID", "Property Name", "Property Type",
+    "Rent Per Month in Lakhs", "Configuration", "Micromarket",
+    "Seller Agent Name", "Seller Agent Number", "Seller Agent CPID",
+    "Date of Status Last Checked"
+]
+
+# Column and formats holding the enquiry date, per sheet
+SALE_TIME_COLUMN = ("Last Modified", ["%Y-%m-%d"])
+RENTAL_TIME_COLUMN = ("Added", ["%d/%b/%Y"])
+
+
+# Errors raised by the enquiry pipeline; status is the matching HTTP status code
+class EnquiryError(Exception):
+    status = 400
+
+
+class InvalidPhoneNumber(EnquiryError):
+    status = 400
+
+
+class PropertyNotFound(EnquiryError):
+    status = 404
+
+    def __init__(self, message, suggestions=()):
+        if suggestions:
+            message = f"{message} Did you mean {', '.join(suggestions)}?"
+        super().__init__(message)
+        self.suggestions = list(suggestions)
+
+
+class AgentNotFound(EnquiryError):
+    status = 404
+
+
+class DuplicateEnquiry(EnquiryError):
+    status = 409
+
+    def __init__(self, enquiry_id, recorded_at):
+        minutes = max(0, int((datetime.now().timestamp() - recorded_at) // 60))
+        super().__init__(
+            f"Duplicate enquiry: {enquiry_id} was created for this buyer and property {minutes} minute(s) ago."
+        )
+        self.enquiry_id = enquiry_id
+        self.recorded_at = recorded_at
+
+
+# Normalize mobile number
+def normalize_mobile_number(number):
+    """
+    Canonical +91XXXXXXXXXX form of a buyer number (see phone_numbers.canonical_phone).
+    Raises ValueError if the number has no canonical form.
+    """
+    canonical = canonical_phone(number)
+    if canonical is None:
+        raise ValueError("Invalid mobile number format")
+    return canonical
+
+
+# Rental buyer numbers are cleaned more leniently than sale ones: unparseable input is passed through
+def normalize_rental_number(number):
+    return canonical_phone(number) or re.sub(r"[^\d+]", "", str(number).strip())
+
+
+def format_timestamp(ts):
+    # ts might be a UNIX‑timestamp (int/float), a string number,
+    # a Python datetime, or something else.
+    if not ts:
+        return "Unknown"
+    # 1) If it’s already a datetime:
+    if hasattr(ts, "strftime"):
+        return ts.strftime('%d/%b/%Y')
+    # 2) If it’s a string that represents a number:
+    try:
+        ts_val = float(ts)
+    except (TypeError, ValueError):
+        return "Unknown"
+    # 3) Now it’s a float or int:
+    try:
+        return datetime.fromtimestamp(ts_val).strftime('%d/%b/%Y')
+    except Exception:
+        return "Unknown"
+
+
+# Sale sheet format of an inventory dateOfStatusLastChecked (a UNIX timestamp)
+def format_status_date(unix_timestamp):
+    return datetime.fromtimestamp(unix_timestamp).strftime('%Y-%m-%d') if unix_timestamp else "Unknown"
+
+
+# Sheet row for an enquiry, in SALE_HEADERS order
+def build_sheet_row(data, times_enquired):
+    return [
+        data.get("enquiryId", ""),
+        data.get("added", ""),
+        data.get("buyerAgentNumber", ""),
+        data.get("cpId", ""),
+        data.get("buyerAgentName", ""),
+        data.get("buyerAgentKAM", ""),
+        data.get("propertyId", ""),
+        data.get("propertyName", ""),
+        data.get("sellerAgentNumber", ""),
+        data.get("sellerAgentName", ""),
+        data.get("sellerAgentKAM", ""),
+        times_enquired,  # Dynamically calculated
+        data.get("dateOfStatusLastChecked", ""),
+        data.get("lastModified", ""),
+        data.get("status", "")
+    ]
+
+
+# Build the enquiry dict from the resolved property, seller and buyer documents
+def build_enquiry_data(property_id, buyer_agent_number, property_details, seller_details, buyer_details):
+    # Extract details
+    property_name = property_details.get("nameOfTheProperty", "Unknown")  # Use correct key for property name
+    date_of_status_last_checked = format_status_date(property_details.get("dateOfStatusLastChecked"))
+
+    # Prepare enquiry data
+    enquiry_data = {
+        "enquiryId": None,  # Assigned by the ID allocator once the lookup succeeds
+        "added": datetime.now().strftime('%d/%b/%Y'),  # Format: 26/Jan/2025
+        "buyerAgentNumber": buyer_agent_number,
+        "cpId": buyer_details.get("cpId", "Unknown"),
+        "buyerAgentName": buyer_details.get("name", "Unknown"),
+        "buyerAgentKAM": buyer_details.get("kam", "Unknown"),
+        "propertyId": property_id,
+        "propertyName": property_name,
+        "sellerAgentNumber": seller_details.get("phonenumber", "Unknown") if seller_details else "Unknown",
+        "sellerAgentName": seller_details.get("name", "Unknown") if seller_details else "Unknown",
+        "sellerAgentKAM": seller_details.get("kam", "Unknown") if seller_details else "Unknown",
+        "timesEnquired": 1,  # Initial value; taken from the enquiry index when persisted
+        "dateOfStatusLastChecked": date_of_status_last_checked,
+        "lastModified": datetime.now().strftime('%Y-%m-%d'),
+        "status": property_details.get("status", "Unknown")
+    }
+
+    return enquiry_data
+
+
+# Build the rental enquiry dict (keys are RENTAL_HEADERS, in sheet order)
+def build_rental_enquiry(buyer_agent_number, rental_details, seller_details, buyer_details):
+    return {
+        "Enquiry ID": None,  # filled in by the ID allocator
+        "Added": datetime.now().strftime('%d/%b/%Y'),
+        "Buyer Agent Number": buyer_agent_number,
+        "Buyer Agent CPID": buyer_details.get("cpId", "Unknown"),
+        "Buyer Agent Name": buyer_details.get("name", "Unknown"),
+        "Property ID": rental_details.get("propertyId", "Unknown"),
+        "Property Name": rental_details.get("propertyName", "Unknown"),
+        "Property Type": rental_details.get("propertyType", "Unknown"),
+        "Rent Per Month in Lakhs": rental_details.get("rentPerMonthInLakhs", "Unknown"),
+        "Configuration": rental_details.get("configuration", "Unknown"),
+        "Micromarket": rental_details.get("micromarket", "Unknown"),
+        "Seller Agent Name": rental_details.get("agentName", "Unknown"),
+        "Seller Agent Number": rental_details.get("agentNumber", "Unknown"),
+        "Seller Agent CPID": seller_details.get("cpId", "Unknown"),
+        "Date of Status Last Checked": format_timestamp(rental_details.get("dateOfStatusLastChecked"))
+    }
+
+
+# Last enquiry ID in the sheet (only the Enquiry ID column is read); `sheet` may be a SheetMirror
+# Used once, to seed an enquiry ID counter when it does not exist yet
+@metrics.timed("get_last_enquiry_id")
+def get_last_enquiry_id(sheet, default):
+    enquiry_ids = [value for value in sheet.col_values(1)[1:] if value]
+    return enquiry_ids[-1] if enquiry_ids else default
+
+
+# "Did you mean" Property IDs for a PropertyNotFound, when there is a suggest index
+def close_matches(properties, property_id):
+    if properties is None or not properties.ready:
+        return []
+    return properties.close_matches(property_id)
+
+
+# Raise PropertyNotFound for an ID the suggest index does not know, without a Firestore query.
+# The index is only trusted while it holds the whole collection and the listener keeps it current.
+def check_property_exists(properties, inventory, property_id, message):
+    if properties is None or not properties.ready or not inventory.is_live or properties.exists(property_id):
+        return
+    metrics.count("property_suggest.rejected")
+    raise PropertyNotFound(message, suggestions=close_matches(properties, property_id))
+
+
+# Lookup -> ID allocation -> persist pipeline for sale enquiries
+class SaleEnquiryService:
+    def __init__(self, db, inventory, agents, id_allocator, write_queue, enquiry_index, lookup_cache=None,
+                 mirror=None, analytics=None, duplicates=None, properties=None):
+        self.db = db
+        self.inventory = inventory
+        # Property ID / name type-ahead over the inventory (optional)
+        self.properties = properties
+        self.agents = agents
+        self.id_allocator = id_allocator
+        self.write_queue = write_queue
+        self.enquiry_index = enquiry_index
+        # Local SQLite copy of the sheet for history queries, and aggregates over it (optional)
+        self.mirror = mirror
+        self.analytics = analytics
+        self.duplicates = duplicates or DuplicateIndex()
+        self.lookup_cache = lookup_cache or LookupCache()
+        self.inventory.add_listener(self.lookup_cache.on_inventory_change)
+
+    @metrics.timed("fetch_data_and_save")
+    def lookup(self, property_id, buyer_agent_number):
+        """Resolve property, seller and buyer; returns the enquiry dict without an ID."""
+        property_id = property_id.strip().upper()
+        try:
+            buyer_agent_number = normalize_mobile_number(buyer_agent_number)
+        except ValueError as e:
+            raise InvalidPhoneNumber(f"Invalid Buyer Agent Number: {e}")
+        # Resubmissions are turned away before any Firestore or Sheets call
+        duplicate = self.duplicates.find(buyer_agent_number, property_id)
+        if duplicate:
+            raise DuplicateEnquiry(*duplicate)
+
+        # The ID and timestamps are added fresh on every call; only the documents are cached
+        resolved = self.lookup_cache.get(property_id, buyer_agent_number)
+        if resolved is None:
+            resolved = self._resolve(property_id, buyer_agent_number)
+            self.lookup_cache.put(property_id, buyer_agent_number, resolved)
+        return build_enquiry_data(property_id, buyer_agent_number, *resolved)
+
+    def _resolve(self, property_id, buyer_agent_number):
+        check_property_exists(self.properties, self.inventory, property_id, "No property found for the given Property ID.")
+        # Buyer lookup does not depend on the property, so it runs alongside the property -> seller chain
+        buyer_future = lookups.submit(self.agents.find_by_phone, buyer_agent_number)
+        with metrics.span("fetch_data_and_save.property"):
+            property_details = self.inventory.get(property_id)
+        if not property_details:
+            buyer_future.cancel()
+            raise PropertyNotFound("No property found for the given Property ID.", suggestions=close_matches(self.properties, property_id))
+
+        with metrics.span("fetch_data_and_save.seller"):
+            seller_details = self.agents.find_by_cpid(property_details.get("cpCode"))
+        with metrics.span("fetch_data_and_save.buyer_wait"):
+            buyer_details = buyer_future.result()
+        # Prevent enquiry if buyer agent details are not found
+        if not buyer_details:
+            raise AgentNotFound("Buyer Agent details not found. Enquiry cannot proceed.")
+        return property_details, seller_details, buyer_details
+
+    @metrics.timed("batch_save_to_google_sheet")
+    def persist(self, data_list):
+        """Hand enquiries to the write queue, numbering '# Times Property ID Enquired' from the index."""
+        rows = []
+        try:
+            for data in data_list:
+                rows.append(build_sheet_row(data, self.enquiry_index.increment(data.get("propertyId", ""))))
+            self.write_queue.enqueue_many(rows)
+        except Exception:
+            for data in data_list[:len(rows)]:
+                self.enquiry_index.decrement(data.get("propertyId", ""))
+            raise
+        for data in data_list:
+            self.duplicates.record(data.get("buyerAgentNumber", ""), data.get("propertyId", ""), data.get("enquiryId"))
+
+    def create(self, property_id, buyer_agent_number):
+        enquiry_data = self.lookup(property_id, buyer_agent_number)
+        enquiry_data["enquiryId"] = self.id_allocator.next_id()
+        self.persist([enquiry_data])
+        return enquiry_data
+
+
+# Lookup -> ID allocation -> persist pipeline for rental enquiries
+class RentalEnquiryService:
+    def __init__(self, db, inventory, agents, id_allocator, write_queue, lookup_cache=None, mirror=None,
+                 analytics=None, duplicates=None, search=None, properties=None):
+        self.db = db
+        self.inventory = inventory
+        # Inverted index over the rental inventory for filter search, and Property ID type-ahead (optional)
+        self.search = search
+        self.properties = properties
+        self.agents = agents
+        self.id_allocator = id_allocator
+        self.write_queue = write_queue
+        self.mirror = mirror
+        self.analytics = analytics
+        self.duplicates = duplicates or DuplicateIndex()
+        self.lookup_cache = lookup_cache or LookupCache()
+        self.inventory.add_listener(self.lookup_cache.on_inventory_change)
+
+    @metrics.timed("fetch_rental_data")
+    def lookup(self, property_id, buyer_agent_number):
+        property_id = property_id.strip().upper()
+        num = normalize_rental_number(buyer_agent_number)
+        duplicate = self.duplicates.find(num, property_id)
+        if duplicate:
+            raise DuplicateEnquiry(*duplicate)
+
+        resolved = self.lookup_cache.get(property_id, num)
+        if resolved is None:
+            resolved = self._resolve(property_id, num)
+            self.lookup_cache.put(property_id, num, resolved)
+        return build_rental_enquiry(num, *resolved)
+
+    def _resolve(self, property_id, num):
+        check_property_exists(self.properties, self.inventory, property_id, "No rental property for that ID.")
+        # buyer lookup runs in parallel with rental -> seller, which has to stay sequential
+        buyer_future = lookups.submit(self.agents.find_by_phone, num)
+        with metrics.span("fetch_rental_data.property"):
+            rental_details = self.inventory.get(property_id)
+        if not rental_details:
+            buyer_future.cancel()
+            raise PropertyNotFound("No rental property for that ID.", suggestions=close_matches(self.properties, property_id))
+
+        with metrics.span("fetch_rental_data.seller"):
+            seller_details = self.agents.find_by_phone(rental_details.get("agentNumber", "Unknown")) or {}
+        with metrics.span("fetch_rental_data.buyer_wait"):
+            buyer_details = buyer_future.result() or {}
+        return rental_details, seller_details, buyer_details
+
+    @metrics.timed("save_to_sheet")
+    def persist(self, data_list):
+        self.write_queue.enqueue_many([[data.get(header, "") for header in RENTAL_HEADERS] for data in data_list])
+        for data in data_list:
+            self.duplicates.record(data.get("Buyer Agent Number", ""), data.get("Property ID", ""), data.get("Enquiry ID"))
+
+    def create(self, property_id, buyer_agent_number):
+        enquiry_data = self.lookup(property_id, buyer_agent_number)
+        enquiry_data["Enquiry ID"] = self.id_allocator.next_id()
+        self.persist([enquiry_data])
+        return enquiry_data
+
+
+# Duplicate index rebuilt from the rows the write path recorded within the window, with their submission times
+def load_duplicates(write_queue, headers, buyer_key):
+    duplicates = DuplicateIndex()
+    if duplicates.window:
+        rows = write_queue.recent_rows(time.time() - duplicates.window)
+        duplicates.rebuild(rows, headers, buyer_key=buyer_key)
+    return duplicates
+
+
+# Process-wide services built on the pooled clients; sale and rental build independently,
+# so a single app warming both does not wait for one before starting the other
+_services_locks = {"sale": threading.Lock(), "rental": threading.Lock()}
+_services = {}
+_agents_lock = threading.Lock()
+_agent_locks = {}
+_agent_directories = {}
+
+
+# Agent directories are shared per collection by every page, the HTTP API and the CLI tools
+def get_agent_directory(db, collection, phone_field):
+    key = (collection, phone_field)
+    with _agents_lock:
+        lock = _agent_locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _agent_directories:
+            _agent_directories[key] = AgentDirectory(db, collection, phone_field=phone_field).start()
+        return _agent_directories[key]
+
+
+def get_sale_service():
+    with _services_locks["sale"]:
+        if "sale" not in _services:
+            db = clients.get_firestore()
+            sheet = make_sharded_worksheet(clients.get_sale_sheet(), SALE_HEADERS)
+            mirror = SheetMirror(sheet, "sale", SALE_HEADERS).start()
+            write_queue = make_write_queue(db, sheet, "sale", SALE_HEADERS, mirror).start()
+            id_column, property_column = SALE_HEADERS.index("Enquiry ID"), SALE_HEADERS.index("Property ID")
+            enquiry_index = PropertyEnquiryIndex(
+                mirror, pending=lambda: [(row[id_column], row[property_column]) for row in write_queue.pending_rows()]
+            ).start()
+            # Registered before start() so the listener's initial snapshot builds the suggest index
+            inventory = InventoryCache(db, "ACN123")
+            properties = PropertySuggestIndex("nameOfTheProperty")
+            inventory.add_listener(properties.on_inventory_change)
+            _services["sale"] = SaleEnquiryService(
+                db,
+                inventory=inventory.start(),
+                agents=get_agent_directory(db, "agents", "phonenumber"),
+                id_allocator=make_id_allocator(db, "saleEnquiryId", "EQB", seed=lambda: get_last_enquiry_id(mirror, "EQB1437")),
+                write_queue=write_queue,
+                enquiry_index=enquiry_index,
+                mirror=mirror,
+                analytics=EnquiryAnalytics(mirror, SALE_DIMENSIONS, pending=write_queue.pending_rows),
+                duplicates=load_duplicates(write_queue, SALE_HEADERS, phone_key),
+                properties=properties,
+            )
+        return _services["sale"]
+
+
+def get_rental_service():
+    with _services_locks["rental"]:
+        if "rental" not in _services:
+            db = clients.get_firestore()
+            sheet = make_sharded_worksheet(clients.get_rental_sheet(), RENTAL_HEADERS)
+            mirror = SheetMirror(sheet, "rental", RENTAL_HEADERS).start()
+            write_queue = make_write_queue(db, sheet, "rental", RENTAL_HEADERS, mirror).start()
+            # Registered before start() so the listener's initial snapshot builds the search indexes
+            inventory = InventoryCache(db, "acnRentalTemp")
+            search = RentalSearchIndex()
+            properties = PropertySuggestIndex("propertyName")
+            inventory.add_listener(search.on_inventory_change)
+            inventory.add_listener(properties.on_inventory_change)
+            _services["rental"] = RentalEnquiryService(
+                db,
+                inventory=inventory.start(),
+                agents=get_agent_directory(db, "acnAgents", "phoneNumber"),
+                id_allocator=make_id_allocator(db, "rentalEnquiryId", "RENT", seed=lambda: get_last_enquiry_id(mirror, "RENT2000")),
+                write_queue=write_queue,
+                mirror=mirror,
+                analytics=EnquiryAnalytics(mirror, RENTAL_DIMENSIONS, pending=write_queue.pending_rows),
+                duplicates=load_duplicates(write_queue, RENTAL_HEADERS, normalize_rental_number),
+                search=search,
+                properties=properties,
+            )
+        return _services["rental"]
+
+
+def active_services():
+    """Services already started in this process, keyed by 'sale' / 'rental'. Never blocks."""
+    # Entries are only ever added whole, so a copy without the lock is consistent
+    return dict(_services)
+
+
+# Background builds started by warm_up(); a failed build's error is kept for the UI
+_SERVICE_FACTORIES = {"sale": get_sale_service, "rental": get_rental_service}
+_warmers_lock = threading.Lock()
+_warmers = {}
+warm_up_errors = {}
+
+
+def warm_up(kind):
+    """
+    Build the 'sale' or 'rental' service (clients, caches, listeners) in a background
+    thread and return at once, so a page can render before Firestore and Sheets answer.
+    Callers that need the service still call get_*_service(), which waits for the build.
+    """
+    with _warmers_lock:
+        if kind in _services or kind in _warmers:
+            return _warmers.get(kind)
+        thread = threading.Thread(target=_warm, args=(kind,), name=f"warm-{kind}", daemon=True)
+        _warmers[kind] = thread
+        thread.start()
+        return thread
+
+
+def _warm(kind):
+    try:
+        _SERVICE_FACTORIES[kind]()
+        warm_up_errors.pop(kind, None)
+    except Exception as e:
+        warm_up_errors[kind] = str(e)
+    finally:
+        with _warmers_lock:
+            _warmers.pop(kind, None)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+
+# Keep a propertyId -> enquiry count index for an enquiry worksheet
+class PropertyEnquiryIndex:
+    """
+    In-memory count of how many times each Property ID has been enquired.
+    The index is loaded once from the sheet's Property ID column, bumped on every
+    write and reconciled against the sheet on a background thread, so a submit
+    never has to download the sheet. `sheet` can also be a SheetMirror.
+
+    Rows still pending are added by Enquiry ID, skipping any the sheet already has:
+    a row can be in the sheet before the write path stops reporting it as pending.
+    """
+
+    def __init__(self, sheet, column_header="Property ID", reconcile_interval=300, pending=None,
+                 id_header="Enquiry ID"):
+        self._sheet = sheet
+        # Optional callable returning (Enquiry ID, Property ID) pairs accepted but maybe not yet in the sheet
+        self._pending = pending
+        self._column_header = column_header
+        self._id_header = id_header
+        self._reconcile_interval = reconcile_interval
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        # Local writes recorded while a reconcile is reading the sheet
+        self._writes_since_read = Counter()
+        self._reading = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_reconciled = None
+        self.last_error = None
+
+    @staticmethod
+    def _key(property_id):
+        return str(property_id).strip().upper()
+
+    def _read_counts(self):
+        # Only the Property ID column is fetched, not the whole sheet
+        header = self._sheet.row_values(1)
+        if self._column_header not in header:
+            return Counter()
+        column = header.index(self._column_header) + 1
+        with metrics.span("enquiry_index.read_column"):
+            values = self._sheet.col_values(column)[1:]
+        if self._pending is not None:
+            pending = list(self._pending())
+            if pending and self._id_header in header:
+                with metrics.span("enquiry_index.read_column"):
+                    written = set(self._sheet.col_values(header.index(self._id_header) + 1)[1:])
+                pending = [(enquiry_id, value) for enquiry_id, value in pending if enquiry_id not in written]
+            values += [value for _, value in pending]
+        return Counter(self._key(value) for value in values if str(value).strip())
+
+    @metrics.timed("enquiry_index.reconcile")
+    def reconcile(self):
+        """Rebuild the index from the sheet, keeping writes made during the read."""
+        with self._lock:
+            self._reading = True
+            self._writes_since_read.clear()
+        try:
+            counts = self._read_counts()
+        except Exception as e:
+            self.last_error = str(e)
+            with self._lock:
+                self._reading = False
+            raise
+        with self._lock:
+            counts.update(self._writes_since_read)
+            self._counts = counts
+            self._reading = False
+            self._writes_since_read.clear()
+        self.last_reconciled = time.time()
+        self.last_error = None
+
+    def count(self, property_id):
+        with self._lock:
+            return self._counts[self._key(property_id)]
+
+    def increment(self, property_id):
+        """Record one new enquiry for the property and return its new count."""
+        key = self._key(property_id)
+        with self._lock:
+            self._counts[key] += 1
+            if self._reading:
+                self._writes_since_read[key] += 1
+            return self._counts[key]
+
+    def decrement(self, property_id):
+        """Roll back an increment whose sheet write failed."""
+        key = self._key(property_id)
+        with self._lock:
+            if self._counts[key] > 0:
+                self._counts[key] -= 1
+            if self._reading and self._writes_since_read[key] > 0:
+                self._writes_since_read[key] -= 1
+
+    def _run(self):
+        while not self._stop.wait(self._reconcile_interval):
+            try:
+                self.reconcile()
+            except Exception:
+                # last_error is surfaced to the UI; retry on the next tick
+                pass
+
+    def start(self):
+        """Load the index once and start background reconciliation."""
+        self.reconcile()
+        if self._thread is None and self._reconcile_interval:
+            self._thread = threading.Thread(target=self._run, name="enquiry-count-reconcile", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,182 @@
+import argparse
+import csv
+import io
+import sys
+from datetime import date, datetime
+
+import clients
+import metrics
+from enquiry_core import RENTAL_HEADERS, RENTAL_TIME_COLUMN, SALE_HEADERS, SALE_TIME_COLUMN
+from sheet_mirror import SheetMirror
+from sheet_shards import make_sharded_worksheet
+
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_CHUNK_ROWS = 10000
+
+# kind -> (sheet headers, enquiry time column and its formats, enquiry worksheet)
+SHEETS = {
+    "sale": (SALE_HEADERS, SALE_TIME_COLUMN, clients.get_sale_sheet),
+    "rental": (RENTAL_HEADERS, RENTAL_TIME_COLUMN, clients.get_rental_sheet),
+}
+
+# Filters per sheet: name -> headers; a row matches when any of them equals one of the given values
+EXPORT_FILTERS = {
+    "sale": {
+        "kam": ["Buyer Agent KAM", "Seller Agent KAM"],
+        "buyer_kam": ["Buyer Agent KAM"],
+        "seller_kam": ["Seller Agent KAM"],
+        "property_id": ["Property ID"],
+    },
+    "rental": {
+        "micromarket": ["Micromarket"],
+        "configuration": ["Configuration"],
+        "property_type": ["Property Type"],
+        "property_id": ["Property ID"],
+    },
+}
+
+
+def _iso_day(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date().isoformat()
+
+
+def iter_export_chunks(mirror, kind, start=None, end=None, filters=None, chunk_size=EXPORT_CHUNK_ROWS):
+    """
+    Generator of the `kind` mirror's enquiry rows in chunks of up to `chunk_size`, oldest first.
+    start / end (dates or 'YYYY-MM-DD', inclusive) bound the enquiry time column; filters
+    maps EXPORT_FILTERS names to one value or a list of alternatives.
+    All filters are evaluated by SQLite, so only matching rows are ever decoded.
+    """
+    headers, (time_header, time_formats), _ = SHEETS[kind]
+    any_of = []
+    for name, values in (filters or {}).items():
+        if name not in EXPORT_FILTERS[kind]:
+            raise ValueError(f"Unknown {kind} export filter {name!r}; expected one of {', '.join(EXPORT_FILTERS[kind])}")
+        if values is None or values == "" or values == []:
+            continue
+        any_of.append((EXPORT_FILTERS[kind][name], [values] if isinstance(values, str) else list(values)))
+    first, last = _iso_day(start), _iso_day(end)
+    day = (time_header, time_formats, first, last) if first or last else None
+    # Filters are validated here; rows are only read as the chunks are consumed
+    return _counted(mirror.scan(any_of=any_of, day=day, chunk_size=chunk_size))
+
+
+def _counted(chunks):
+    for chunk in chunks:
+        metrics.count("export.rows", len(chunk))
+        yield chunk
+
+
+def csv_blocks(chunks, headers):
+    """CSV text for `chunks`: the header line, then one block per chunk (for streaming responses)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield buffer.getvalue()
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def write_csv(chunks, headers, file):
+    """Write chunks to a text file object; returns the number of rows written."""
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+    for block in csv_blocks(counted(), headers):
+        file.write(block)
+    return rows
+
+
+def write_parquet(chunks, headers, file):
+    """
+    Write chunks to a Parquet file (path or binary file object), one row group per
+    chunk, every column as a string; returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(header, pa.string()) for header in headers])
+    rows = 0
+    with pq.ParquetWriter(file, schema) as writer:
+        for chunk in chunks:
+            # Mirrored rows are already padded to the header width
+            columns = zip(*chunk)
+            writer.write_batch(pa.RecordBatch.from_arrays([
+                pa.array([value if isinstance(value, str) else str(value) for value in column], type=pa.string())
+                for column in columns
+            ], schema=schema))
+            rows += len(chunk)
+    return rows
+
+
+@metrics.timed("export")
+def export_enquiries(mirror, kind, file, fmt="csv", **options):
+    """Stream the filtered `kind` enquiries (see iter_export_chunks) to `file`; returns rows written."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {', '.join(EXPORT_FORMATS)}")
+    headers = SHEETS[kind][0]
+    chunks = iter_export_chunks(mirror, kind, **options)
+    if fmt == "csv":
+        return write_csv(chunks, headers, file)
+    return write_parquet(chunks, headers, file)
+
+
+def open_mirror(kind, sync=True):
+    """The local mirror of the `kind` sheet, caught up with the sheet unless sync is False."""
+    headers, _, open_sheet = SHEETS[kind]
+    sheet = make_sharded_worksheet(open_sheet(), headers) if sync else None
+    mirror = SheetMirror(sheet, kind, headers)
+    if sync:
+        mirror.sync()
+    return mirror
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export filtered enquiries to CSV or Parquet")
+    parser.add_argument("kind", choices=sorted(SHEETS))
+    parser.add_argument("output", help="Output file, or - for stdout (CSV only)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="Default: from the output file extension, else csv")
+    parser.add_argument("--from", dest="start", help="First enquiry date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="Last enquiry date, YYYY-MM-DD")
+    parser.add_argument("--offline", action="store_true", help="Export the local mirror without syncing it first")
+    filter_names = sorted({name for filters in EXPORT_FILTERS.values() for name in filters})
+    for name in filter_names:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, action="append",
+                            help="Repeat for several values")
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    filters = {name: getattr(args, name) for name in EXPORT_FILTERS[args.kind]}
+    unsupported = [name for name in filter_names if getattr(args, name) and name not in filters]
+    if unsupported:
+        parser.error(f"{', '.join(unsupported)} cannot filter {args.kind} enquiries")
+
+    mirror = open_mirror(args.kind, sync=not args.offline)
+    options = {"start": args.start, "end": args.end, "filters": filters}
+    if args.output == "-":
+        if fmt != "csv":
+            parser.error("Parquet output needs a file")
+        rows = export_enquiries(mirror, args.kind, sys.stdout, fmt, **options)
+    elif fmt == "csv":
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            rows = export_enquiries(mirror, args.kind, f, fmt, **options)
+    else:
+        rows = export_enquiries(mirror, args.kind, args.output, fmt, **options)
+    print(f"{rows} enquiries exported", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from operator import itemgetter
+
+import clients
+import metrics
+from write_queue import FlushLoop, SheetWriteQueue
+
+ENQUIRIES_COLLECTION = "enquiries"
+CHECKPOINT_COLLECTION = "enquiryProjections"
+
+# "firestore": enquiries are committed to the `enquiries` collection and projected to the sheet;
+# "sheet": the local SQLite write queue appends them to the sheet directly
+DEFAULT_STORE = os.getenv("ENQUIRY_STORE", "firestore")
+# "inline" projects from every app process; "off" leaves it to `python enquiry_store.py`
+DEFAULT_PROJECTOR = os.getenv("SHEET_PROJECTOR", "inline")
+
+# Firestore commits at most 500 writes; a projected batch also rewrites the checkpoint
+MAX_BATCH_WRITES = 450
+# Longer than the slowest append a default SheetsRateLimiter allows (its max_call_seconds),
+# so a live projector keeps the lease until its batch is marked projected
+LEASE_SECONDS = 1200
+# Most unprojected rows read back for counts and duplicate checks while the sheet falls behind
+MAX_PENDING_ROWS = 5000
+
+logger = logging.getLogger(__name__)
+
+
+class MissingIndexError(RuntimeError):
+    pass
+
+
+# Enquiries kept in Firestore, with the enquiry worksheet as a projection
+class FirestoreWriteQueue(FlushLoop):
+    """
+    Drop-in for SheetWriteQueue. enqueue_many() commits the rows as documents of the
+    `enquiries` collection (document ID = Enquiry ID, created only if new) in one batch,
+    so an enquiry is durable and queryable once it returns, whatever the Sheets quota.
+
+    flush() is the projector: it appends unprojected documents to the sheet in createdAt
+    order, one append_rows per batch, then marks them projected and advances the
+    checkpoint document in `enquiryProjections`. Only the holder of the checkpoint's
+    lease projects, so every process may run it. A flush with nothing unprojected costs
+    one single-document query; the lease is renewed once half of it has run out, and an
+    idle projector polls less often until enqueue_many() wakes it. The batch's IDs are written to the
+    checkpoint, renewing the lease, before the append; if a projector dies in between, the next
+    one looks them up in the sheet mirror and only re-sends rows that did not land. Checkpoint
+    writes are transactions that check the lease is still ours, so a projector that lost it
+    never overwrites its successor's checkpoint.
+    """
+
+    def __init__(self, db, sheet, kind, headers, mirror=None, flush_interval=2.0, max_batch=400,
+                 lease_seconds=LEASE_SECONDS, max_backoff=300, max_idle_interval=30.0, pending_ttl=2.0,
+                 max_pending=MAX_PENDING_ROWS, project=True, collection=ENQUIRIES_COLLECTION,
+                 checkpoint_collection=CHECKPOINT_COLLECTION):
+        super().__init__(f"sheet-projector-{kind}", flush_interval, min(max_batch, MAX_BATCH_WRITES), max_backoff,
+                         max_idle_interval)
+        self._db = db
+        self._sheet = sheet
+        self.queue_name = kind
+        self.headers = list(headers)
+        self._mirror = mirror
+        self._lease_seconds = lease_seconds
+        self._pending_ttl = pending_ttl
+        self._max_pending = max_pending
+        self._project = project
+        self._collection_name = collection
+        self._collection = db.collection(collection)
+        self._checkpoint_ref = db.collection(checkpoint_collection).document(kind)
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._pending_lock = threading.Lock()
+        self._pending_cache = None
+        self._lease_until = 0.0
+        self._blocked_until = 0.0
+        self.checkpoint = {}
+
+    def _unprojected(self):
+        return self._collection.where("kind", "==", self.queue_name).where("projected", "==", False)
+
+    def document(self, row, created_at):
+        """The `enquiries` document for one sheet row."""
+        row = list(row)
+        cells = dict(zip(self.headers, row))
+        return {
+            "kind": self.queue_name,
+            "enquiryId": str(cells.get("Enquiry ID", "")),
+            "propertyId": str(cells.get("Property ID", "")).strip().upper(),
+            "buyerAgentNumber": str(cells.get("Buyer Agent Number", "")),
+            "row": row,
+            "createdAt": created_at,
+            "projected": False,
+        }
+
+    def enqueue(self, row):
+        return self.enqueue_many([row])[0]
+
+    def enqueue_many(self, rows):
+        """Commit rows to Firestore as new enquiry documents and return their IDs."""
+        now = time.time()
+        # Microsecond offsets keep the rows of one call in order
+        documents = [self.document(row, now + offset * 1e-6) for offset, row in enumerate(rows)]
+        if any(not document["enquiryId"] for document in documents):
+            raise ValueError("Every enquiry row needs an Enquiry ID")
+        for start in range(0, len(documents), MAX_BATCH_WRITES):
+            batch = self._db.batch()
+            for document in documents[start:start + MAX_BATCH_WRITES]:
+                batch.create(self._collection.document(document["enquiryId"]), document)
+            metrics.count(f"firestore.{self._collection_name}.commit")
+            with metrics.span("enquiries.commit"):
+                batch.commit()
+        with self._pending_lock:
+            self._pending_cache = None
+        self.wake()
+        return [document["enquiryId"] for document in documents]
+
+    def pending_rows(self):
+        """
+        Rows committed to Firestore but not yet in the sheet, oldest first (cached for
+        pending_ttl). At most max_pending are read, so a long Sheets outage doesn't turn
+        every count into a scan of the whole backlog.
+        """
+        with self._pending_lock:
+            if self._pending_cache is not None and time.time() - self._pending_cache[0] < self._pending_ttl:
+                return list(self._pending_cache[1])
+        metrics.count(f"firestore.{self._collection_name}.query")
+        documents = sorted(
+            (doc.to_dict() for doc in self._unprojected().limit(self._max_pending).stream()), key=itemgetter("createdAt")
+        )
+        if len(documents) == self._max_pending:
+            metrics.count("sheet_projector.pending_capped")
+        rows = [document["row"] for document in documents]
+        with self._pending_lock:
+            self._pending_cache = (time.time(), rows)
+        return list(rows)
+
+    def pending_count(self):
+        # An aggregation query counts the whole backlog without reading it
+        metrics.count(f"firestore.{self._collection_name}.count")
+        return self._unprojected().count().get()[0][0].value
+
+    def recent_rows(self, since):
+        """(row, createdAt) for enquiries submitted at or after `since` (epoch seconds), oldest first."""
+        metrics.count(f"firestore.{self._collection_name}.query")
+        # A range on createdAt alone needs no composite index; the other kind is dropped here
+        documents = [
+            doc.to_dict() for doc in self._collection.where("createdAt", ">=", since).stream()
+        ]
+        documents = sorted(
+            (document for document in documents if document.get("kind") == self.queue_name),
+            key=itemgetter("createdAt"),
+        )
+        return [(document["row"], document["createdAt"]) for document in documents]
+
+    def _projection_query(self, limit):
+        return self._unprojected().order_by("createdAt").limit(limit)
+
+    def check_index(self):
+        """Run the projector query once; raise MissingIndexError if its composite index is missing."""
+        from google.api_core.exceptions import FailedPrecondition
+
+        metrics.count(f"firestore.{self._collection_name}.query")
+        try:
+            list(self._projection_query(1).stream())
+        except FailedPrecondition as e:
+            raise MissingIndexError(
+                f"The sheet projector needs a composite index on `{self._collection_name}` over kind, projected "
+                f"and createdAt; deploy it with `firebase deploy --only firestore:indexes` "
+                f"(see firestore.indexes.json): {e}"
+            ) from e
+
+    def _has_unprojected(self):
+        metrics.count(f"firestore.{self._collection_name}.query")
+        return any(True for _ in self._unprojected().limit(1).stream())
+
+    def _acquire_lease(self):
+        """The checkpoint if this process holds (or just took) the projector lease, else None."""
+        from firebase_admin import firestore
+
+        now = time.time()
+        # Only the lease holder writes the checkpoint, so its own copy is current until renewal
+        if self._lease_until - now > self._lease_seconds / 2:
+            return self.checkpoint
+        if self._blocked_until > now:
+            return None
+
+        @firestore.transactional
+        def claim(transaction):
+            snapshot = self._checkpoint_ref.get(transaction=transaction)
+            checkpoint = (snapshot.to_dict() if snapshot.exists else None) or {}
+            if checkpoint.get("owner") not in (None, self._owner) and checkpoint.get("leaseUntil", 0) > now:
+                return None, checkpoint["leaseUntil"]
+            checkpoint.update(owner=self._owner, leaseUntil=now + self._lease_seconds)
+            transaction.set(self._checkpoint_ref, checkpoint)
+            return checkpoint, checkpoint["leaseUntil"]
+
+        metrics.count(f"firestore.{CHECKPOINT_COLLECTION}.transaction")
+        checkpoint, lease_until = claim(self._db.transaction())
+        if checkpoint is None:
+            # Someone else projects; don't ask again before their lease could have run out
+            self._lease_until = 0.0
+            self._blocked_until = lease_until
+        else:
+            self.checkpoint = checkpoint
+            self._lease_until = lease_until
+        return checkpoint
+
+    def _update_checkpoint(self, projected=(), **changes):
+        """
+        Renew the lease and apply `changes` to the checkpoint, marking the `projected` IDs
+        with it, in one transaction; returns False without writing if the lease was lost.
+        """
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def update(transaction):
+            snapshot = self._checkpoint_ref.get(transaction=transaction)
+            checkpoint = (snapshot.to_dict() if snapshot.exists else None) or {}
+            if checkpoint.get("owner") != self._owner:
+                return None
+            now = time.time()
+            for enquiry_id in projected:
+                transaction.update(self._collection.document(enquiry_id), {"projected": True, "projectedAt": now})
+            checkpoint.update(changes, leaseUntil=now + self._lease_seconds, updatedAt=now)
+            checkpoint["projected"] = checkpoint.get("projected", 0) + len(projected)
+            transaction.set(self._checkpoint_ref, checkpoint)
+            return checkpoint
+
+        metrics.count(f"firestore.{CHECKPOINT_COLLECTION}.transaction")
+        checkpoint = update(self._db.transaction())
+        if checkpoint is None:
+            # Another projector took over; it settles our pending batch from the sheet mirror
+            metrics.count("sheet_projector.lease_lost")
+            self._lease_until = 0.0
+            return False
+        self.checkpoint = checkpoint
+        self._lease_until = checkpoint["leaseUntil"]
+        return True
+
+    def _commit(self, enquiry_ids, last=None):
+        # Mark the batch projected and move the checkpoint past it, in one atomic write
+        changes = {"pending": []}
+        if last is not None:
+            changes.update(lastEnquiryId=last["enquiryId"], lastCreatedAt=last["createdAt"])
+        committed = self._update_checkpoint(enquiry_ids, **changes)
+        with self._pending_lock:
+            self._pending_cache = None
+        return committed
+
+    def _release_lease(self):
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def release(transaction):
+            snapshot = self._checkpoint_ref.get(transaction=transaction)
+            checkpoint = (snapshot.to_dict() if snapshot.exists else None) or {}
+            if checkpoint.get("owner") == self._owner:
+                transaction.update(self._checkpoint_ref, {"leaseUntil": 0})
+
+        metrics.count(f"firestore.{CHECKPOINT_COLLECTION}.transaction")
+        release(self._db.transaction())
+        self._lease_until = 0.0
+
+    def _recover(self, enquiry_ids):
+        """Settle a batch a previous projector recorded but never marked projected."""
+        landed = []
+        if self._mirror is not None:
+            self._mirror.sync()
+            landed = [enquiry_id for enquiry_id in enquiry_ids if self._mirror.find(enquiry_id=enquiry_id, limit=1)]
+        metrics.count("sheet_projector.recovered", len(landed))
+        # Rows that did not land stay unprojected and go out with the next batch
+        return self._commit(landed)
+
+    def flush(self):
+        """Project one batch of documents to the sheet; returns how many rows were appended."""
+        if not self._project or not self._has_unprojected():
+            return 0
+        checkpoint = self._acquire_lease()
+        if checkpoint is None:
+            return 0
+        if checkpoint.get("pending") and not self._recover(checkpoint["pending"]):
+            return 0
+        metrics.count(f"firestore.{self._collection_name}.query")
+        documents = [
+            doc.to_dict() for doc in self._projection_query(self._max_batch).stream()
+        ]
+        if not documents:
+            return 0
+        enquiry_ids = [document["enquiryId"] for document in documents]
+        # A lease that ran out while this batch was read may have passed to another projector
+        if not self._update_checkpoint(pending=enquiry_ids):
+            return 0
+        with metrics.span("sheet.append_rows"):
+            self._sheet.append_rows([document["row"] for document in documents])
+        self._commit(enquiry_ids, last=documents[-1])
+        self.last_flush = time.time()
+        self.last_flush_count = len(documents)
+        return len(documents)
+
+    def start(self):
+        return super().start() if self._project else self
+
+    def stop(self, drain=True):
+        super().stop(drain=drain and self._project)
+        if self._lease_until:
+            # Hand the lease over now rather than make the next projector wait it out
+            self._release_lease()
+
+    def status(self):
+        status = super().status()
+        status["projector"] = "inline" if self._project else "external"
+        return status
+
+
+def make_write_queue(db, sheet, kind, headers, mirror=None, store=DEFAULT_STORE, projector=DEFAULT_PROJECTOR):
+    """
+    The write path configured by ENQUIRY_STORE and SHEET_PROJECTOR for one enquiry sheet.
+    An inline projector without its Firestore index could never project, so that case
+    falls back to the local sheet queue with a warning instead of failing the service.
+    """
+    if store == "sheet":
+        return SheetWriteQueue(sheet, kind)
+    queue = FirestoreWriteQueue(db, sheet, kind, headers, mirror=mirror, project=projector != "off")
+    if projector != "off":
+        try:
+            queue.check_index()
+        except MissingIndexError as e:
+            logger.warning("%s; writing %s enquiries through the local sheet queue instead", e, kind)
+            return SheetWriteQueue(sheet, kind)
+    return queue
+
+
+def import_sheet_rows(db, mirror, kind, collection=ENQUIRIES_COLLECTION):
+    """
+    Copy enquiries already in the sheet (read from the mirror) into the `enquiries`
+    collection as projected documents, so Firestore holds the full history. Documents
+    are keyed by Enquiry ID, so running it again overwrites rather than duplicates.
+    Returns the number of rows copied.
+    """
+    writer = FirestoreWriteQueue(db, None, kind, mirror.headers, collection=collection, project=False)
+    copied = 0
+    for chunk in mirror.scan(chunk_size=MAX_BATCH_WRITES):
+        batch = db.batch()
+        written = 0
+        for row in chunk:
+            document = writer.document(row, 0.0)
+            if not document["enquiryId"]:
+                continue
+            # Sheet order as createdAt, numbered without gaps across skipped rows
+            document.update(projected=True, createdAt=copied + written, imported=True)
+            batch.set(db.collection(collection).document(document["enquiryId"]), document)
+            written += 1
+        if written:
+            metrics.count(f"firestore.{collection}.commit")
+            batch.commit()
+        copied += written
+    return copied
+
+
+def main():
+    from enquiry_core import RENTAL_HEADERS, SALE_HEADERS
+    from sheet_mirror import SheetMirror
+    from sheet_shards import make_sharded_worksheet
+
+    sheets = {"sale": (SALE_HEADERS, clients.get_sale_sheet), "rental": (RENTAL_HEADERS, clients.get_rental_sheet)}
+    parser = argparse.ArgumentParser(description="Project the Firestore enquiries collection to the enquiry sheets")
+    parser.add_argument("kinds", nargs="*", choices=sorted(sheets), default=sorted(sheets))
+    parser.add_argument("--once", action="store_true", help="Project everything pending, then exit")
+    parser.add_argument("--import-sheet", action="store_true",
+                        help="Copy the rows already in the sheet into Firestore, then exit")
+    args = parser.parse_args()
+
+    db = clients.get_firestore()
+    queues = []
+    for kind in args.kinds:
+        headers, open_sheet = sheets[kind]
+        sheet = make_sharded_worksheet(open_sheet(), headers)
+        mirror = SheetMirror(sheet, kind, headers)
+        if args.import_sheet:
+            mirror.sync()
+            print(f"{kind}: {import_sheet_rows(db, mirror, kind)} rows imported", file=sys.stderr)
+            continue
+        queue = FirestoreWriteQueue(db, sheet, kind, headers, mirror=mirror)
+        queue.check_index()
+        queues.append(queue)
+    if args.import_sheet:
+        return
+    if args.once:
+        for queue in queues:
+            queue.stop(drain=True)
+            print(f"{queue.queue_name}: checkpoint at {queue.checkpoint.get('lastEnquiryId')}", file=sys.stderr)
+        return
+    for queue in queues:
+        queue.start()
+    try:
+        while True:
+            time.sleep(60)
+            for queue in queues:
+                print(f"{queue.queue_name}: {queue.status()}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for queue in queues:
+            queue.stop(drain=True)
+
+
+if __name__ == "__main__":
+    main()
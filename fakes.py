@@ -0,0 +1,510 @@
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+# In-memory stand-ins for the parts of firestore.Client and gspread.Worksheet the apps use.
+# Every remote call sleeps for the configured latency and is counted in `calls`, so
+# benchmarks can report both wall time and API usage without touching production.
+
+
+class FakeLatency:
+    def __init__(self, per_call=0.0, per_row=0.0):
+        self.per_call = per_call
+        self.per_row = per_row
+
+    def wait(self, rows=0):
+        delay = self.per_call + self.per_row * rows
+        if delay > 0:
+            time.sleep(delay)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data[field]
+
+
+class FakeWatch:
+    def __init__(self, collection, callback):
+        self._collection = collection
+        self._callback = callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        self._collection._watches.discard(self)
+
+
+class FakeQuery:
+    def __init__(self, collection, filters=(), limit=None, order=None):
+        self._collection = collection
+        self._filters = filters
+        self._limit = limit
+        self._order = order
+
+    def where(self, field, op, value):
+        if op not in ("==", "in", ">="):
+            raise ValueError(f"Unsupported operator {op!r}")
+        return FakeQuery(self._collection, self._filters + ((field, op, value),), self._limit, self._order)
+
+    def limit(self, count):
+        return FakeQuery(self._collection, self._filters, count, self._order)
+
+    def order_by(self, field, direction=None):
+        """Ascending only; documents without the field are left out, as in Firestore."""
+        return FakeQuery(self._collection, self._filters + ((field, "exists", None),), self._limit, field)
+
+    def count(self, alias=None):
+        return FakeAggregationQuery(self, alias)
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            if op == "==" and data.get(field) != value:
+                return False
+            if op == "in" and data.get(field) not in value:
+                return False
+            if op == ">=" and (field not in data or data[field] < value):
+                return False
+            if op == "exists" and field not in data:
+                return False
+        return True
+
+    def stream(self):
+        collection = self._collection
+        collection._db.calls[f"{collection.name}.stream"] += 1
+        # Single-field equality filters are served from an index, like Firestore does
+        if len(self._filters) == 1 and self._filters[0][1] == "==":
+            field, _, value = self._filters[0]
+            candidates = collection._lookup(field, value)
+        else:
+            candidates = [(doc_id, data) for doc_id, data in collection._docs.items() if self._matches(data)]
+        if self._order is not None:
+            candidates = sorted(candidates, key=lambda item: item[1][self._order])
+        results = [FakeDocumentSnapshot(doc_id, dict(data)) for doc_id, data in itertools.islice(candidates, self._limit)]
+        collection._db.latency.wait(len(results))
+        return iter(results)
+
+
+class FakeAggregationQuery:
+    def __init__(self, query, alias=None):
+        self._query = query
+        self._alias = alias
+
+    def get(self):
+        return [[SimpleNamespace(alias=self._alias, value=sum(1 for _ in self._query.stream()))]]
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self, transaction=None):
+        self._collection._db.calls[f"{self._collection.name}.get"] += 1
+        self._collection._db.latency.wait(1)
+        return FakeDocumentSnapshot(self.id, self._collection._docs.get(self.id))
+
+    def set(self, data, merge=False):
+        self._collection._db.calls[f"{self._collection.name}.set"] += 1
+        self._collection._db.latency.wait(1)
+        if merge and self.id in self._collection._docs:
+            data = {**self._collection._docs[self.id], **data}
+        self._collection._put(self.id, dict(data))
+
+    def update(self, data):
+        self._collection._db.calls[f"{self._collection.name}.update"] += 1
+        self._collection._db.latency.wait(1)
+        self._collection._apply(self.id, "update", data)
+
+    def delete(self):
+        self._collection._db.calls[f"{self._collection.name}.delete"] += 1
+        self._collection._delete(self.id)
+
+
+class FakeWriteBatch:
+    """Buffers set / create / update / delete and applies them together on commit()."""
+
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append((ref, "merge" if merge else "set", dict(data)))
+
+    def create(self, ref, data):
+        self._writes.append((ref, "create", dict(data)))
+
+    def update(self, ref, data):
+        self._writes.append((ref, "update", dict(data)))
+
+    def delete(self, ref):
+        self._writes.append((ref, "delete", None))
+
+    def commit(self):
+        from google.api_core.exceptions import Conflict, NotFound
+
+        self._db.calls["batch.commit"] += 1
+        self._db.latency.wait(len(self._writes))
+        with self._db._write_lock:
+            # All or nothing: check preconditions before applying any write
+            for ref, op, _ in self._writes:
+                exists = ref.id in ref._collection._docs
+                if op == "create" and exists:
+                    raise Conflict(f"Document {ref._collection.name}/{ref.id} already exists")
+                if op == "update" and not exists:
+                    raise NotFound(f"No document to update: {ref._collection.name}/{ref.id}")
+            for ref, op, data in self._writes:
+                ref._collection._apply(ref.id, op, data)
+        self._writes = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    Enough of firestore.Transaction for @firestore.transactional: transactions run one
+    at a time (a lock is held from begin to commit), reads see committed data and
+    writes are applied on commit.
+    """
+
+    def __init__(self, db):
+        super().__init__(db)
+        self._id = None
+        self._read_only = False
+        self._max_attempts = 5
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._db._transaction_lock.acquire()
+        self._id = b"fake-transaction"
+
+    def _commit(self):
+        try:
+            self.commit()
+        finally:
+            self._clean_up()
+            self._db._transaction_lock.release()
+
+    def _rollback(self):
+        if self._id is not None:
+            self._clean_up()
+            self._db._transaction_lock.release()
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(self)
+        self._db = db
+        self.name = name
+        self.id = name
+        self._docs = {}
+        self._indexes = {}
+        self._watches = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _lookup(self, field, value):
+        index = self._indexes.get(field)
+        if index is None:
+            index = {}
+            for doc_id, data in self._docs.items():
+                index.setdefault(data.get(field), []).append(doc_id)
+            self._indexes[field] = index
+        return [(doc_id, self._docs[doc_id]) for doc_id in index.get(value, ())]
+
+    def _notify(self, doc_id, data, kind):
+        change = SimpleNamespace(
+            type=SimpleNamespace(name=kind),
+            document=FakeDocumentSnapshot(doc_id, data),
+        )
+        docs = [FakeDocumentSnapshot(i, d) for i, d in self._docs.items()]
+        for watch in list(self._watches):
+            watch._callback(docs, [change], None)
+
+    def _put(self, doc_id, data):
+        with self._lock:
+            kind = "MODIFIED" if doc_id in self._docs else "ADDED"
+            self._docs[doc_id] = data
+            self._indexes.clear()
+        self._notify(doc_id, data, kind)
+
+    def _apply(self, doc_id, op, data):
+        from google.api_core.exceptions import NotFound
+
+        if op == "delete":
+            return self._delete(doc_id)
+        current = self._docs.get(doc_id)
+        if op == "update" and current is None:
+            raise NotFound(f"No document to update: {self.name}/{doc_id}")
+        if op in ("update", "merge") and current is not None:
+            data = {**current, **data}
+        self._put(doc_id, dict(data))
+
+    def _delete(self, doc_id):
+        with self._lock:
+            data = self._docs.pop(doc_id, None)
+            self._indexes.clear()
+        if data is not None:
+            self._notify(doc_id, data, "REMOVED")
+
+    def document(self, doc_id=None):
+        return FakeDocumentReference(self, doc_id or f"doc{next(self._ids)}")
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return None, ref
+
+    def load(self, documents):
+        """Bulk-load dicts without counting API calls (test and benchmark setup)."""
+        with self._lock:
+            for data in documents:
+                self._docs[f"doc{next(self._ids)}"] = dict(data)
+            self._indexes.clear()
+
+    def on_snapshot(self, callback):
+        self._db.calls[f"{self.name}.on_snapshot"] += 1
+        watch = FakeWatch(self, callback)
+        self._watches.add(watch)
+        docs = [FakeDocumentSnapshot(doc_id, dict(data)) for doc_id, data in self._docs.items()]
+        changes = [
+            SimpleNamespace(type=SimpleNamespace(name="ADDED"), document=doc) for doc in docs
+        ]
+        self._db.latency.wait(len(docs))
+        callback(docs, changes, None)
+        return watch
+
+
+class FakeFirestore:
+    def __init__(self, latency=None):
+        self.latency = latency or FakeLatency()
+        self.calls = Counter()
+        self._collections = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._transaction_lock = threading.Lock()
+
+    def collection(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+
+def _column_letters_to_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter.upper()) - ord("A") + 1)
+    return index
+
+
+class FakeWorksheet:
+    def __init__(self, title="Sheet1", headers=None, latency=None, spreadsheet=None):
+        self.title = title
+        self.spreadsheet = spreadsheet
+        self.latency = latency or FakeLatency()
+        self.calls = Counter()
+        self._rows = [list(headers)] if headers else []
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self):
+        return len(self._rows)
+
+    def load(self, rows):
+        """Bulk-load rows without counting API calls (test and benchmark setup)."""
+        with self._lock:
+            self._rows.extend([list(row) for row in rows])
+
+    def _call(self, name, rows=0):
+        self.calls[name] += 1
+        self.latency.wait(rows)
+
+    def get_all_records(self):
+        self._call("get_all_records", len(self._rows))
+        if not self._rows:
+            return []
+        header = self._rows[0]
+        return [dict(zip(header, row + [""] * (len(header) - len(row)))) for row in self._rows[1:]]
+
+    def get_all_values(self):
+        self._call("get_all_values", len(self._rows))
+        return [list(row) for row in self._rows]
+
+    def row_values(self, row):
+        self._call("row_values", 1)
+        return list(self._rows[row - 1]) if row <= len(self._rows) else []
+
+    def col_values(self, col):
+        self._call("col_values", len(self._rows))
+        return [row[col - 1] if len(row) >= col else "" for row in self._rows]
+
+    def get(self, range_name):
+        """Values for an A1 range such as 'A2:O100' or 'A2:O' (open ended)."""
+        start, _, end = range_name.partition(":")
+        start_col = _column_letters_to_index("".join(c for c in start if c.isalpha()))
+        start_row = int("".join(c for c in start if c.isdigit()) or 1)
+        end_col = _column_letters_to_index("".join(c for c in end if c.isalpha())) if end else start_col
+        end_digits = "".join(c for c in end if c.isdigit())
+        end_row = int(end_digits) if end_digits else len(self._rows)
+        values = [list(row[start_col - 1:end_col]) for row in self._rows[start_row - 1:end_row]]
+        self._call("get", len(values))
+        return values
+
+    def append_row(self, values, **kwargs):
+        self._call("append_row", 1)
+        with self._lock:
+            self._rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self._call("append_rows", len(values))
+        with self._lock:
+            self._rows.extend([list(row) for row in values])
+
+    def batch_update(self, data, **kwargs):
+        self._call("batch_update", sum(len(item["values"]) for item in data))
+        with self._lock:
+            for item in data:
+                start = item["range"].split(":")[0]
+                col = _column_letters_to_index("".join(c for c in start if c.isalpha()))
+                row = int("".join(c for c in start if c.isdigit()))
+                for offset, values in enumerate(item["values"]):
+                    target = self._rows[row - 1 + offset]
+                    for i, value in enumerate(values):
+                        while len(target) < col + i:
+                            target.append("")
+                        target[col - 1 + i] = value
+
+    def clear(self):
+        self._call("clear")
+        with self._lock:
+            self._rows = []
+
+
+class FakeSpreadsheet:
+    """Holds FakeWorksheets by title; the worksheet list and add_worksheet are counted in `calls`."""
+
+    def __init__(self, latency=None):
+        self.latency = latency or FakeLatency()
+        self.calls = Counter()
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sheet1(self):
+        return next(iter(self._worksheets.values()))
+
+    def _put(self, worksheet):
+        worksheet.spreadsheet = self
+        self._worksheets[worksheet.title] = worksheet
+        return worksheet
+
+    def attach(self, worksheet):
+        """Add an existing FakeWorksheet without counting an API call (test setup)."""
+        with self._lock:
+            return self._put(worksheet)
+
+    def worksheets(self):
+        self.calls["worksheets"] += 1
+        self.latency.wait()
+        return list(self._worksheets.values())
+
+    def worksheet(self, title):
+        self.calls["worksheet"] += 1
+        self.latency.wait()
+        return self._worksheets[title]
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self.calls["add_worksheet"] += 1
+        self.latency.wait()
+        with self._lock:
+            if title in self._worksheets:
+                raise ValueError(f"A sheet with the name {title!r} already exists")
+            return self._put(FakeWorksheet(title, latency=self.latency))
+
+
+class FakeTokenServer:
+    """
+    Local OAuth token endpoint for exercising credential caching offline. Point a service
+    account's token_uri at `token_uri`; every exchange is counted in `requests` and
+    answered with a new access token valid for `expires_in` seconds.
+    """
+
+    def __init__(self, expires_in=3600, latency=None):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.expires_in = expires_in
+        self.latency = latency or FakeLatency()
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.latency.wait()
+                with server._lock:
+                    server.requests += 1
+                    number = server.requests
+                body = json.dumps({
+                    "access_token": f"fake-token-{number}",
+                    "expires_in": server.expires_in,
+                    "token_type": "Bearer",
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-token-server", daemon=True)
+        self._thread.start()
+
+    @property
+    def token_uri(self):
+        return f"http://127.0.0.1:{self._httpd.server_port}/token"
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def fake_service_account(token_uri, project_id="fake-project"):
+    """Service account dict with a freshly generated RSA key, for use with FakeTokenServer."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode("utf-8")
+    return {
+        "type": "service_account",
+        "project_id": project_id,
+        "private_key_id": "fake-key",
+        "private_key": pem,
+        "client_email": f"enquiries@{project_id}.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": token_uri,
+    }
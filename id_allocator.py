@@ -0,0 +1,137 @@
+import fcntl
+import json
+import os
+import threading
+
+import metrics
+
+
+def format_enquiry_id(prefix, number):
+    return f"{prefix}{number:04}"
+
+
+def parse_enquiry_id(prefix, enquiry_id):
+    enquiry_id = str(enquiry_id).strip()
+    if not enquiry_id.startswith(prefix):
+        raise ValueError(f"Enquiry ID {enquiry_id!r} does not start with {prefix!r}")
+    return int(enquiry_id[len(prefix):])
+
+
+# Hand out enquiry IDs from a shared counter
+class EnquiryIdAllocator:
+    """
+    Base class for enquiry ID allocators. Subclasses implement _reserve(count), which
+    atomically claims `count` consecutive numbers from the shared counter and returns
+    the first one. With block_size > 1 each process claims a block up front and hands
+    IDs out of it locally, so most allocations never leave the process.
+    """
+
+    def __init__(self, prefix, seed, block_size=1):
+        self.prefix = prefix
+        self.block_size = max(1, int(block_size))
+        # Called at most once, when the counter does not exist yet; returns the last issued ID
+        self._seed = seed
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def _seed_number(self):
+        return parse_enquiry_id(self.prefix, self._seed())
+
+    def _reserve(self, count):
+        raise NotImplementedError
+
+    def next_id(self):
+        with self._lock:
+            if self._next >= self._end:
+                with metrics.span("id_allocator.reserve"):
+                    first = self._reserve(self.block_size)
+                self._next, self._end = first, first + self.block_size
+            number = self._next
+            self._next += 1
+        return format_enquiry_id(self.prefix, number)
+
+    def reserve_ids(self, count):
+        """Claim `count` consecutive IDs at once, bypassing the local block."""
+        if count <= 0:
+            return []
+        with metrics.span("id_allocator.reserve"):
+            first = self._reserve(count)
+        return [format_enquiry_id(self.prefix, number) for number in range(first, first + count)]
+
+
+# Counter kept in a Firestore document and advanced inside a transaction
+class FirestoreIdAllocator(EnquiryIdAllocator):
+    def __init__(self, db, counter_name, prefix, seed, block_size=1, collection="counters"):
+        super().__init__(prefix, seed, block_size)
+        self._db = db
+        self._ref = db.collection(collection).document(counter_name)
+        self._seed_value = None
+
+    def _reserve(self, count):
+        from firebase_admin import firestore
+
+        metrics.count("firestore.counters.transaction")
+
+        @firestore.transactional
+        def claim(transaction):
+            snapshot = self._ref.get(transaction=transaction)
+            if snapshot.exists:
+                last = snapshot.get("last")
+            else:
+                # Seed outside the retry loop's hot path: computed once and reused on retries
+                if self._seed_value is None:
+                    self._seed_value = self._seed_number()
+                last = self._seed_value
+            transaction.set(self._ref, {
+                "prefix": self.prefix,
+                "last": last + count,
+                "updated": firestore.SERVER_TIMESTAMP,
+            })
+            return last + 1
+
+        return claim(self._db.transaction())
+
+
+# Counter kept in a local JSON file guarded by an exclusive file lock
+class FileLockIdAllocator(EnquiryIdAllocator):
+    """
+    Local stand-in for FirestoreIdAllocator, for tests and single-host development.
+    Safe across threads and processes on the same machine.
+    """
+
+    def __init__(self, path, prefix, seed, block_size=1):
+        super().__init__(prefix, seed, block_size)
+        self._path = path
+
+    def _reserve(self, count):
+        with open(f"{self._path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(self._path):
+                    with open(self._path) as f:
+                        last = json.load(f)["last"]
+                else:
+                    last = self._seed_number()
+                tmp_path = f"{self._path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"prefix": self.prefix, "last": last + count}, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self._path)
+                return last + 1
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def make_id_allocator(db, counter_name, prefix, seed):
+    """
+    Build the allocator configured by the environment: ENQUIRY_ID_COUNTER_DIR switches to
+    the local file counter, ENQUIRY_ID_BLOCK_SIZE sets how many IDs a process reserves at once.
+    """
+    block_size = int(os.getenv("ENQUIRY_ID_BLOCK_SIZE", "1"))
+    counter_dir = os.getenv("ENQUIRY_ID_COUNTER_DIR")
+    if counter_dir:
+        path = os.path.join(counter_dir, f"{counter_name}.json")
+        return FileLockIdAllocator(path, prefix, seed, block_size)
+    return FirestoreIdAllocator(db, counter_name, prefix, seed, block_size)
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+# Bounded, listener-synced cache of an inventory collection keyed by propertyId
+class InventoryCache:
+    """
+    Property documents keyed by uppercase propertyId. Entries are loaded on first use
+    (or from the listener's initial snapshot, up to max_entries) and evicted least
+    recently used first. An on_snapshot listener keeps cached entries current, so
+    status fields such as dateOfStatusLastChecked change as soon as Firestore does.
+    invalidate() / invalidate_all() force the next lookup back to Firestore.
+
+    Other indexes over the same collection can register with add_listener(fn); fn is
+    called as fn("reset", None, None) before a full snapshot and fn("loaded", None, None)
+    once all of it was delivered, then fn("upsert", doc_id, doc) / fn("remove", doc_id, None)
+    for every document change, cached or not.
+    """
+
+    def __init__(self, db, collection, max_entries=20000, max_staleness=900, warm_timeout=30, watch=True):
+        self._db = db
+        self._collection = collection
+        self._max_entries = max_entries
+        self._max_staleness = max_staleness
+        self._warm_timeout = warm_timeout
+        self._use_watch = watch
+        self._lock = threading.Lock()
+        self._subscribe_lock = threading.Lock()
+        # property_id -> (doc_id, doc, fetched_at)
+        self._entries = OrderedDict()
+        self._doc_keys = {}
+        self._listeners = []
+        self._watch = None
+        self._fresh_watch = False
+        self._last_subscribe = 0
+        self._warmed = threading.Event()
+        self.last_synced = None
+        self.hits = 0
+        self.misses = 0
+        self.last_error = None
+
+    @staticmethod
+    def _key(property_id):
+        return str(property_id).strip().upper()
+
+    def _ref(self):
+        return self._db.collection(self._collection)
+
+    def _store(self, property_id, doc_id, doc):
+        self._entries[property_id] = (doc_id, doc, time.time())
+        self._entries.move_to_end(property_id)
+        self._doc_keys[doc_id] = property_id
+        while len(self._entries) > self._max_entries:
+            _, (evicted_doc_id, _, _) = self._entries.popitem(last=False)
+            self._doc_keys.pop(evicted_doc_id, None)
+
+    def _drop(self, property_id):
+        entry = self._entries.pop(property_id, None)
+        if entry is not None:
+            self._doc_keys.pop(entry[0], None)
+
+    def _notify(self, events):
+        # Called without self._lock held, so a slow listener never blocks lookups
+        listeners = list(self._listeners)
+        for event, doc_id, doc in events:
+            for listener in listeners:
+                try:
+                    listener(event, doc_id, doc)
+                except Exception as e:
+                    self.last_error = f"listener failed: {e}"
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        if self._fresh_watch:
+            # First snapshot of a (re)started listener: the whole collection
+            self._fresh_watch = False
+            events = [("reset", None, None)]
+            with self._lock:
+                self._entries.clear()
+                self._doc_keys.clear()
+                for doc in docs:
+                    data = doc.to_dict() or {}
+                    if len(self._entries) < self._max_entries:
+                        self._store(self._key(data.get("propertyId", "")), doc.id, data)
+                    events.append(("upsert", doc.id, data))
+                self.last_synced = time.time()
+            events.append(("loaded", None, None))
+            self._notify(events)
+            self._warmed.set()
+            return
+        events = []
+        with self._lock:
+            for change in changes:
+                doc_id = change.document.id
+                # The document may have been cached under an old propertyId
+                cached_key = self._doc_keys.get(doc_id)
+                if cached_key is not None:
+                    self._drop(cached_key)
+                if change.type.name == "REMOVED":
+                    events.append(("remove", doc_id, None))
+                    continue
+                data = change.document.to_dict() or {}
+                # Only documents already in memory (or while there is room) are kept
+                if cached_key is not None or len(self._entries) < self._max_entries:
+                    self._store(self._key(data.get("propertyId", "")), doc_id, data)
+                events.append(("upsert", doc_id, data))
+            self.last_synced = time.time()
+        self._notify(events)
+
+    def _subscribe(self, min_interval=0):
+        # Lookups on several threads may notice a dropped listener at once; only one resubscribes
+        with self._subscribe_lock:
+            if self._last_subscribe and time.time() - self._last_subscribe < min_interval:
+                return
+            if self._watch is not None:
+                self._watch.unsubscribe()
+            self._last_subscribe = time.time()
+            self._fresh_watch = True
+            metrics.count(f"firestore.{self._collection}.on_snapshot")
+            try:
+                self._watch = self._ref().on_snapshot(self._on_snapshot)
+            except Exception as e:
+                self._watch = None
+                self.last_error = str(e)
+
+    def start(self):
+        """Start the change listener and wait (up to warm_timeout) for the first snapshot."""
+        if self._use_watch:
+            self._subscribe()
+            self._warmed.wait(self._warm_timeout)
+        return self
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    @property
+    def is_live(self):
+        return self._watch is not None and self._watch.is_active
+
+    def _fresh(self, fetched_at):
+        if self.is_live:
+            return True
+        if self._use_watch:
+            self._subscribe(min_interval=30)
+        return time.time() - fetched_at <= self._max_staleness
+
+    def _fetch(self, property_id):
+        metrics.count(f"firestore.{self._collection}.query")
+        with metrics.span(f"{self._collection}.query"):
+            snapshot = next(iter(self._ref().where("propertyId", "==", property_id).limit(1).stream()), None)
+        if snapshot is None:
+            return None
+        data = snapshot.to_dict() or {}
+        with self._lock:
+            self._store(property_id, snapshot.id, data)
+        return data
+
+    def get(self, property_id):
+        """Return the property document for property_id, or None if it does not exist."""
+        key = self._key(property_id)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and self._fresh(entry[2]):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return self._fetch(key)
+
+    def invalidate(self, property_id):
+        with self._lock:
+            self._drop(self._key(property_id))
+
+    def invalidate_all(self):
+        with self._lock:
+            self._entries.clear()
+            self._doc_keys.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "live": self.is_live,
+            "last_error": self.last_error,
+        }
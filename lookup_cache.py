@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# Bounded LRU + TTL cache of resolved enquiry lookups
+class LookupCache:
+    """
+    Maps (property ID, canonical buyer number) to the resolved property, seller and
+    buyer documents. Only the enrichment is cached: enquiry IDs and timestamps are
+    applied per submit, so repeated enquiries for a popular property resolve from
+    memory without ever reusing an ID. Entries expire after `ttl` seconds, the least
+    recently used are evicted beyond max_entries, and invalidate(property_id) drops
+    every entry for one property (wired to the inventory listener by the services).
+    """
+
+    def __init__(self, max_entries=5000, ttl=600):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # (property_id, phone) -> (value, stored_at)
+        self._entries = OrderedDict()
+        self._by_property = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_property.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_property[key[0]]
+
+    def get(self, property_id, phone):
+        key = (property_id, phone)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] <= self._ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def put(self, property_id, phone, value):
+        key = (property_id, phone)
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            self._by_property.setdefault(property_id, set()).add(key)
+            while len(self._entries) > self._max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, property_id):
+        with self._lock:
+            for key in list(self._by_property.get(property_id, ())):
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_property.clear()
+
+    def on_inventory_change(self, event, doc_id, doc):
+        """InventoryCache listener: drop lookups for properties whose document changed."""
+        if event == "upsert":
+            self.invalidate(str(doc.get("propertyId", "")).strip().upper())
+        elif event == "remove":
+            # The removed document's propertyId is not known here
+            self.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def describe_cache_stats(stats):
+    """Short human readable summary of LookupCache.stats() for the UI."""
+    lookups = stats["hits"] + stats["misses"]
+    rate = f"{stats['hits'] / lookups:.0%} hit rate" if lookups else "no lookups yet"
+    return f"{stats['entries']} cached · {rate}"
@@ -0,0 +1,47 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# Firestore accepts at most 30 values in an `in` filter
+IN_QUERY_LIMIT = 30
+
+# Shared pool so independent Firestore lookups for one enquiry run side by side
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("LOOKUP_POOL_SIZE", "16")),
+    thread_name_prefix="firestore-lookup",
+)
+
+
+def submit(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the shared lookup pool and return its Future."""
+    return _executor.submit(fn, *args, **kwargs)
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _query_in(collection_ref, field, values):
+    metrics.count(f"firestore.{collection_ref.id}.in_query")
+    return [doc.to_dict() for doc in collection_ref.where(field, "in", values).stream()]
+
+
+# Resolve many values of one field with chunked `in` queries, issued concurrently
+def submit_batch_lookup(collection_ref, field, values):
+    return [
+        submit(_query_in, collection_ref, field, chunk)
+        for chunk in _chunks(sorted(set(values)), IN_QUERY_LIMIT)
+    ]
+
+
+def collect_batch_lookup(futures, field, key=None):
+    """Documents from submit_batch_lookup() futures, keyed by `field` (passed through `key`, if given)."""
+    found = {}
+    for future in futures:
+        for doc in future.result():
+            value = doc.get(field)
+            found.setdefault(key(value) if key and value else value, doc)
+    return found
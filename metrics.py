@@ -0,0 +1,149 @@
+import functools
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# Process-wide timing spans and API call counters for the enquiry pipeline.
+# Each stage keeps a bounded window of recent durations for p50/p95/p99 plus
+# lifetime count and sum, and everything can be dumped in Prometheus text format.
+
+WINDOW = 4096
+
+
+class _Stage:
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._calls = Counter()
+
+    def observe(self, stage, seconds, error=False):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = _Stage()
+            entry.samples.append(seconds)
+            entry.count += 1
+            entry.total += seconds
+            if error:
+                entry.errors += 1
+
+    def count(self, api, n=1):
+        with self._lock:
+            self._calls[api] += n
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - started, error)
+
+    def timed(self, stage):
+        """Decorator form of span()."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """Per-stage percentiles (seconds) and API call totals."""
+        with self._lock:
+            stages = {name: (sorted(entry.samples), entry.count, entry.total, entry.errors)
+                      for name, entry in self._stages.items()}
+            calls = dict(self._calls)
+        result = {}
+        for name, (samples, count, total, errors) in sorted(stages.items()):
+            result[name] = {
+                "count": count,
+                "errors": errors,
+                "mean": total / count if count else 0.0,
+                "p50": _percentile(samples, 50),
+                "p95": _percentile(samples, 95),
+                "p99": _percentile(samples, 99),
+            }
+        return {"stages": result, "api_calls": dict(sorted(calls.items()))}
+
+    def prometheus_text(self):
+        snapshot = self.snapshot()
+        with self._lock:
+            totals = {name: entry.total for name, entry in self._stages.items()}
+        lines = [
+            "# HELP enquiry_stage_seconds Time spent in each enquiry pipeline stage.",
+            "# TYPE enquiry_stage_seconds summary",
+        ]
+        for name, stage in snapshot["stages"].items():
+            label = _label(name)
+            for key, quantile in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+                lines.append(f'enquiry_stage_seconds{{stage="{label}",quantile="{quantile}"}} {stage[key]:.6f}')
+            lines.append(f'enquiry_stage_seconds_sum{{stage="{label}"}} {totals.get(name, 0.0):.6f}')
+            lines.append(f'enquiry_stage_seconds_count{{stage="{label}"}} {stage["count"]}')
+        lines += [
+            "# HELP enquiry_stage_errors_total Stage invocations that raised.",
+            "# TYPE enquiry_stage_errors_total counter",
+        ]
+        for name, stage in snapshot["stages"].items():
+            lines.append(f'enquiry_stage_errors_total{{stage="{_label(name)}"}} {stage["errors"]}')
+        lines += [
+            "# HELP enquiry_api_calls_total Calls made to Firestore and Google Sheets.",
+            "# TYPE enquiry_api_calls_total counter",
+        ]
+        for api, total in snapshot["api_calls"].items():
+            lines.append(f'enquiry_api_calls_total{{api="{_label(api)}"}} {total}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._calls.clear()
+
+
+def _percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+REGISTRY = MetricsRegistry()
+span = REGISTRY.span
+timed = REGISTRY.timed
+count = REGISTRY.count
+observe = REGISTRY.observe
+snapshot = REGISTRY.snapshot
+prometheus_text = REGISTRY.prometheus_text
+
+
+def snapshot_rows():
+    """Stage metrics as table rows (milliseconds) for the admin panel."""
+    return [
+        {
+            "Stage": name,
+            "Count": stage["count"],
+            "Errors": stage["errors"],
+            "p50 (ms)": round(stage["p50"] * 1000, 2),
+            "p95 (ms)": round(stage["p95"] * 1000, 2),
+            "p99 (ms)": round(stage["p99"] * 1000, 2),
+            "Mean (ms)": round(stage["mean"] * 1000, 2),
+        }
+        for name, stage in snapshot()["stages"].items()
+    ]
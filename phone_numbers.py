@@ -0,0 +1,60 @@
+import re
+from functools import lru_cache
+
+# Canonical phone numbers shared by both apps, the bulk import and the agent indexes.
+# Indian numbers become +91XXXXXXXXXX regardless of spaces, punctuation, a trunk 0, a
+# 0091 / 91 / +91 country code; numbers written with another explicit country code
+# keep it as +<digits>. Anything else has no canonical form.
+
+COUNTRY_CODE = "91"
+NATIONAL_LENGTH = 10
+
+_NON_DIGITS = re.compile(r"[^\d]")
+
+
+@lru_cache(maxsize=65536)
+def canonical_phone(number):
+    """Canonical +91XXXXXXXXXX (or +<digits> for explicit foreign numbers), or None."""
+    if number is None:
+        return None
+    text = str(number).strip()
+    international = text.startswith("+") or text.startswith("00")
+    digits = _NON_DIGITS.sub("", text)
+    if text.startswith("00"):
+        digits = digits[2:]
+
+    if len(digits) == NATIONAL_LENGTH + len(COUNTRY_CODE) and digits.startswith(COUNTRY_CODE):
+        return f"+{digits}"
+    national = digits.lstrip("0") if not international else digits
+    if len(national) == NATIONAL_LENGTH:
+        return f"+{COUNTRY_CODE}{national}"
+    if international and 8 <= len(digits) <= 15:
+        return f"+{digits}"
+    return None
+
+
+def phone_key(number):
+    """Index key for a stored number: canonical form, or the trimmed raw value if it has none."""
+    return canonical_phone(number) or str(number).strip()
+
+
+def canonicalize_many(numbers):
+    """
+    Batch form of canonical_phone for bulk imports and index builds. Each distinct
+    input is parsed once; the result lines up with `numbers`, with None for invalid ones.
+    """
+    numbers = [None if number is None else str(number) for number in numbers]
+    resolved = {number: canonical_phone(number) for number in set(numbers)}
+    return [resolved[number] for number in numbers]
+
+
+def phone_variants(number):
+    """Stored spellings of a number worth trying in a Firestore `in` query."""
+    canonical = canonical_phone(number)
+    if canonical is None:
+        return [str(number).strip()]
+    digits = canonical[1:]
+    if not digits.startswith(COUNTRY_CODE) or len(digits) != NATIONAL_LENGTH + len(COUNTRY_CODE):
+        return [canonical]
+    national = digits[len(COUNTRY_CODE):]
+    return [canonical, digits, national, f"0{national}", f"+{COUNTRY_CODE} {national}"]
@@ -0,0 +1,170 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from itertools import islice
+
+import metrics
+
+# Words of a property name, for matching name prefixes
+_WORD = re.compile(r"\w+")
+
+# Entries looked at per suggest() before giving up on more name matches
+MAX_SCAN = 5000
+
+
+def _id_key(value):
+    return str(value).strip().upper()
+
+
+def _words(value):
+    return sorted(set(_WORD.findall(str(value).lower())))
+
+
+def _prefixed(entries, prefix):
+    # Entries of a sorted [(key, doc_id)] list whose key starts with `prefix`, in order
+    for position in range(bisect_left(entries, (prefix,)), len(entries)):
+        if not entries[position][0].startswith(prefix):
+            return
+        yield entries[position]
+
+
+# Type-ahead over the Property IDs and names of an inventory collection, fed by the InventoryCache listener
+class PropertySuggestIndex:
+    """
+    Two sorted arrays: (uppercase Property ID, doc_id) and (lowercase name word, doc_id).
+    A prefix is a bisection into one of them followed by a short scan, so suggest()
+    answers in microseconds without touching Firestore. on_inventory_change() is
+    registered with the InventoryCache like RentalSearchIndex: the initial snapshot
+    bulk-loads the arrays (sorted once), later changes are inserted in place.
+
+    `ready` is set once the listener has delivered the whole collection; suggest()
+    returns nothing before that. From then on (while the listener is live) exists() lets the enquiry services turn away an
+    unknown Property ID without a Firestore query.
+    """
+
+    def __init__(self, name_field):
+        self._name_field = name_field
+        self._lock = threading.Lock()
+        self._ids = []
+        self._words = []
+        # uppercase Property ID -> doc_ids carrying it
+        self._by_id = {}
+        # doc_id -> (Property ID key, name words, suggestion)
+        self._docs = {}
+        # Set while the initial snapshot loads: entries are appended and sorted once at the end
+        self._unsorted = False
+        self.ready = False
+
+    def _add(self, doc_id, doc):
+        property_id = doc.get("propertyId")
+        if property_id is None or not str(property_id).strip():
+            return
+        key = _id_key(property_id)
+        name = str(doc.get(self._name_field) or "").strip()
+        words = _words(name)
+        entries = [(self._ids, (key, doc_id))] + [(self._words, (word, doc_id)) for word in words]
+        for target, entry in entries:
+            if self._unsorted:
+                target.append(entry)
+            else:
+                insort(target, entry)
+        self._by_id.setdefault(key, set()).add(doc_id)
+        self._docs[doc_id] = (key, words, {"propertyId": str(property_id).strip(), "name": name})
+
+    def _remove(self, doc_id):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        key, words, _ = entry
+        entries = [(self._ids, (key, doc_id))] + [(self._words, (word, doc_id)) for word in words]
+        for target, item in entries:
+            if self._unsorted:
+                target.remove(item)
+                continue
+            position = bisect_left(target, item)
+            if position < len(target) and target[position] == item:
+                del target[position]
+        self._by_id[key].discard(doc_id)
+        if not self._by_id[key]:
+            del self._by_id[key]
+
+    def _sort(self):
+        if self._unsorted:
+            self._ids.sort()
+            self._words.sort()
+            self._unsorted = False
+
+    def on_inventory_change(self, event, doc_id, doc):
+        """InventoryCache listener: 'reset' clears the index until 'loaded', 'upsert' / 'remove' patch one document."""
+        with self._lock:
+            if event == "reset":
+                self._ids = []
+                self._words = []
+                self._by_id.clear()
+                self._docs.clear()
+                self._unsorted = True
+                self.ready = False
+            elif event == "loaded":
+                # Sorted here, on the listener thread, so the first suggest() is not the one paying for it
+                self._sort()
+                self.ready = True
+            elif event == "upsert":
+                self._remove(doc_id)
+                self._add(doc_id, doc or {})
+            elif event == "remove":
+                self._remove(doc_id)
+
+    @metrics.timed("property_suggest.query")
+    def suggest(self, text, limit=10):
+        """
+        Up to `limit` {"propertyId", "name"} dicts: Property IDs starting with `text`
+        first, then properties with a name word starting with each word of `text`.
+        """
+        text = str(text).strip()
+        if not text:
+            return []
+        with self._lock:
+            if not self.ready:
+                # Sorting mid-load would turn the rest of the bulk load into per-entry inserts
+                return []
+            found = []
+            seen = set()
+            for _, doc_id in islice(_prefixed(self._ids, _id_key(text)), limit):
+                seen.add(doc_id)
+                found.append(self._docs[doc_id][2])
+            words = _words(text)
+            if len(found) < limit and words:
+                # The longest word drives the scan; the others must prefix some other word of the name
+                driver = max(words, key=len)
+                others = [word for word in words if word != driver]
+                for _, doc_id in islice(_prefixed(self._words, driver), MAX_SCAN):
+                    if doc_id in seen:
+                        continue
+                    name_words = self._docs[doc_id][1]
+                    if all(any(word.startswith(other) for word in name_words) for other in others):
+                        seen.add(doc_id)
+                        found.append(self._docs[doc_id][2])
+                        if len(found) >= limit:
+                            break
+            return [dict(item) for item in found]
+
+    def exists(self, property_id):
+        with self._lock:
+            return _id_key(property_id) in self._by_id
+
+    def close_matches(self, property_id, limit=5):
+        """Property IDs sharing the longest prefix with a mistyped `property_id`, for 'did you mean'."""
+        key = _id_key(property_id)
+        for length in range(len(key) - 1, 1, -1):
+            matches = self.suggest(key[:length], limit=limit)
+            matches = [match for match in matches if _id_key(match["propertyId"]).startswith(key[:length])]
+            if matches:
+                return [match["propertyId"] for match in matches]
+        return []
+
+    def __len__(self):
+        return len(self._docs)
+
+    def stats(self):
+        with self._lock:
+            return {"properties": len(self._docs), "ready": self.ready}
@@ -0,0 +1,131 @@
+import streamlit as st
+import streamlit.components.v1 as components
+from dotenv import load_dotenv
+import enquiry_core
+from analytics_page import render_analytics
+from enquiry_core import DuplicateEnquiry, EnquiryError
+from service_panel import render_metrics_panel, render_property_finder, render_service_status
+
+# Rental tracker pages; rent-enq.py runs them on their own, app.py next to the sale pages
+
+load_dotenv()
+
+@st.cache_resource
+def init_service():
+    try:
+        return enquiry_core.get_rental_service()
+    except Exception as e:
+        st.error(f"❌ {e}")
+        st.stop()
+
+# lookups are cached inside the service (keyed by property ID and canonical number), IDs are not
+def fetch_rental_data(service, pid, ban):
+    try:
+        return service.lookup(pid, ban)
+    except DuplicateEnquiry as e:
+        st.warning(f"⚠️ {e}")
+        return
+    except EnquiryError as e:
+        st.error(f"❌ {e}")
+        return
+
+# rows are queued durably and written to the sheet in batches by the queue's flusher
+def save_to_sheet(service, data):
+    service.persist([data])
+
+# filter search over the in-memory rental index; answers without reading Firestore
+def search_page():
+    enquiry_core.warm_up("rental")
+    st.title("🔎 Rental Inventory Search")
+    index = init_service().search
+    if not index.ready:
+        st.info("⏳ The rental inventory is still loading…")
+        return
+    left, right = st.columns(2)
+    micromarkets = left.multiselect("📍 Micromarket", index.options("micromarket"))
+    configurations = right.multiselect("🏘 Configuration", index.options("configuration"))
+    property_types = left.multiselect("🏢 Property Type", index.options("property_type"))
+    min_rent = right.number_input("💰 Min Rent (Lakhs)", min_value=0.0, value=0.0, step=0.05)
+    max_rent = right.number_input("💰 Max Rent (Lakhs, 0 for no limit)", min_value=0.0, value=0.0, step=0.05)
+    total, results = index.search(
+        micromarket=micromarkets or None,
+        configuration=configurations or None,
+        property_type=property_types or None,
+        min_rent=min_rent or None,
+        max_rent=max_rent or None,
+    )
+    st.caption(f"{total} matching properties (of {len(index)})")
+    st.dataframe(results, use_container_width=True, hide_index=True)
+
+def analytics_page():
+    enquiry_core.warm_up("rental")
+    render_analytics(init_service().analytics, "📊 Rental Enquiry Analytics")
+
+def enquiry_page():
+    # clients and caches are built in the background while the form renders
+    enquiry_core.warm_up("rental")
+    st.title("🏠 Rental Property Enquiry System")
+    render_service_status("rental", "🔄 Refresh rental data")
+
+    render_property_finder("rental", "rental_property_id")
+
+    with st.form("f"):
+        pid = st.text_input("📌 Property ID", key="rental_property_id")
+        ban = st.text_input("📞 Buyer Agent Number")
+        go = st.form_submit_button("🔍 Fetch Details")
+
+    with st.expander("🗂 Enquiry History"):
+        query = st.text_input("Property ID, Buyer Agent Number or Enquiry ID", key="rental_history_query")
+        if query:
+            matches = init_service().mirror.search(query)
+            st.caption(f"{len(matches)} matching enquiries")
+            st.dataframe(matches, use_container_width=True)
+
+    if go:
+        if not pid or not ban:
+            st.error("❌ Fill both fields")
+            return
+
+        with st.spinner("Fetching…"):
+            service = init_service()
+            rd = fetch_rental_data(service, pid, ban)
+            if rd:
+                try:
+                    rd["Enquiry ID"] = service.id_allocator.next_id()
+                except Exception as e:
+                    st.error(f"❌ Could not allocate an enquiry ID: {e}")
+                    return
+                try:
+                    save_to_sheet(service, rd)
+                except Exception as e:
+                    st.error(f"❌ Could not save the enquiry: {e}")
+                    return
+                st.success(f"✅ Rental details fetched successfully! Enquiry {rd['Enquiry ID']} queued for the sheet.")
+                st.subheader(f"🏠 {rd['Property Name']} ({rd['Property ID']})")
+                st.write(f"**Seller Agent:** {rd['Seller Agent Name']} ({rd['Seller Agent Number']})")
+                st.write(f"**Date of Status Last Checked:** {rd['Date of Status Last Checked']}")
+
+                copy_text = (
+                    f"🏠 Property: {rd['Property Name']} ({rd['Property ID']})\n"
+                    f"🏢 Property Type: {rd.get('Property Type', 'Unknown')}\n"
+                    f"💰 Rent Per Month in Lakhs: {rd.get('Rent Per Month in Lakhs', 'Unknown')}\n"
+                    f"🏘 Configuration: {rd.get('Configuration', 'Unknown')}\n"
+                    f"📍 Micromarket: {rd.get('Micromarket', 'Unknown')}\n"
+                    f"📞 Seller Agent: {rd['Seller Agent Name']} ({rd['Seller Agent Number']})\n"
+                    f"🗓 Last Checked: {rd['Date of Status Last Checked']}"
+                )
+                st.subheader("📋 Copy Details to Clipboard")
+                components.html(f"""
+                    <textarea id="details" style="width:100%;height:150px;" readonly>{copy_text}</textarea>
+                    <button onclick="navigator.clipboard.writeText(document.getElementById('details').value)"
+                            style="padding:10px;background-color:#28a745;color:white;border:none;border-radius:5px;cursor:pointer;margin-top:10px;">
+                        📋 Copy to Clipboard
+                    </button>
+                """, height=220)
+
+PAGES = {"🏠 Enquiry": enquiry_page, "🔎 Search": search_page, "📊 Analytics": analytics_page}
+
+def main():
+    page = st.sidebar.radio("Page", list(PAGES), label_visibility="collapsed")
+    PAGES[page]()
+    render_metrics_panel()
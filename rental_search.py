@@ -0,0 +1,228 @@
+import math
+import threading
+from bisect import bisect_left, insort
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+
+import metrics
+
+# Filter name -> acnRentalTemp field
+SEARCH_FIELDS = {
+    "micromarket": "micromarket",
+    "configuration": "configuration",
+    "property_type": "propertyType",
+}
+
+RENT_FIELD = "rentPerMonthInLakhs"
+
+# Fields kept per property for the result table
+RESULT_FIELDS = [
+    "propertyId", "propertyName", "propertyType", "configuration", "micromarket", "rentPerMonthInLakhs",
+    "agentName", "agentNumber",
+]
+
+
+def _term(value):
+    return str(value).strip().lower()
+
+
+def _rent(value):
+    """Rent in lakhs; properties without a numeric rent sort last (inf)."""
+    try:
+        rent = float(str(value).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return math.inf
+    return rent if math.isfinite(rent) else math.inf
+
+
+def _as_terms(values):
+    if values is None or values == "":
+        return None
+    if isinstance(values, str):
+        values = [values]
+    return {_term(value) for value in values}
+
+
+# In-memory inverted index over the rental inventory, fed by the InventoryCache listener
+class RentalSearchIndex:
+    """
+    For every micromarket, configuration and property type (matched case-insensitively)
+    a posting list of (rent, doc_id) kept sorted by rent, plus one sorted array over
+    the whole inventory. on_inventory_change() is registered with the acnRentalTemp
+    InventoryCache, so the listener's initial snapshot builds the index (sorted once, on
+    "loaded") and later document changes only touch the lists they appear in; search()
+    never reads Firestore, and finds nothing until `ready`.
+
+    A rent range is two bisections per posting list. With one filter the match count
+    and the cheapest results come straight from those slices; with several, the
+    narrowest filter's slices are intersected with the other filters' doc ID sets
+    and merged in rent order only until `limit` results are found.
+    """
+
+    def __init__(self, result_fields=RESULT_FIELDS):
+        self._result_fields = list(result_fields)
+        self._lock = threading.Lock()
+        # filter -> term -> [(rent, doc_id)], sorted
+        self._postings = {name: {} for name in SEARCH_FIELDS}
+        # filter -> term -> {doc_id}, for intersecting filters
+        self._members = {name: {} for name in SEARCH_FIELDS}
+        # filter -> term -> label as first seen, for the filter choices
+        self._labels = {name: {} for name in SEARCH_FIELDS}
+        # doc_id -> (terms per filter, rent, result row)
+        self._docs = {}
+        self._rents = []
+        # Set while the initial snapshot loads: entries are appended and sorted once at the end
+        self._unsorted = False
+        self.ready = False
+
+    def _lists(self, terms):
+        yield self._rents
+        for name, term in terms.items():
+            yield self._postings[name][term]
+
+    def _add(self, doc_id, doc):
+        terms = {}
+        for name, field in SEARCH_FIELDS.items():
+            value = doc.get(field)
+            if value is None or not str(value).strip():
+                continue
+            term = terms[name] = _term(value)
+            self._postings[name].setdefault(term, [])
+            self._members[name].setdefault(term, set()).add(doc_id)
+            self._labels[name].setdefault(term, str(value).strip())
+        rent = _rent(doc.get(RENT_FIELD))
+        for entries in self._lists(terms):
+            if self._unsorted:
+                entries.append((rent, doc_id))
+            else:
+                insort(entries, (rent, doc_id))
+        self._docs[doc_id] = (terms, rent, {field: doc.get(field, "") for field in self._result_fields})
+
+    def _remove(self, doc_id):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        terms, rent, _ = entry
+        for entries in self._lists(terms):
+            if self._unsorted:
+                entries.remove((rent, doc_id))
+                continue
+            position = bisect_left(entries, (rent, doc_id))
+            if position < len(entries) and entries[position] == (rent, doc_id):
+                del entries[position]
+        for name, term in terms.items():
+            self._members[name][term].discard(doc_id)
+            if not self._postings[name][term]:
+                del self._postings[name][term]
+                del self._members[name][term]
+                self._labels[name].pop(term, None)
+
+    def _sort(self):
+        if not self._unsorted:
+            return
+        self._rents.sort()
+        for postings in self._postings.values():
+            for entries in postings.values():
+                entries.sort()
+        self._unsorted = False
+
+    def on_inventory_change(self, event, doc_id, doc):
+        """InventoryCache listener: 'reset' clears the index until 'loaded', 'upsert' / 'remove' patch one document."""
+        with self._lock:
+            if event == "reset":
+                for postings in self._postings.values():
+                    postings.clear()
+                for members in self._members.values():
+                    members.clear()
+                for labels in self._labels.values():
+                    labels.clear()
+                self._docs.clear()
+                self._rents = []
+                self._unsorted = True
+                self.ready = False
+            elif event == "loaded":
+                self._sort()
+                self.ready = True
+            elif event == "upsert":
+                self._remove(doc_id)
+                self._add(doc_id, doc or {})
+            elif event == "remove":
+                self._remove(doc_id)
+
+    def options(self, name):
+        """Distinct values of one filter, for the search form."""
+        with self._lock:
+            return sorted(self._labels[name].values(), key=str.lower)
+
+    @metrics.timed("rental_search.query")
+    def search(self, micromarket=None, configuration=None, property_type=None, min_rent=None, max_rent=None,
+               limit=100):
+        """
+        Properties matching every given filter, cheapest first. Each filter takes one
+        value or a list of alternatives; the rent bounds are inclusive, in lakhs, and
+        exclude properties without a rent. Returns (total matches, up to `limit` rows).
+        """
+        filters = {
+            name: terms for name, terms in (
+                ("micromarket", _as_terms(micromarket)),
+                ("configuration", _as_terms(configuration)),
+                ("property_type", _as_terms(property_type)),
+            ) if terms is not None
+        }
+        low_key = (float(min_rent),) if min_rent is not None else None
+        if max_rent is not None:
+            high_key = (math.nextafter(float(max_rent), math.inf),)
+        elif min_rent is not None:
+            high_key = (math.inf,)
+        else:
+            high_key = None
+
+        def bounds(entries):
+            low = bisect_left(entries, low_key) if low_key is not None else 0
+            high = bisect_left(entries, high_key) if high_key is not None else len(entries)
+            return entries, low, max(low, high)
+
+        with self._lock:
+            if not self.ready:
+                # Half-loaded lists would look like a complete (and unsorted) answer
+                return 0, []
+            # Rent slices per filter; the filter with the fewest entries in range drives the query
+            slices = {
+                name: [bounds(self._postings[name][term]) for term in terms if term in self._postings[name]]
+                for name, terms in filters.items()
+            }
+            if not slices:
+                slices = {None: [bounds(self._rents)]}
+            driver = min(slices, key=lambda name: sum(high - low for _, low, high in slices[name]))
+            others = [(name, terms) for name, terms in filters.items() if name != driver]
+
+            ordered = (doc_id for _, doc_id in merge(*(
+                map(entries.__getitem__, range(low, high)) for entries, low, high in slices[driver]
+            )))
+            if not others:
+                total = sum(high - low for _, low, high in slices[driver])
+                top = list(islice(ordered, limit))
+            else:
+                # The other filters as doc_id sets, so matching is set membership
+                other_sets = []
+                for name, terms in others:
+                    sets = [self._members[name][term] for term in terms if term in self._members[name]]
+                    other_sets.append(sets[0] if len(sets) == 1 else set().union(*sets))
+                in_range = set()
+                for entries, low, high in slices[driver]:
+                    in_range.update(map(itemgetter(1), entries[low:high]))
+                total = len(in_range.intersection(*other_sets))
+                top = list(islice((doc_id for doc_id in ordered if all(doc_id in s for s in other_sets)), limit))
+            return total, [dict(self._docs[doc_id][2]) for doc_id in top]
+
+    def __len__(self):
+        return len(self._docs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "properties": len(self._docs),
+                "micromarkets": len(self._postings["micromarket"]),
+                "ready": self.ready,
+            }
@@ -0,0 +1,64 @@
+import streamlit as st
+
+import clients
+import enquiry_core
+import metrics
+from agent_directory import describe_stats
+from lookup_cache import describe_cache_stats
+from sheets_client import describe_limiter_stats
+from write_queue import describe_status
+
+
+# Sidebar status of one enquiry pipeline; returns the service once it is ready, else None
+def render_service_status(kind, refresh_label="Refresh property data"):
+    service = enquiry_core.active_services().get(kind)
+    if service is None:
+        error = enquiry_core.warm_up_errors.get(kind)
+        st.sidebar.caption(f"Connection failed: {error}" if error else "Connecting to Firebase and Google Sheets...")
+        return None
+    st.sidebar.caption(f"Sheet sync: {describe_status(service.write_queue.status())}")
+    st.sidebar.caption(f"Agent directory: {describe_stats(service.agents.stats())}")
+    st.sidebar.caption(f"Lookup cache: {describe_cache_stats(service.lookup_cache.stats())}")
+    st.sidebar.caption(f"Sheets quota: {describe_limiter_stats(clients.get_sheets_limiter().stats())}")
+    if st.sidebar.button(refresh_label, key=f"refresh_{kind}"):
+        service.inventory.invalidate_all()
+        service.lookup_cache.clear()
+    return service
+
+
+def _use_property(target_key, choice_key):
+    st.session_state[target_key] = st.session_state[choice_key]
+
+
+# Type-ahead for a Property ID field; suggestions come from the in-memory index, never Firestore
+def render_property_finder(kind, target_key):
+    service = enquiry_core.active_services().get(kind)
+    properties = getattr(service, "properties", None)
+    if properties is None or not properties.ready:
+        return
+    text = st.text_input(
+        "Find a property", placeholder="Start of a Property ID or property name", key=f"{kind}_property_finder"
+    )
+    if not text:
+        return
+    matches = properties.suggest(text)
+    if not matches:
+        st.caption("No matching properties.")
+        return
+    labels = {
+        match["propertyId"]: f"{match['propertyId']} · {match['name']}" if match["name"] else match["propertyId"]
+        for match in matches
+    }
+    choice_key = f"{kind}_property_choice"
+    left, right = st.columns([3, 1], vertical_alignment="bottom")
+    left.selectbox("Suggestions", list(labels), format_func=labels.get, key=choice_key)
+    right.button("Use", key=f"{kind}_use_property", on_click=_use_property, args=(target_key, choice_key))
+
+
+# Stage latencies and API call counts; the registry is process-wide, so this covers every page
+def render_metrics_panel():
+    if st.sidebar.checkbox("Show performance metrics"):
+        with st.sidebar.expander("Stage latencies", expanded=True):
+            st.dataframe(metrics.snapshot_rows(), use_container_width=True)
+            st.json(metrics.snapshot()["api_calls"])
+            st.code(metrics.prometheus_text(), language="text")
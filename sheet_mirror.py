@@ -0,0 +1,399 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import metrics
+from phone_numbers import phone_key
+
+DEFAULT_MIRROR_PATH = os.getenv("SHEET_MIRROR_PATH", "enquiry-mirror.sqlite3")
+
+# Indexed lookup columns, by sheet header; rows missing a header leave the column empty
+LOOKUP_COLUMNS = {
+    "enquiry_id": "Enquiry ID",
+    "property_id": "Property ID",
+    "buyer_number": "Buyer Agent Number",
+}
+
+
+def column_letter(number):
+    letters = ""
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _lookup_value(column, value):
+    if not str(value).strip():
+        return ""
+    return phone_key(value) if column == "buyer_number" else str(value).strip().upper()
+
+
+def _day_parser(formats):
+    # ISO date of a sheet cell written in one of `formats`, else None; registered as an SQLite function
+    iso = any(fmt.startswith("%Y-%m-%d") for fmt in formats)
+
+    @functools.lru_cache(maxsize=4096)
+    def parse(value):
+        value = str(value).strip()
+        if iso:
+            try:
+                return datetime.fromisoformat(value).date().isoformat()
+            except ValueError:
+                pass
+        for fmt in formats:
+            try:
+                return datetime.strptime(value, fmt).date().isoformat()
+            except ValueError:
+                continue
+        return None
+    return parse
+
+
+def _row_hash(row):
+    return hashlib.sha1(json.dumps(row, default=str).encode("utf-8")).hexdigest()
+
+
+# Local SQLite copy of an enquiry worksheet
+class SheetMirror:
+    """
+    Keeps the rows of one worksheet in a local SQLite table, indexed by Enquiry ID,
+    Property ID and Buyer Agent Number, so history queries never touch the sheet.
+    sync() only fetches the rows past the last mirrored row; every reconcile_every
+    syncs the whole sheet (for a ShardedWorksheet, its active shard) is read once and
+    rows whose checksum differs (edited or deleted in the sheet) are repaired.
+
+    row_values(1) and col_values(n) answer from the mirror, so readers written
+    against a worksheet (PropertyEnquiryIndex, get_last_enquiry_id) can use it as is.
+    col_values() syncs first, so it is never behind rows the write queue has flushed.
+    """
+
+    def __init__(self, sheet, name, headers, path=DEFAULT_MIRROR_PATH, sync_interval=60, reconcile_every=15):
+        self._sheet = sheet
+        self.name = name
+        self.headers = list(headers)
+        self._path = path
+        self._sync_interval = sync_interval
+        self._reconcile_every = reconcile_every
+        self._table = f"mirror_{name}"
+        self._sync_lock = threading.Lock()
+        self._syncs = 0
+        self._stop = threading.Event()
+        self._thread = None
+        # Bumped whenever existing rows are rewritten (reconcile, update_cells), so derived data knows to rebuild
+        self.generation = 0
+        self.last_synced = None
+        self.last_reconciled = None
+        self.last_error = None
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                " row_number INTEGER PRIMARY KEY,"
+                " enquiry_id TEXT,"
+                " property_id TEXT,"
+                " buyer_number TEXT,"
+                " row TEXT NOT NULL,"
+                " row_hash TEXT NOT NULL)"
+            )
+            for column in LOOKUP_COLUMNS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {self._table}_{column} ON {self._table} ({column})")
+        finally:
+            conn.close()
+
+    def _record(self, row_number, row):
+        row = (list(row) + [""] * len(self.headers))[:len(self.headers)]
+        values = {
+            column: _lookup_value(column, row[self.headers.index(header)]) if header in self.headers else ""
+            for column, header in LOOKUP_COLUMNS.items()
+        }
+        return (row_number, values["enquiry_id"], values["property_id"], values["buyer_number"],
+                json.dumps(row, default=str), _row_hash(row))
+
+    def _write(self, conn, records, removed=()):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(f"DELETE FROM {self._table} WHERE row_number = ?", removed)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self._table}"
+                " (row_number, enquiry_id, property_id, buyer_number, row, row_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _last_row(self, conn):
+        return conn.execute(f"SELECT COALESCE(MAX(row_number), 1) FROM {self._table}").fetchone()[0]
+
+    def _fetch_from(self, start):
+        try:
+            return self._sheet.get(f"A{start}:{column_letter(len(self.headers))}")
+        except Exception as e:
+            # Every row of the grid is already mirrored
+            if "exceeds grid limits" not in str(e):
+                raise
+            return []
+
+    def sync(self):
+        """Fetch rows appended since the last sync; returns how many were added."""
+        with self._sync_lock:
+            conn = self._connect()
+            try:
+                start = self._last_row(conn) + 1
+                with metrics.span("sheet.tail"):
+                    rows = self._fetch_from(start)
+                records = [self._record(start + offset, row) for offset, row in enumerate(rows) if any(row)]
+                if records:
+                    self._write(conn, records)
+            finally:
+                conn.close()
+            self.last_synced = time.time()
+            return len(records)
+
+    @metrics.timed("sheet_mirror.reconcile")
+    def reconcile(self):
+        """Compare every row's checksum with the sheet and repair differences; returns rows fixed."""
+        with self._sync_lock:
+            # A sharded sheet only needs its active shard checked; closed shards are frozen
+            start = getattr(self._sheet, "hot_start_row", 2)
+            rows = self._fetch_from(start)
+            conn = self._connect()
+            try:
+                stored = dict(conn.execute(
+                    f"SELECT row_number, row_hash FROM {self._table} WHERE row_number >= ?", (start,)
+                ))
+                records = [
+                    record for record in (self._record(n, row) for n, row in enumerate(rows, start=start) if any(row))
+                    if stored.get(record[0]) != record[5]
+                ]
+                # Rows cleared in the sheet, or past its end
+                removed = [(n,) for n in stored if n >= start + len(rows) or not any(rows[n - start])]
+                self._write(conn, records, removed)
+            finally:
+                conn.close()
+            if removed or any(record[0] in stored for record in records):
+                self.generation += 1
+            self.last_synced = self.last_reconciled = time.time()
+            return len(records) + len(removed)
+
+    def update_cells(self, changes):
+        """
+        Apply cells already written to the sheet: (row_number, enquiry_id, {header: value})
+        triples. Rows mirrored under a different Enquiry ID are skipped. Returns rows updated.
+        """
+        changes = {row_number: (enquiry_id, cells) for row_number, enquiry_id, cells in changes}
+        if not changes:
+            return 0
+        with self._sync_lock:
+            conn = self._connect()
+            try:
+                records = []
+                numbers = list(changes)
+                for start in range(0, len(numbers), 500):
+                    chunk = numbers[start:start + 500]
+                    cursor = conn.execute(
+                        f"SELECT row_number, enquiry_id, row FROM {self._table}"
+                        f" WHERE row_number IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                    for row_number, enquiry_id, row in cursor:
+                        expected, cells = changes[row_number]
+                        if enquiry_id != _lookup_value("enquiry_id", expected):
+                            continue
+                        row = json.loads(row)
+                        for header, value in cells.items():
+                            row[self.headers.index(header)] = value
+                        records.append(self._record(row_number, row))
+                if records:
+                    self._write(conn, records)
+            finally:
+                conn.close()
+            if records:
+                self.generation += 1
+            return len(records)
+
+    def _run(self):
+        while not self._stop.wait(self._sync_interval):
+            try:
+                self._syncs += 1
+                if self._reconcile_every and self._syncs % self._reconcile_every == 0:
+                    self.reconcile()
+                else:
+                    self.sync()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+
+    def start(self):
+        """Catch up with the sheet once and keep syncing in the background."""
+        self.sync()
+        if self._thread is None and self._sync_interval:
+            self._thread = threading.Thread(target=self._run, name=f"sheet-mirror-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    # Worksheet-style reads, answered locally
+    def row_values(self, row):
+        if row == 1:
+            return list(self.headers)
+        found = self._query("SELECT row FROM {table} WHERE row_number = ?", (row,))
+        return found[0] if found else []
+
+    def col_values(self, col):
+        self.sync()
+        index = col - 1
+        # SQLite picks the one cell out of each row, so no row JSON is decoded here
+        conn = self._connect()
+        try:
+            cells = conn.execute(
+                f"SELECT coalesce(json_extract(row, '$[{index}]'), '') FROM {self._table} ORDER BY row_number"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [self.headers[index] if index < len(self.headers) else ""] + [cell for (cell,) in cells]
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return [json.loads(row) for (row,) in conn.execute(sql.format(table=self._table), params)]
+        finally:
+            conn.close()
+
+    def _as_dicts(self, rows):
+        return [dict(zip(self.headers, row)) for row in rows]
+
+    def find(self, enquiry_id=None, property_id=None, buyer_number=None, limit=100):
+        """Enquiries matching every given field (case-insensitive), newest first."""
+        filters = {"enquiry_id": enquiry_id, "property_id": property_id, "buyer_number": buyer_number}
+        clauses = [(f"{column} = ?", _lookup_value(column, value)) for column, value in filters.items() if value]
+        where = " AND ".join(clause for clause, _ in clauses) or "1"
+        rows = self._query(
+            f"SELECT row FROM {{table}} WHERE {where} ORDER BY row_number DESC LIMIT ?",
+            tuple(value for _, value in clauses) + (limit,),
+        )
+        return self._as_dicts(rows)
+
+    def search(self, text, limit=100):
+        """Enquiries whose Enquiry ID, Property ID or Buyer Agent Number equals `text`, newest first."""
+        keys = [_lookup_value(column, text) for column in LOOKUP_COLUMNS]
+        rows = self._query(
+            "SELECT row FROM {table} WHERE enquiry_id = ? OR property_id = ? OR buyer_number = ?"
+            " ORDER BY row_number DESC LIMIT ?",
+            tuple(keys) + (limit,),
+        )
+        return self._as_dicts(rows)
+
+    def mirrored_enquiry_ids(self, enquiry_ids, up_to_row=None):
+        """The subset of `enquiry_ids` already mirrored (at or before `up_to_row`, if given)."""
+        keys = {_lookup_value("enquiry_id", enquiry_id): enquiry_id for enquiry_id in enquiry_ids if enquiry_id}
+        bound = "" if up_to_row is None else " AND row_number <= ?"
+        found = set()
+        conn = self._connect()
+        try:
+            batch = list(keys)
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(batch), 500):
+                chunk = batch[start:start + 500]
+                cursor = conn.execute(
+                    f"SELECT enquiry_id FROM {self._table}"
+                    f" WHERE enquiry_id IN ({', '.join('?' * len(chunk))}){bound}",
+                    tuple(chunk) + (() if up_to_row is None else (up_to_row,)),
+                )
+                found.update(keys[enquiry_id] for (enquiry_id,) in cursor)
+        finally:
+            conn.close()
+        return found
+
+    def rows_after(self, row_number=1):
+        """(row_number, row) pairs mirrored after `row_number`, oldest first."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"SELECT row_number, row FROM {self._table} WHERE row_number > ? ORDER BY row_number", (row_number,)
+            )
+            return [(number, json.loads(row)) for number, row in cursor]
+        finally:
+            conn.close()
+
+    def read_columns(self, headers, after=1):
+        """
+        Column-wise read for rebuilding aggregates: returns (row_numbers, {header: values}).
+        The cells are extracted by SQLite, so no row JSON is decoded in Python.
+        """
+        indexes = {header: self.headers.index(header) for header in headers if header in self.headers}
+        selects = "".join(f", json_extract(row, '$[{index}]')" for index in indexes.values())
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT row_number{selects} FROM {self._table} WHERE row_number > ? ORDER BY row_number", (after,)
+            ).fetchall()
+        finally:
+            conn.close()
+        columns = list(zip(*rows)) if rows else [()] * (len(indexes) + 1)
+        return list(columns[0]), {header: list(values) for header, values in zip(indexes, columns[1:])}
+
+    def scan(self, any_of=(), day=None, chunk_size=5000):
+        """
+        Mirrored rows matching every filter, oldest first, yielded as lists of up to
+        `chunk_size` rows. any_of holds (headers, values) pairs: a row matches when one of
+        the headers equals one of the values (case-insensitive). day is (header, formats,
+        first, last) with ISO dates, either end None. Filters run inside SQLite and every
+        chunk is its own query continuing from the last row number, so memory stays bounded.
+        """
+        clauses, params = [], []
+        for headers, values in any_of:
+            values = sorted({str(value).strip().lower() for value in values})
+            columns = [
+                f"lower(trim(json_extract(row, '$[{self.headers.index(header)}]'))) IN ({', '.join('?' * len(values))})"
+                for header in headers if header in self.headers
+            ]
+            if not columns or not values:
+                return
+            clauses.append(f"({' OR '.join(columns)})")
+            params.extend(values * len(columns))
+        if day is not None:
+            header, formats, first, last = day
+            clauses.append(f"row_day(json_extract(row, '$[{self.headers.index(header)}]')) BETWEEN ? AND ?")
+            params.extend([str(first or "0000-00-00"), str(last or "9999-99-99")])
+        where = "".join(f" AND {clause}" for clause in clauses)
+
+        conn = self._connect()
+        try:
+            if day is not None:
+                conn.create_function("row_day", 1, _day_parser(day[1]), deterministic=True)
+            last_row = 1
+            while True:
+                rows = conn.execute(
+                    f"SELECT row_number, row FROM {self._table} WHERE row_number > ?{where} ORDER BY row_number LIMIT ?",
+                    (last_row, *params, chunk_size),
+                ).fetchall()
+                if not rows:
+                    return
+                last_row = rows[-1][0]
+                yield [json.loads(row) for _, row in rows]
+        finally:
+            conn.close()
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+        finally:
+            conn.close()
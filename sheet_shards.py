@@ -0,0 +1,299 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import metrics
+from sheet_mirror import column_letter
+
+CATALOG_TITLE = "Shard Catalog"
+CATALOG_HEADERS = ["Worksheet", "Period", "Opened", "Closed", "Rows", "First Enquiry ID", "Last Enquiry ID"]
+
+# "monthly" starts a new worksheet every calendar month, "size" only when a shard is full,
+# "off" (the default) keeps writing to the original worksheet
+DEFAULT_POLICY = os.getenv("SHEET_SHARD_POLICY", "off")
+DEFAULT_MAX_ROWS = int(os.getenv("SHEET_SHARD_MAX_ROWS", "50000"))
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _get_or_empty(worksheet, range_name):
+    try:
+        return worksheet.get(range_name)
+    except Exception as e:
+        # Reading past the last row of the grid
+        if "exceeds grid limits" in str(e):
+            return []
+        raise
+
+
+def _already_exists(error):
+    # add_worksheet() with a title another process has just taken
+    return "already exists" in str(error)
+
+
+# Enquiry worksheet split into shards listed in a catalog worksheet
+class ShardedWorksheet:
+    """
+    Behaves like a single worksheet for the write queue and the sheet mirror while the
+    rows live in several worksheets ("Sheet1", "Sheet1 2025-02", ...) of one spreadsheet.
+    append_rows() writes to the active shard and rolls over to a new one when the month
+    changes (policy "monthly") or the shard reaches max_rows. The "Shard Catalog"
+    worksheet lists every shard with its period, row count and enquiry ID range; closed
+    shards are frozen, so their row counts in the catalog are exact.
+
+    get("A<n>:<col>") and batch_update() address the shards as one virtual sheet (row 1
+    is the header, data rows follow shard by shard), so incremental readers only touch
+    the active shard. Cells of closed shards may be rewritten; their row counts may not.
+    hot_start_row is the virtual row where the active shard starts.
+
+    Several processes may roll over at once: the one whose add_worksheet() loses the
+    race waits up to rollover_wait seconds for the winner's shard to reach the catalog.
+    append_rows() re-reads the catalog first (one read per batch), so it never appends to
+    a shard another process has closed since the last catalog_ttl refresh.
+    """
+
+    def __init__(self, spreadsheet, first_shard, headers, policy=DEFAULT_POLICY, max_rows=DEFAULT_MAX_ROWS,
+                 catalog_title=CATALOG_TITLE, catalog_ttl=60, rollover_wait=10):
+        self._spreadsheet = spreadsheet
+        self.base_title = first_shard.title
+        self.headers = list(headers)
+        self._policy = policy
+        self._max_rows = max_rows
+        self._catalog_title = catalog_title
+        self._catalog_ttl = catalog_ttl
+        self._rollover_wait = rollover_wait
+        self._last_col = column_letter(len(self.headers))
+        self._lock = threading.RLock()
+        self._worksheets = {first_shard.title: first_shard}
+        self._catalog = None
+        # One dict per catalog row, oldest first; the last one is the active shard
+        self._shards = []
+        self._active_rows = 0
+        self._catalog_read = 0
+        self._load_catalog(first_shard)
+
+    def _period(self):
+        return datetime.now().strftime("%Y-%m") if self._policy == "monthly" else ""
+
+    def _worksheet(self, title):
+        worksheet = self._worksheets.get(title)
+        if worksheet is None:
+            worksheet = self._worksheets[title] = self._spreadsheet.worksheet(title)
+        return worksheet
+
+    def _list_worksheets(self):
+        for worksheet in self._spreadsheet.worksheets():
+            self._worksheets.setdefault(worksheet.title, worksheet)
+
+    def _load_catalog(self, first_shard):
+        self._list_worksheets()
+        self._catalog = self._worksheets.get(self._catalog_title)
+        if self._catalog is None:
+            # First run: the existing worksheet becomes the first shard
+            try:
+                self._catalog = self._spreadsheet.add_worksheet(
+                    self._catalog_title, rows=100, cols=len(CATALOG_HEADERS)
+                )
+            except Exception as e:
+                if not _already_exists(e):
+                    raise
+                # Another process created the catalog first; wait for its first row below
+                self._list_worksheets()
+                self._catalog = self._worksheets[self._catalog_title]
+            else:
+                self._worksheets[self._catalog_title] = self._catalog
+                shard = [first_shard.title, self._period(), _now(), "", "", "", ""]
+                self._catalog.append_rows([CATALOG_HEADERS, shard])
+        deadline = time.time() + self._rollover_wait
+        while not self._read_catalog() and time.time() < deadline:
+            time.sleep(1)
+        if not self._shards:
+            raise RuntimeError(f"The {self._catalog_title!r} worksheet lists no shards")
+
+    def _read_catalog(self):
+        """Re-read the catalog; False if it has no shard rows yet."""
+        rows = self._catalog.get_all_values()[1:]
+        if not rows:
+            return False
+        shards = []
+        for number, row in enumerate(rows, start=2):
+            row = list(row) + [""] * (len(CATALOG_HEADERS) - len(row))
+            shard = dict(zip(CATALOG_HEADERS, row))
+            shard["catalog_row"] = number
+            shard["Rows"] = int(shard["Rows"]) if str(shard["Rows"]).strip() else None
+            shards.append(shard)
+        active_changed = not self._shards or self._shards[-1]["Worksheet"] != shards[-1]["Worksheet"]
+        self._shards = shards
+        self._catalog_read = time.time()
+        if active_changed:
+            self._active_rows = max(0, len(self._worksheet(self.title).col_values(1)) - 1)
+        return True
+
+    def _refresh_catalog(self):
+        if time.time() - self._catalog_read > self._catalog_ttl:
+            self._read_catalog()
+
+    @property
+    def title(self):
+        return self._shards[-1]["Worksheet"]
+
+    @property
+    def shards(self):
+        with self._lock:
+            self._refresh_catalog()
+            return [dict(shard) for shard in self._shards]
+
+    @property
+    def hot_start_row(self):
+        with self._lock:
+            self._refresh_catalog()
+            return 2 + sum(shard["Rows"] or 0 for shard in self._shards[:-1])
+
+    def row_values(self, row):
+        if row == 1:
+            return list(self.headers)
+        values = self.get(f"A{row}:{self._last_col}{row}")
+        return list(values[0]) if values else []
+
+    def _needs_rollover(self, incoming):
+        active = self._shards[-1]
+        if self._policy == "off":
+            return False
+        if self._policy == "monthly" and active["Period"] != self._period():
+            return True
+        return bool(self._max_rows) and self._active_rows > 0 and self._active_rows + incoming > self._max_rows
+
+    def _new_title(self):
+        stem = f"{self.base_title} {self._period()}".strip()
+        title, suffix = stem, 2
+        taken = set(self._worksheets) | {shard["Worksheet"] for shard in self._shards}
+        while title in taken or title == self.base_title:
+            title, suffix = f"{stem} #{suffix}", suffix + 1
+        return title
+
+    @metrics.timed("sheet_shards.rollover")
+    def _rollover(self, incoming):
+        # Callers have just re-read the catalog
+        active = self._shards[-1]
+        ids = [value for value in self._worksheet(active["Worksheet"]).col_values(1)[1:]]
+        closed = [_now(), len(ids), ids[0] if ids else "", ids[-1] if ids else ""]
+        self._catalog.batch_update([{
+            "range": f"D{active['catalog_row']}:G{active['catalog_row']}",
+            "values": [closed],
+        }])
+        title = self._new_title()
+        try:
+            worksheet = self._spreadsheet.add_worksheet(title, rows=1000, cols=len(self.headers))
+        except Exception as e:
+            if not _already_exists(e):
+                raise
+            # Lost the race to another process: continue from the shard it opened
+            self._await_rollover(active["Worksheet"], e)
+            if self._needs_rollover(incoming):
+                self._rollover(incoming)
+            return
+        worksheet.append_row(self.headers)
+        self._worksheets[title] = worksheet
+        self._catalog.append_rows([[title, self._period(), _now(), "", "", "", ""]])
+        self._read_catalog()
+
+    def _await_rollover(self, closing, error):
+        # Another process took the title; its shard is usable once it is in the catalog
+        deadline = time.time() + self._rollover_wait
+        while time.time() < deadline:
+            time.sleep(1)
+            self._read_catalog()
+            if self.title != closing:
+                return
+        # It never got there (the other process died?): the next attempt picks a fresh title
+        self._list_worksheets()
+        raise error
+
+    def append_rows(self, values, **kwargs):
+        with self._lock:
+            # Another process may have closed the shard we last saw as active, so don't trust the cached catalog
+            self._read_catalog()
+            if self._needs_rollover(len(values)):
+                self._rollover(len(values))
+            self._worksheet(self.title).append_rows(values, **kwargs)
+            self._active_rows += len(values)
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def _spans(self):
+        # (shard, first virtual row, last virtual row); the active shard is open ended (None)
+        with self._lock:
+            self._refresh_catalog()
+            shards = list(self._shards)
+        offset = 2
+        for position, shard in enumerate(shards):
+            if position == len(shards) - 1:
+                yield shard, offset, None
+                return
+            shard_end = offset + (shard["Rows"] or 0) - 1
+            yield shard, offset, shard_end
+            offset = shard_end + 1
+
+    def get(self, range_name):
+        """Rows of a virtual 'A<first>:<col>[<last>]' range across shards."""
+        start, _, end = range_name.partition(":")
+        first = int("".join(c for c in start if c.isdigit()) or 1)
+        end_digits = "".join(c for c in end if c.isdigit())
+        last = int(end_digits) if end_digits else None
+        columns = "".join(c for c in end if c.isalpha()) or self._last_col
+
+        rows = []
+        if first == 1:
+            rows.append(list(self.headers))
+            first = 2
+        for shard, offset, shard_end in self._spans():
+            low = max(first, offset)
+            high = last if shard_end is None else min(last or shard_end, shard_end)
+            if high is None or low <= high:
+                # Shard rows start at 2, under its own header
+                local_last = "" if high is None else high - offset + 2
+                rows.extend(_get_or_empty(
+                    self._worksheet(shard["Worksheet"]), f"A{low - offset + 2}:{columns}{local_last}"
+                ))
+        return rows
+
+    def batch_update(self, data, **kwargs):
+        """
+        batch_update() with virtual '<col><first>[:<col><last>]' ranges. Ranges that cross
+        a shard boundary are split, and each shard gets one batch_update call.
+        """
+        spans = list(self._spans())
+        per_shard = {}
+        for item in data:
+            start, _, end = item["range"].partition(":")
+            start_col = "".join(c for c in start if c.isalpha())
+            end_col = "".join(c for c in end if c.isalpha()) or start_col
+            first = int("".join(c for c in start if c.isdigit()))
+            if first < 2:
+                raise ValueError(f"Range {item['range']} overlaps the header row")
+            values = item["values"]
+            row, last = first, first + len(values) - 1
+            for shard, offset, shard_end in spans:
+                if row > last:
+                    break
+                if shard_end is not None and row > shard_end:
+                    continue
+                high = last if shard_end is None else min(last, shard_end)
+                per_shard.setdefault(shard["Worksheet"], []).append({
+                    "range": f"{start_col}{row - offset + 2}:{end_col}{high - offset + 2}",
+                    "values": values[row - first:high - first + 1],
+                })
+                row = high + 1
+        for title, items in per_shard.items():
+            self._worksheet(title).batch_update(items, **kwargs)
+
+
+def make_sharded_worksheet(worksheet, headers, policy=DEFAULT_POLICY):
+    """Wrap an enquiry worksheet in a ShardedWorksheet unless sharding is off."""
+    if policy == "off":
+        return worksheet
+    return ShardedWorksheet(worksheet.spreadsheet, worksheet, headers, policy=policy)
@@ -0,0 +1,302 @@
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# Google Sheets quotas are per minute, counted separately for reads and writes
+READS_PER_MINUTE = int(os.getenv("SHEETS_READS_PER_MINUTE", "60"))
+WRITES_PER_MINUTE = int(os.getenv("SHEETS_WRITES_PER_MINUTE", "60"))
+
+# Worksheet methods by the quota they count against; other attributes pass straight through
+READ_METHODS = {
+    "get", "get_values", "batch_get", "get_all_values", "get_all_records", "row_values", "col_values",
+    "acell", "cell", "findall", "find",
+}
+WRITE_METHODS = {
+    "append_row", "append_rows", "update", "update_cell", "update_acell", "batch_update", "batch_clear",
+    "clear", "insert_row", "insert_rows", "delete_rows", "resize", "add_rows",
+}
+# Writes that change a different range (or fail) when sent twice; a timeout can hide a write
+# Google already applied, so these are only retried when the server rejected them with a 429
+NON_IDEMPOTENT_WRITES = {"append_row", "append_rows", "insert_row", "insert_rows", "delete_rows", "add_rows"}
+
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    if code is None and getattr(error, "response", None) is not None:
+        code = error.response.status_code
+    return code
+
+
+# Sheets errors worth retrying: quota (429) and server side (5xx)
+def is_retryable(error, idempotent=True):
+    from gspread.exceptions import APIError
+
+    if isinstance(error, APIError):
+        code = _status_code(error)
+        if not idempotent:
+            return code == 429
+        return code == 429 or (code is not None and code >= 500)
+    # Network errors (timeouts, dropped connections) are retried as well, but only for
+    # calls that are safe to repeat: the request may have been applied before it failed
+    # (ConnectionError and TimeoutError are OSErrors too)
+    return idempotent and isinstance(error, OSError)
+
+
+def _identity(worksheet):
+    # Sale and rental are both the first tab (same sheet ID) of different spreadsheets
+    spreadsheet = getattr(worksheet, "spreadsheet", None)
+    if spreadsheet is None:
+        return id(worksheet)
+    return getattr(spreadsheet, "id", None) or id(spreadsheet), getattr(worksheet, "id", None) or worksheet.title
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# First come, first served token bucket
+class TokenBucket:
+    """
+    Holds up to `capacity` tokens, refilled at `rate` per second. Callers wait in
+    arrival order, so a busy page cannot starve another session's request, and
+    pause() stops everyone for a while after the API reports the quota exhausted.
+    """
+
+    def __init__(self, rate, capacity):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiting = deque()
+
+    def _refill(self, now):
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self, timeout=None):
+        """Take one token, waiting up to `timeout` seconds; returns the seconds waited."""
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiting[0] is ticket:
+                        if self._tokens >= 1 and now >= self._paused_until:
+                            self._tokens -= 1
+                            return now - started
+                        delay = max(self._paused_until - now, (1 - self._tokens) / self._rate)
+                    else:
+                        delay = None
+                    if timeout is not None:
+                        remaining = started + timeout - now
+                        if remaining <= 0:
+                            raise TimeoutError(f"Google Sheets quota exhausted; waited {timeout:g}s for a request slot")
+                        delay = remaining if delay is None else min(delay, remaining)
+                    self._cond.wait(delay)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+    def pause(self, seconds):
+        with self._cond:
+            self._tokens = 0.0
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @property
+    def waiting(self):
+        return len(self._waiting)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# One quota budget for every Sheets call made by this process
+class SheetsRateLimiter:
+    """
+    Every call takes a token from the read or write bucket (sized to the per-minute
+    quota) before it is sent. 429 and 5xx responses are retried with exponential
+    backoff and full jitter; a 429 also pauses the bucket, so other callers back off
+    instead of spending the retry budget. Calls given an `api` name are counted in
+    metrics as sheets.<api> once per request actually sent. Non-idempotent calls (appends, inserts,
+    deletes) are only retried on a 429, and are otherwise left to the caller's queue. Identical reads issued while one is in
+    flight wait for that request and share its result (treat it as read-only).
+    """
+
+    def __init__(self, reads_per_minute=READS_PER_MINUTE, writes_per_minute=WRITES_PER_MINUTE, burst=10,
+                 max_retries=5, base_delay=1.0, max_delay=64.0, wait_timeout=120):
+        self._buckets = {
+            "read": TokenBucket(reads_per_minute / 60.0, min(burst, reads_per_minute)),
+            "write": TokenBucket(writes_per_minute / 60.0, min(burst, writes_per_minute)),
+        }
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.calls = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.throttled = 0
+
+    def _send(self, kind, fn, args, kwargs, idempotent=True, api=None):
+        bucket = self._buckets[kind]
+        if api is not None:
+            metrics.count(f"sheets.{api}")
+        for attempt in itertools.count():
+            waited = bucket.acquire(self._wait_timeout)
+            if waited > 0.001:
+                self.throttled += 1
+                metrics.observe(f"sheets.{kind}_wait", waited)
+            with self._lock:
+                self.calls += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self._max_retries or not is_retryable(e, idempotent):
+                    raise
+                delay = _retry_after(e) or random.uniform(0, min(self._max_delay, self._base_delay * 2 ** attempt))
+                if _status_code(e) == 429:
+                    bucket.pause(max(delay, self._base_delay))
+                self.retries += 1
+                metrics.count("sheets.retries")
+                time.sleep(delay)
+
+    def call(self, kind, fn, *args, key=None, idempotent=True, api=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) against the 'read' or 'write' quota; reads with a `key`
+        are coalesced. Pass idempotent=False for writes that must not be repeated.
+        """
+        if key is None:
+            return self._send(kind, fn, args, kwargs, idempotent, api)
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+        if not leader:
+            self.coalesced += 1
+            metrics.count("sheets.coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._send(kind, fn, args, kwargs, api=api)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+    @property
+    def max_call_seconds(self):
+        """The longest one call can take before it raises: every attempt waits out the quota and every retry backs off fully."""
+        return (self._max_retries + 1) * self._wait_timeout + self._max_retries * self._max_delay
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "throttled": self.throttled,
+            "waiting": sum(bucket.waiting for bucket in self._buckets.values()),
+        }
+
+
+# Worksheet whose API calls go through a SheetsRateLimiter
+class RateLimitedWorksheet:
+    def __init__(self, worksheet, limiter, spreadsheet=None):
+        self._worksheet = worksheet
+        self._limiter = limiter
+        self._spreadsheet = spreadsheet
+        self._identity = _identity(worksheet)
+
+    @property
+    def spreadsheet(self):
+        if self._spreadsheet is None:
+            self._spreadsheet = RateLimitedSpreadsheet(self._worksheet.spreadsheet, self._limiter)
+        return self._spreadsheet
+
+    def __getattr__(self, name):
+        attr = getattr(self._worksheet, name)
+        kind = "read" if name in READ_METHODS else "write" if name in WRITE_METHODS else None
+        if kind is None or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            key = None
+            if kind == "read":
+                key = (self._identity, name, args, tuple(sorted(kwargs.items())))
+                try:
+                    hash(key)
+                except TypeError:
+                    key = None
+            idempotent = name not in NON_IDEMPOTENT_WRITES
+            return self._limiter.call(kind, attr, *args, key=key, idempotent=idempotent, api=name, **kwargs)
+        return call
+
+
+# Spreadsheet whose worksheets (and worksheet list calls) go through a SheetsRateLimiter
+class RateLimitedSpreadsheet:
+    def __init__(self, spreadsheet, limiter):
+        self._spreadsheet = spreadsheet
+        self._limiter = limiter
+
+    def _wrap(self, worksheet):
+        return RateLimitedWorksheet(worksheet, self._limiter, spreadsheet=self)
+
+    @property
+    def sheet1(self):
+        return self._wrap(self._limiter.call("read", lambda: self._spreadsheet.sheet1, api="sheet1"))
+
+    def worksheet(self, title):
+        return self._wrap(self._limiter.call("read", self._spreadsheet.worksheet, title, api="worksheet"))
+
+    def worksheets(self):
+        return [
+            self._wrap(worksheet)
+            for worksheet in self._limiter.call("read", self._spreadsheet.worksheets, api="worksheets")
+        ]
+
+    def add_worksheet(self, title, rows, cols, **kwargs):
+        return self._wrap(self._limiter.call(
+            "write", self._spreadsheet.add_worksheet, title, rows, cols, idempotent=False, api="add_worksheet",
+            **kwargs
+        ))
+
+    def __getattr__(self, name):
+        return getattr(self._spreadsheet, name)
+
+
+def describe_limiter_stats(stats):
+    """Short human readable summary of SheetsRateLimiter.stats() for the UI."""
+    parts = [f"{stats['calls']} calls"]
+    if stats["waiting"]:
+        parts.append(f"{stats['waiting']} waiting for quota")
+    if stats["coalesced"]:
+        parts.append(f"{stats['coalesced']} shared reads")
+    if stats["retries"]:
+        parts.append(f"{stats['retries']} retries")
+    return " · ".join(parts)
@@ -0,0 +1,169 @@
+import argparse
+import sys
+import time
+
+import clients
+import metrics
+from enquiry_core import RENTAL_HEADERS, SALE_HEADERS, format_status_date, format_timestamp
+from lookups import collect_batch_lookup, submit_batch_lookup
+from sheet_mirror import SheetMirror, column_letter
+from sheet_shards import make_sharded_worksheet
+
+# Sheet columns refreshed from the current inventory document, formatted as when the enquiry was written
+SALE_STATUS_COLUMNS = {
+    "Date of Status Last Checked for the Inventory Enquired": lambda doc: format_status_date(doc.get("dateOfStatusLastChecked")),
+    "Status": lambda doc: doc.get("status", "Unknown"),
+}
+RENTAL_STATUS_COLUMNS = {
+    "Date of Status Last Checked": lambda doc: format_timestamp(doc.get("dateOfStatusLastChecked")),
+}
+
+# kind -> (sheet headers, inventory collection, refreshed columns, enquiry worksheet)
+JOBS = {
+    "sale": (SALE_HEADERS, "ACN123", SALE_STATUS_COLUMNS, clients.get_sale_sheet),
+    "rental": (RENTAL_HEADERS, "acnRentalTemp", RENTAL_STATUS_COLUMNS, clients.get_rental_sheet),
+}
+
+# Ranges sent per batch_update call; every call is one request against the write quota
+RANGES_PER_CALL = 1000
+# Up to this many unchanged rows between two changed cells are rewritten with their
+# (identical) value instead of starting a new range
+MERGE_GAP = 5
+
+
+def _cell(row, index):
+    return str(row[index]) if index < len(row) else ""
+
+
+def plan_status_updates(rows, headers, columns, properties, start_row=2):
+    """
+    Compare the refreshed columns of sheet `rows` (starting at `start_row`) with the
+    inventory documents in `properties` (uppercase propertyId -> doc). Returns
+    (desired, changes): desired maps header -> {row_number: value} for every row whose
+    property was found, changes lists (row_number, enquiry_id, {header: value}) for the
+    rows with at least one stale cell.
+    """
+    id_index = headers.index("Enquiry ID")
+    property_index = headers.index("Property ID")
+    indexes = {header: headers.index(header) for header in columns}
+    desired = {header: {} for header in columns}
+    changes = []
+    for row_number, row in enumerate(rows, start=start_row):
+        doc = properties.get(_cell(row, property_index).strip().upper())
+        if doc is None:
+            continue
+        stale = {}
+        for header, value_for in columns.items():
+            value = str(value_for(doc))
+            desired[header][row_number] = value
+            if _cell(row, indexes[header]) != value:
+                stale[header] = value
+        if stale:
+            changes.append((row_number, _cell(row, id_index), stale))
+    return desired, changes
+
+
+def build_ranges(headers, desired, changes, merge_gap=MERGE_GAP):
+    """
+    batch_update data for `changes`: one single-column range per run of changed rows.
+    Runs separated by at most `merge_gap` rows are joined when every row in between has
+    a desired value, so scattered changes do not turn into one range per cell.
+    """
+    data = []
+    for header, values in desired.items():
+        letter = column_letter(headers.index(header) + 1)
+        rows = sorted(row_number for row_number, _, cells in changes if header in cells)
+        runs = []
+        for row_number in rows:
+            if runs and row_number - runs[-1][1] <= merge_gap + 1 and all(
+                gap in values for gap in range(runs[-1][1] + 1, row_number)
+            ):
+                runs[-1][1] = row_number
+            else:
+                runs.append([row_number, row_number])
+        for first, last in runs:
+            data.append({
+                "range": f"{letter}{first}:{letter}{last}",
+                "values": [[values[row_number]] for row_number in range(first, last + 1)],
+            })
+    return data
+
+
+@metrics.timed("status_refresh")
+def run_status_refresh(kind, db=None, sheet=None, mirror=None, dry_run=False):
+    """
+    Rewrite the status columns of every enquiry row in the `kind` sheet whose property's
+    status changed since it was written. The sheet is read once (one get per shard),
+    the referenced properties are fetched with chunked `in` queries, and only stale cells
+    are written, in batch_update calls of up to RANGES_PER_CALL ranges. Returns a report dict.
+    """
+    headers, collection, columns, open_sheet = JOBS[kind]
+    started = time.time()
+    db = db or clients.get_firestore()
+    if sheet is None:
+        sheet = make_sharded_worksheet(open_sheet(), headers)
+
+    with metrics.span("status_refresh.read_sheet"):
+        rows = sheet.get(f"A2:{column_letter(len(headers))}")
+    property_index = headers.index("Property ID")
+    property_ids = {_cell(row, property_index).strip().upper() for row in rows} - {""}
+
+    with metrics.span("status_refresh.read_inventory"):
+        futures = submit_batch_lookup(db.collection(collection), "propertyId", property_ids)
+        properties = collect_batch_lookup(futures, "propertyId", key=lambda value: str(value).strip().upper())
+
+    desired, changes = plan_status_updates(rows, headers, columns, properties)
+    data = build_ranges(headers, desired, changes)
+    report = {
+        "kind": kind,
+        "rows": len(rows),
+        "properties": len(property_ids),
+        "missing": len(property_ids - set(properties)),
+        "rows_changed": len(changes),
+        "cells_changed": sum(len(cells) for _, _, cells in changes),
+        "ranges": len(data),
+        "calls": 0,
+    }
+    if not dry_run:
+        with metrics.span("status_refresh.write"):
+            for start in range(0, len(data), RANGES_PER_CALL):
+                sheet.batch_update(data[start:start + RANGES_PER_CALL])
+                report["calls"] += 1
+        # Closed shards are not reconciled, so the mirror is patched directly
+        if mirror is None:
+            mirror = SheetMirror(sheet, kind, headers)
+        mirror.update_cells(changes)
+    report["seconds"] = round(time.time() - started, 1)
+    return report
+
+
+def describe_report(report):
+    return (
+        f"{report['kind']}: {report['rows_changed']} of {report['rows']} rows stale"
+        f" ({report['cells_changed']} cells, {report['properties']} properties, {report['missing']} not found);"
+        f" {report['ranges']} ranges in {report['calls']} batch_update calls, {report['seconds']}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the status columns of existing enquiry rows from the inventory")
+    parser.add_argument("kinds", nargs="*", choices=sorted(JOBS), default=sorted(JOBS))
+    parser.add_argument("--dry-run", action="store_true", help="Report stale cells without writing them")
+    parser.add_argument("--every", type=float, help="Keep running, refreshing every this many seconds")
+    args = parser.parse_args()
+
+    while True:
+        for kind in args.kinds:
+            try:
+                print(describe_report(run_status_refresh(kind, dry_run=args.dry_run)), file=sys.stderr)
+            except Exception as e:
+                print(f"{kind}: status refresh failed: {e}", file=sys.stderr)
+                if not args.every:
+                    raise
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
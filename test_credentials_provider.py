@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("google.auth")
+pytest.importorskip("cryptography")
+
+from google.auth.credentials import TokenState
+from google.auth.transport.requests import Request
+
+from credentials_provider import REFRESH_MARGIN, SHEETS_SCOPES, CachedTokenCredentials, TokenCache
+from fakes import FakeTokenServer, fake_service_account
+
+
+@pytest.fixture
+def token_server():
+    server = FakeTokenServer(expires_in=3600)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def account(token_server):
+    return fake_service_account(token_server.token_uri)
+
+
+def _refresh_all(creds):
+    request = Request()
+    threads = [threading.Thread(target=cred.refresh, args=(request,)) for cred in creds]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_shared_cache_exchanges_once(token_server, account, tmp_path):
+    cache = TokenCache(str(tmp_path / "tokens.json"))
+    first = CachedTokenCredentials(account, SHEETS_SCOPES, cache=cache)
+    second = CachedTokenCredentials(account, SHEETS_SCOPES, cache=cache)
+    assert first.token_state == TokenState.INVALID
+
+    _refresh_all([first, second])
+
+    assert token_server.requests == 1
+    assert first.token == second.token == "fake-token-1"
+    assert first.token_state == second.token_state == TokenState.FRESH
+    # A new process finds the token in the cache without an exchange
+    assert CachedTokenCredentials(account, SHEETS_SCOPES, cache=cache).token == "fake-token-1"
+    assert token_server.requests == 1
+
+
+def test_refreshes_once_inside_margin(token_server, account, tmp_path):
+    cache = TokenCache(str(tmp_path / "tokens.json"))
+    first = CachedTokenCredentials(account, SHEETS_SCOPES, cache=cache)
+    first.refresh(Request())
+    assert token_server.requests == 1
+
+    # The cached token is now inside the refresh margin, but still valid
+    cache.put(first._key, first.token, time.time() + REFRESH_MARGIN / 2)
+    first = CachedTokenCredentials(account, SHEETS_SCOPES, cache=cache)
+    second = CachedTokenCredentials(account, SHEETS_SCOPES, cache=cache)
+    assert first.token == second.token == "fake-token-1"
+    assert first.token_state == second.token_state == TokenState.STALE
+
+    _refresh_all([first, second])
+
+    assert token_server.requests == 2
+    assert first.token == second.token == "fake-token-2"
+    assert first.token_state == second.token_state == TokenState.FRESH
@@ -0,0 +1,66 @@
+from duplicate_index import DuplicateIndex
+from phone_numbers import canonical_phone
+
+HEADERS = ["Enquiry ID", "Property ID", "Buyer Agent Number"]
+BUYER = "+919876543210"
+
+
+def test_find_within_the_window():
+    index = DuplicateIndex(window=600)
+    index.record(BUYER, "P1", "EQA0101", at=1000)
+
+    assert index.find(BUYER, "P1", now=1000) == ("EQA0101", 1000)
+    assert index.find(BUYER, "P1", now=1600) == ("EQA0101", 1000)
+    assert index.find(BUYER, "P2", now=1000) is None
+    assert index.find("+919876543211", "P1", now=1000) is None
+    assert index.hits == 2
+
+
+def test_entries_expire_after_the_window():
+    index = DuplicateIndex(window=600)
+    index.record(BUYER, "P1", "EQA0101", at=1000)
+    index.record(BUYER, "P2", "EQA0102", at=1300)
+
+    assert index.find(BUYER, "P1", now=1601) is None
+    assert len(index) == 1
+    assert index.find(BUYER, "P2", now=1601) == ("EQA0102", 1300)
+    assert index.find(BUYER, "P2", now=1901) is None
+    assert len(index) == 0
+
+
+def test_record_again_restarts_the_window():
+    index = DuplicateIndex(window=600)
+    index.record(BUYER, "P1", "EQA0101", at=1000)
+    index.record(BUYER, "P2", "EQA0102", at=1200)
+    index.record(BUYER, "P1", "EQA0103", at=1500)
+
+    # P1 moved behind P2, so pruning P2 leaves the newer P1 entry alone
+    assert index.find(BUYER, "P2", now=1850) is None
+    assert index.find(BUYER, "P1", now=1850) == ("EQA0103", 1500)
+
+
+def test_window_zero_disables_the_check():
+    index = DuplicateIndex(window=0)
+    index.record(BUYER, "P1", "EQA0101", at=1000)
+
+    assert index.find(BUYER, "P1", now=1000) is None
+    assert len(index) == 0
+
+
+def test_rebuild_keeps_recent_rows_only():
+    index = DuplicateIndex(window=600)
+    index.record(BUYER, "P9", "EQA0099", at=1900)
+    rows = [
+        (["EQA0101", "P1", "9876543210"], 1000),
+        (["EQA0102", " p2 ", "+91 98765 43210"], 1500),
+        (["EQA0103", "P3"], 1600),
+        (["EQA0104", "P1", "098765 43210"], 1700),
+    ]
+
+    assert index.rebuild(rows, HEADERS, buyer_key=canonical_phone, now=2000) == 2
+
+    # Entries recorded before the rebuild are replaced, short rows are skipped
+    assert index.find(BUYER, "P9", now=2000) is None
+    assert index.find(BUYER, "P2", now=2000) == ("EQA0102", 1500)
+    assert index.find(BUYER, "P1", now=2000) == ("EQA0104", 1700)
+    assert index.find(BUYER, "P3", now=2000) is None
@@ -0,0 +1,146 @@
+import time
+
+import pytest
+
+pytest.importorskip("firebase_admin")
+
+from enquiry_store import CHECKPOINT_COLLECTION, LEASE_SECONDS, FirestoreWriteQueue
+from fakes import FakeFirestore, FakeWorksheet
+from sheet_mirror import SheetMirror
+from sheets_client import SheetsRateLimiter
+
+HEADERS = ["Enquiry ID", "Property ID", "Buyer Agent Number"]
+
+
+def _rows(first, count):
+    return [[f"EQA{number:04d}", f"P{number}", "+919876543210"] for number in range(first, first + count)]
+
+
+class CrashingWorksheet:
+    """Passes calls through to `sheet`; append_rows runs `before` first and can fail after writing."""
+
+    def __init__(self, sheet, before=None, crash_after=False):
+        self._sheet = sheet
+        self._before = before
+        self._crash_after = crash_after
+
+    def append_rows(self, values, **kwargs):
+        if self._before is not None:
+            self._before()
+        self._sheet.append_rows(values, **kwargs)
+        if self._crash_after:
+            raise RuntimeError("projector killed after the append")
+
+    def __getattr__(self, name):
+        return getattr(self._sheet, name)
+
+
+@pytest.fixture
+def db():
+    return FakeFirestore()
+
+
+@pytest.fixture
+def sheet():
+    return FakeWorksheet(headers=HEADERS)
+
+
+@pytest.fixture
+def mirror(sheet, tmp_path):
+    return SheetMirror(sheet, "sale", HEADERS, path=str(tmp_path / "mirror.db"), sync_interval=0)
+
+
+def _queue(db, sheet, mirror, **kwargs):
+    return FirestoreWriteQueue(db, sheet, "sale", HEADERS, mirror=mirror, **kwargs)
+
+
+def _checkpoint(db):
+    return db.collection(CHECKPOINT_COLLECTION).document("sale").get().to_dict()
+
+
+def test_projects_in_submission_order(db, sheet, mirror):
+    queue = _queue(db, sheet, mirror, max_batch=3)
+    queue.enqueue_many(_rows(1, 5))
+    assert queue.pending_count() == 5
+
+    assert queue.flush() == 3
+    assert queue.flush() == 2
+    assert queue.flush() == 0
+
+    assert sheet.get_all_values() == [HEADERS] + _rows(1, 5)
+    assert queue.pending_count() == 0
+    checkpoint = _checkpoint(db)
+    assert (checkpoint["projected"], checkpoint["lastEnquiryId"], checkpoint["pending"]) == (5, "EQA0005", [])
+
+
+def test_recovers_a_batch_that_landed_before_the_crash(db, sheet, mirror):
+    crashed = _queue(db, CrashingWorksheet(sheet, crash_after=True), mirror, lease_seconds=0.05)
+    crashed.enqueue_many(_rows(1, 3))
+    with pytest.raises(RuntimeError):
+        crashed.flush()
+    assert _checkpoint(db)["pending"] == ["EQA0001", "EQA0002", "EQA0003"]
+
+    time.sleep(0.1)
+    successor = _queue(db, sheet, mirror)
+    successor.enqueue_many(_rows(4, 1))
+    # The mirror shows the pending rows landed, so only the new one is sent
+    assert successor.flush() == 1
+    assert sheet.get_all_values() == [HEADERS] + _rows(1, 4)
+    assert successor.pending_count() == 0
+    assert _checkpoint(db)["projected"] == 4
+
+
+def test_resends_a_batch_that_never_landed(db, sheet, mirror):
+    def killed():
+        raise RuntimeError("projector killed before the append")
+
+    crashed = _queue(db, CrashingWorksheet(sheet, before=killed), mirror, lease_seconds=0.05)
+    crashed.enqueue_many(_rows(1, 3))
+    with pytest.raises(RuntimeError):
+        crashed.flush()
+
+    time.sleep(0.1)
+    successor = _queue(db, sheet, mirror)
+    assert successor.flush() == 3
+    assert sheet.get_all_values() == [HEADERS] + _rows(1, 3)
+    assert _checkpoint(db)["pending"] == []
+
+
+def test_a_projector_that_lost_its_lease_leaves_the_checkpoint_alone(db, sheet, mirror):
+    successor = _queue(db, sheet, mirror)
+
+    def lease_runs_out():
+        # The append waited longer than the lease, and another projector took over
+        time.sleep(0.1)
+        assert successor._acquire_lease() is not None
+
+    slow = _queue(db, CrashingWorksheet(sheet, before=lease_runs_out), mirror, lease_seconds=0.05)
+    slow.enqueue_many(_rows(1, 2))
+    assert slow.flush() == 2
+
+    checkpoint = _checkpoint(db)
+    assert checkpoint["owner"] == successor._owner
+    assert checkpoint["pending"] == ["EQA0001", "EQA0002"]
+    assert slow.pending_count() == 2
+
+    # The new holder settles the batch from the mirror instead of sending it again
+    assert successor.flush() == 0
+    assert sheet.get_all_values() == [HEADERS] + _rows(1, 2)
+    assert successor.pending_count() == 0
+    assert _checkpoint(db)["pending"] == []
+
+
+def test_stop_hands_the_lease_over(db, sheet, mirror):
+    first = _queue(db, sheet, mirror)
+    first.enqueue_many(_rows(1, 1))
+    first.flush()
+    first.stop()
+
+    second = _queue(db, sheet, mirror)
+    second.enqueue_many(_rows(2, 1))
+    assert second.flush() == 1
+    assert _checkpoint(db)["owner"] == second._owner
+
+
+def test_lease_outlasts_the_slowest_append():
+    assert LEASE_SECONDS > SheetsRateLimiter().max_call_seconds
@@ -0,0 +1,94 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from id_allocator import FileLockIdAllocator, FirestoreIdAllocator, parse_enquiry_id
+
+PREFIX = "EQA"
+SEED = "EQA0100"
+
+
+def _seed():
+    return SEED
+
+
+def _numbers(ids):
+    return sorted(parse_enquiry_id(PREFIX, enquiry_id) for enquiry_id in ids)
+
+
+def _assert_unique_and_contiguous(ids, expected):
+    assert len(set(ids)) == len(ids) == expected
+    assert _numbers(ids) == list(range(101, 101 + expected))
+
+
+def _run_threads(target, count):
+    results = [None] * count
+
+    def run(index):
+        results[index] = target()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [enquiry_id for ids in results for enquiry_id in ids]
+
+
+def _file_worker(path, count, queue):
+    allocator = FileLockIdAllocator(path, PREFIX, _seed)
+    queue.put([allocator.next_id() for _ in range(count)])
+
+
+def test_file_allocator_shared_between_threads(tmp_path):
+    allocator = FileLockIdAllocator(str(tmp_path / "sale.json"), PREFIX, _seed)
+    ids = _run_threads(lambda: [allocator.next_id() for _ in range(50)], 8)
+    _assert_unique_and_contiguous(ids, 400)
+
+
+def test_file_allocator_one_per_thread(tmp_path):
+    path = str(tmp_path / "sale.json")
+    ids = _run_threads(lambda: FileLockIdAllocator(path, PREFIX, _seed).reserve_ids(25), 8)
+    _assert_unique_and_contiguous(ids, 200)
+
+
+def test_file_allocator_across_processes(tmp_path):
+    path = str(tmp_path / "sale.json")
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    processes = [context.Process(target=_file_worker, args=(path, 40, queue)) for _ in range(6)]
+    for process in processes:
+        process.start()
+    ids = [enquiry_id for _ in processes for enquiry_id in queue.get(timeout=60)]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+    _assert_unique_and_contiguous(ids, 240)
+
+
+def test_file_allocator_blocks_cover_the_counter(tmp_path):
+    allocator = FileLockIdAllocator(str(tmp_path / "sale.json"), PREFIX, _seed, block_size=10)
+    # Every block is handed out in full, so blocks leave no gaps
+    ids = _run_threads(lambda: [allocator.next_id() for _ in range(10)], 8)
+    _assert_unique_and_contiguous(ids, 80)
+
+
+def test_firestore_allocator_across_threads():
+    pytest.importorskip("firebase_admin")
+    from fakes import FakeFirestore
+
+    db = FakeFirestore()
+    # One allocator per thread stands in for one per process; they only share the counter document
+    ids = _run_threads(lambda: [FirestoreIdAllocator(db, "sale", PREFIX, _seed).next_id() for _ in range(30)], 8)
+    _assert_unique_and_contiguous(ids, 240)
+    assert db.collection("counters").document("sale").get().to_dict()["last"] == 340
+
+
+def test_firestore_allocator_shared_between_threads():
+    pytest.importorskip("firebase_admin")
+    from fakes import FakeFirestore
+
+    allocator = FirestoreIdAllocator(FakeFirestore(), "sale", PREFIX, _seed, block_size=5)
+    ids = _run_threads(lambda: [allocator.next_id() for _ in range(25)], 8)
+    _assert_unique_and_contiguous(ids, 200)
@@ -0,0 +1,52 @@
+import pytest
+
+from phone_numbers import canonical_phone, canonicalize_many, phone_key, phone_variants
+
+CANONICAL = "+919876543210"
+
+
+@pytest.mark.parametrize("number", [
+    "9876543210",
+    9876543210,
+    " 98765 43210 ",
+    "98765-43210",
+    "(98765) 43210",
+    "09876543210",
+    "919876543210",
+    "+919876543210",
+    "+91 98765 43210",
+    "+91-98765-43210",
+    "0091 9876543210",
+])
+def test_indian_spellings_share_one_form(number):
+    assert canonical_phone(number) == CANONICAL
+
+
+@pytest.mark.parametrize("number, expected", [
+    # Ten national digits that happen to start with the country code
+    ("9198765432", "+919198765432"),
+    ("+1 415 555 0100", "+14155550100"),
+    ("0044 20 7946 0958", "+442079460958"),
+])
+def test_other_numbers(number, expected):
+    assert canonical_phone(number) == expected
+
+
+@pytest.mark.parametrize("number", [None, "", "   ", "12345", "98765432", "987654321012", "+91 98765", "not a number"])
+def test_invalid_numbers_have_no_canonical_form(number):
+    assert canonical_phone(number) is None
+
+
+def test_phone_key_falls_back_to_the_raw_value():
+    assert phone_key("098765 43210") == CANONICAL
+    assert phone_key(" ext. 12 ") == "ext. 12"
+
+
+def test_canonicalize_many_lines_up_with_its_input():
+    assert canonicalize_many(["9876543210", None, "12345", "+91 98765 43210"]) == [CANONICAL, None, None, CANONICAL]
+
+
+def test_phone_variants():
+    assert phone_variants("09876543210") == [CANONICAL, "919876543210", "9876543210", "09876543210", "+91 9876543210"]
+    assert phone_variants("+1 415 555 0100") == ["+14155550100"]
+    assert phone_variants(" 12345 ") == ["12345"]
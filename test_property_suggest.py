@@ -0,0 +1,73 @@
+import pytest
+
+from property_suggest import PropertySuggestIndex
+
+PROPERTIES = {
+    "d1": {"propertyId": "PA101", "propertyName": "Prestige Lakeside Habitat"},
+    "d2": {"propertyId": "PA102", "propertyName": "Brigade Lakefront"},
+    "d3": {"propertyId": "PB200", "propertyName": "Lake View Palms"},
+    "d4": {"propertyId": " pa110 ", "propertyName": "Sobha Dream Acres"},
+    "d5": {"propertyName": "No ID Towers"},
+}
+
+
+def _ids(suggestions):
+    return [suggestion["propertyId"] for suggestion in suggestions]
+
+
+@pytest.fixture
+def index():
+    index = PropertySuggestIndex("propertyName")
+    index.on_inventory_change("reset", None, None)
+    for doc_id, doc in PROPERTIES.items():
+        index.on_inventory_change("upsert", doc_id, doc)
+    index.on_inventory_change("loaded", None, None)
+    return index
+
+
+def test_nothing_is_suggested_until_loaded():
+    index = PropertySuggestIndex("propertyName")
+    index.on_inventory_change("reset", None, None)
+    index.on_inventory_change("upsert", "d1", PROPERTIES["d1"])
+    assert index.suggest("PA") == []
+    index.on_inventory_change("loaded", None, None)
+    assert index.suggest("PA") == [{"propertyId": "PA101", "name": "Prestige Lakeside Habitat"}]
+
+
+def test_property_id_prefixes(index):
+    assert _ids(index.suggest("pa1")) == ["PA101", "PA102", "pa110"]
+    assert _ids(index.suggest(" PB ")) == ["PB200"]
+    assert index.suggest("   ") == []
+    # Documents without a Property ID are not indexed
+    assert len(index) == 4
+
+
+def test_name_words_follow_id_matches(index):
+    assert _ids(index.suggest("pa")) == ["PA101", "PA102", "pa110", "PB200"]
+    assert _ids(index.suggest("pa", limit=2)) == ["PA101", "PA102"]
+
+
+def test_name_word_prefixes(index):
+    assert _ids(index.suggest("lake")) == ["PB200", "PA102", "PA101"]
+    assert _ids(index.suggest("Lake Pres")) == ["PA101"]
+    assert _ids(index.suggest("dream sob")) == ["pa110"]
+    assert index.suggest("towers") == []
+
+
+def test_exists_and_close_matches(index):
+    assert index.exists("pa101")
+    assert index.exists("PA110")
+    assert not index.exists("PA109")
+    assert index.close_matches("PA109") == ["PA101", "PA102"]
+    assert index.close_matches("ZZ1") == []
+
+
+def test_changes_after_loading(index):
+    index.on_inventory_change("upsert", "d1", {"propertyId": "PC300", "propertyName": "Prestige Park"})
+    index.on_inventory_change("remove", "d3", None)
+
+    assert not index.exists("PA101")
+    assert _ids(index.suggest("PC")) == ["PC300"]
+    assert _ids(index.suggest("lake")) == ["PA102"]
+    assert _ids(index.suggest("park")) == ["PC300"]
+    assert len(index) == 3
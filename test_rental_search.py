@@ -0,0 +1,77 @@
+import pytest
+
+from rental_search import RentalSearchIndex
+
+PROPERTIES = {
+    "d1": {"propertyId": "R1", "micromarket": "Whitefield", "configuration": "2BHK", "propertyType": "Apartment",
+           "rentPerMonthInLakhs": 0.5},
+    "d2": {"propertyId": "R2", "micromarket": "whitefield ", "configuration": "3BHK", "propertyType": "Villa",
+           "rentPerMonthInLakhs": "1.2"},
+    "d3": {"propertyId": "R3", "micromarket": "HSR Layout", "configuration": "2BHK", "propertyType": "Apartment",
+           "rentPerMonthInLakhs": 0.8},
+    "d4": {"propertyId": "R4", "micromarket": "Whitefield", "configuration": "2BHK", "propertyType": "Apartment",
+           "rentPerMonthInLakhs": "n/a"},
+    "d5": {"propertyId": "R5", "micromarket": "HSR Layout", "configuration": "3BHK", "propertyType": "Apartment",
+           "rentPerMonthInLakhs": 0.35},
+}
+
+
+def _ids(result):
+    total, rows = result
+    return total, [row["propertyId"] for row in rows]
+
+
+@pytest.fixture
+def index():
+    index = RentalSearchIndex(result_fields=["propertyId", "rentPerMonthInLakhs"])
+    index.on_inventory_change("reset", None, None)
+    for doc_id, doc in PROPERTIES.items():
+        index.on_inventory_change("upsert", doc_id, doc)
+    index.on_inventory_change("loaded", None, None)
+    return index
+
+
+def test_nothing_is_found_until_loaded():
+    index = RentalSearchIndex()
+    index.on_inventory_change("reset", None, None)
+    index.on_inventory_change("upsert", "d1", PROPERTIES["d1"])
+    assert index.search() == (0, [])
+    index.on_inventory_change("loaded", None, None)
+    assert _ids(index.search()) == (1, ["R1"])
+
+
+def test_everything_cheapest_first(index):
+    # Properties without a rent come last
+    assert _ids(index.search()) == (5, ["R5", "R1", "R3", "R2", "R4"])
+
+
+def test_one_filter_is_case_insensitive(index):
+    assert _ids(index.search(micromarket="WHITEFIELD")) == (3, ["R1", "R2", "R4"])
+    assert _ids(index.search(micromarket=["hsr layout", "Whitefield"], limit=2)) == (5, ["R5", "R1"])
+    assert _ids(index.search(micromarket="Koramangala")) == (0, [])
+
+
+def test_rent_bounds_are_inclusive_and_skip_missing_rents(index):
+    assert _ids(index.search(min_rent=0.5, max_rent=1.2)) == (3, ["R1", "R3", "R2"])
+    assert _ids(index.search(min_rent=0.8)) == (2, ["R3", "R2"])
+    assert _ids(index.search(micromarket="Whitefield", max_rent=1)) == (1, ["R1"])
+
+
+def test_several_filters_intersect(index):
+    assert _ids(index.search(micromarket="Whitefield", configuration="2BHK")) == (2, ["R1", "R4"])
+    assert _ids(index.search(configuration="3bhk", property_type=["Apartment", "Villa"])) == (2, ["R5", "R2"])
+    assert _ids(index.search(micromarket="HSR Layout", configuration="2BHK", max_rent=0.5)) == (0, [])
+    assert _ids(index.search(micromarket="Whitefield", configuration="2BHK", limit=1)) == (2, ["R1"])
+
+
+def test_changes_after_loading(index):
+    index.on_inventory_change("upsert", "d1", dict(PROPERTIES["d1"], micromarket="HSR Layout", rentPerMonthInLakhs=2))
+    index.on_inventory_change("remove", "d5", None)
+    index.on_inventory_change("upsert", "d6", {"propertyId": "R6", "micromarket": "Bellandur", "rentPerMonthInLakhs": 0.1})
+
+    assert _ids(index.search(micromarket="Whitefield")) == (2, ["R2", "R4"])
+    assert _ids(index.search(micromarket="HSR Layout")) == (2, ["R3", "R1"])
+    assert _ids(index.search(max_rent=0.5)) == (1, ["R6"])
+    assert index.options("micromarket") == ["Bellandur", "HSR Layout", "Whitefield"]
+    assert index.options("configuration") == ["2BHK", "3BHK"]
+    assert len(index) == 5
@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+import sheet_shards
+from fakes import FakeLatency, FakeSpreadsheet, FakeWorksheet
+from sheet_shards import CATALOG_TITLE, ShardedWorksheet
+
+HEADERS = ["Enquiry ID", "Name"]
+
+
+def _rows(first, count):
+    return [[f"EQA{number:04d}", f"name {number}"] for number in range(first, first + count)]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # sheet_shards reads the month through datetime.now(); tests move it forward by hand
+    class Clock(datetime):
+        current = datetime(2025, 1, 15, 12, 0, 0)
+
+        @classmethod
+        def now(cls, tz=None):
+            return cls.current
+
+    monkeypatch.setattr(sheet_shards, "datetime", Clock)
+    return Clock
+
+
+@pytest.fixture
+def spreadsheet():
+    spreadsheet = FakeSpreadsheet()
+    spreadsheet.attach(FakeWorksheet("Sheet1", headers=HEADERS)).load(_rows(1, 2))
+    return spreadsheet
+
+
+def test_size_rollover_and_virtual_rows(spreadsheet):
+    sheet = ShardedWorksheet(spreadsheet, spreadsheet.worksheet("Sheet1"), HEADERS, policy="size", max_rows=3)
+    sheet.append_rows(_rows(3, 1))
+    sheet.append_rows(_rows(4, 2))
+    sheet.append_rows(_rows(6, 2))
+
+    shards = sheet.shards
+    assert [shard["Worksheet"] for shard in shards] == ["Sheet1", "Sheet1 #2", "Sheet1 #3"]
+    assert [shard["Rows"] for shard in shards] == [3, 2, None]
+    assert (shards[0]["First Enquiry ID"], shards[0]["Last Enquiry ID"]) == ("EQA0001", "EQA0003")
+    assert spreadsheet.worksheet("Sheet1 #2").get_all_values() == [HEADERS] + _rows(4, 2)
+
+    # Row 1 is the header, then shard after shard
+    assert sheet.get("A1:B") == [HEADERS] + _rows(1, 7)
+    assert sheet.get("A3:B6") == _rows(2, 4)
+    assert sheet.get("A7:B") == _rows(6, 2)
+    assert sheet.row_values(5) == _rows(4, 1)[0]
+    assert sheet.hot_start_row == 7
+
+    # A range across a shard boundary is split into one batch_update per shard
+    sheet.batch_update([{"range": "B4:B5", "values": [["renamed 3"], ["renamed 4"]]}])
+    assert spreadsheet.worksheet("Sheet1").get("B4:B4") == [["renamed 3"]]
+    assert spreadsheet.worksheet("Sheet1 #2").get("B2:B2") == [["renamed 4"]]
+    with pytest.raises(ValueError):
+        sheet.batch_update([{"range": "B1:B2", "values": [["x"], ["y"]]}])
+
+
+def test_append_follows_a_rollover_made_elsewhere(spreadsheet):
+    first = ShardedWorksheet(spreadsheet, spreadsheet.worksheet("Sheet1"), HEADERS, policy="size", max_rows=3)
+    second = ShardedWorksheet(spreadsheet, spreadsheet.worksheet("Sheet1"), HEADERS, policy="size", max_rows=3)
+
+    first.append_rows(_rows(3, 2))
+    # `second` still has the old catalog cached, where Sheet1 has room for one more row
+    second.append_rows(_rows(5, 1))
+
+    assert spreadsheet.worksheet("Sheet1").get_all_values() == [HEADERS] + _rows(1, 2)
+    assert spreadsheet.worksheet("Sheet1 #2").get_all_values() == [HEADERS] + _rows(3, 3)
+    assert [shard["Rows"] for shard in second.shards] == [2, None]
+
+
+def test_concurrent_rollover_opens_one_shard(clock):
+    # Slow calls make the processes' rollovers overlap, so most lose the add_worksheet race
+    spreadsheet = FakeSpreadsheet(latency=FakeLatency(per_call=0.01))
+    spreadsheet.attach(FakeWorksheet("Sheet1", headers=HEADERS, latency=spreadsheet.latency)).load(_rows(1, 2))
+    # One wrapper per process, all sharing the spreadsheet and its catalog
+    sheets = [
+        ShardedWorksheet(spreadsheet, spreadsheet.worksheet("Sheet1"), HEADERS, policy="monthly", rollover_wait=5)
+        for _ in range(4)
+    ]
+    clock.current = datetime(2025, 2, 1, 9, 0, 0)
+    errors = []
+
+    def append(sheet, first):
+        try:
+            sheet.append_rows(_rows(first, 5))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=append, args=(sheet, 3 + 5 * n)) for n, sheet in enumerate(sheets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    catalog = spreadsheet.worksheet(CATALOG_TITLE).get_all_values()
+    assert [row[0] for row in catalog[1:]] == ["Sheet1", "Sheet1 2025-02"]
+    assert catalog[1][4] == 2
+    february = spreadsheet.worksheet("Sheet1 2025-02").get_all_values()
+    assert february[0] == HEADERS
+    assert sorted(february[1:]) == _rows(3, 20)
+    assert spreadsheet.worksheet("Sheet1").get_all_values() == [HEADERS] + _rows(1, 2)
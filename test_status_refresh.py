@@ -0,0 +1,75 @@
+from status_refresh import build_ranges, plan_status_updates
+
+HEADERS = ["Enquiry ID", "Property ID", "Status", "Checked"]
+COLUMNS = {
+    "Status": lambda doc: doc.get("status", "Unknown"),
+    "Checked": lambda doc: doc.get("checked", ""),
+}
+
+
+def _plan(statuses, properties=None):
+    """Rows whose Status cells read `statuses`, against properties that are all 'Sold'."""
+    rows = [[f"EQA{n:04d}", f"p{n}", status, "2025-01-01"] for n, status in enumerate(statuses)]
+    if properties is None:
+        properties = {f"P{n}": {"status": "Sold", "checked": "2025-01-01"} for n in range(len(statuses))}
+    return plan_status_updates(rows, HEADERS, COLUMNS, properties)
+
+
+def test_plan_lists_only_stale_cells():
+    rows = [
+        ["EQA0001", "p1", "Available", "2025-01-01"],
+        ["EQA0002", " P2 ", "Sold", "2025-01-01"],
+        ["EQA0003", "P3", "Sold"],
+        ["EQA0004", "P404", "Available", "2025-01-01"],
+    ]
+    properties = {
+        "P1": {"status": "Sold", "checked": "2025-01-01"},
+        "P2": {"status": "Sold", "checked": "2025-01-01"},
+        "P3": {"checked": "2025-02-01"},
+    }
+
+    desired, changes = plan_status_updates(rows, HEADERS, COLUMNS, properties, start_row=10)
+
+    # Row 13's property is gone, so it is neither desired nor changed
+    assert desired == {
+        "Status": {10: "Sold", 11: "Sold", 12: "Unknown"},
+        "Checked": {10: "2025-01-01", 11: "2025-01-01", 12: "2025-02-01"},
+    }
+    assert changes == [
+        (10, "EQA0001", {"Status": "Sold"}),
+        (12, "EQA0003", {"Status": "Unknown", "Checked": "2025-02-01"}),
+    ]
+
+
+def test_adjacent_changes_share_one_range():
+    desired, changes = _plan(["Available", "Available", "Available"])
+    assert build_ranges(HEADERS, desired, changes) == [
+        {"range": "C2:C4", "values": [["Sold"], ["Sold"], ["Sold"]]},
+    ]
+
+
+def test_small_gaps_are_rewritten_with_their_current_value():
+    # Changes at rows 2 and 5 with two unchanged rows between them
+    desired, changes = _plan(["Available", "Sold", "Sold", "Available"])
+    assert build_ranges(HEADERS, desired, changes, merge_gap=2) == [
+        {"range": "C2:C5", "values": [["Sold"], ["Sold"], ["Sold"], ["Sold"]]},
+    ]
+
+
+def test_wide_gaps_start_a_new_range():
+    desired, changes = _plan(["Available", "Sold", "Sold", "Sold", "Available"])
+    assert build_ranges(HEADERS, desired, changes, merge_gap=2) == [
+        {"range": "C2:C2", "values": [["Sold"]]},
+        {"range": "C6:C6", "values": [["Sold"]]},
+    ]
+
+
+def test_gap_rows_without_a_property_are_not_overwritten():
+    properties = {"P0": {"status": "Sold"}, "P2": {"status": "Sold"}}
+    desired, changes = _plan(["Available", "Custom note", "Available"], properties)
+    assert build_ranges(HEADERS, desired, changes) == [
+        {"range": "C2:C2", "values": [["Sold"]]},
+        {"range": "C4:C4", "values": [["Sold"]]},
+        {"range": "D2:D2", "values": [[""]]},
+        {"range": "D4:D4", "values": [[""]]},
+    ]
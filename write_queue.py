@@ -0,0 +1,279 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+from sheets_client import is_retryable
+
+DEFAULT_QUEUE_PATH = os.getenv("WRITE_QUEUE_PATH", "enquiry-write-queue.sqlite3")
+
+
+# Background loop shared by the write queues: flush() every interval, backing off after failures
+class FlushLoop:
+    def __init__(self, thread_name, flush_interval=2.0, max_batch=500, max_backoff=300, max_idle_interval=None):
+        self._thread_name = thread_name
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._max_backoff = max_backoff
+        self._max_idle_interval = max(flush_interval, max_idle_interval or flush_interval)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self.last_flush = None
+        self.last_flush_count = 0
+        self.last_error = None
+        self.next_retry = None
+
+    def flush(self):
+        raise NotImplementedError
+
+    def pending_count(self):
+        raise NotImplementedError
+
+    def _backoff(self):
+        delay = min(self._max_backoff, self._flush_interval * (2 ** self._failures))
+        return delay * random.uniform(0.5, 1.0)
+
+    def wake(self):
+        """Cut an idle wait short: flush one normal interval from now."""
+        self._wake.set()
+
+    def _run(self):
+        interval = self._flush_interval
+        # Rows enqueued during the interval are coalesced into the next append_rows call
+        while True:
+            if self._wake.wait(interval):
+                self._wake.clear()
+                # Woken by new rows: give the rest of the batch one normal interval to arrive
+                self._stop.wait(self._flush_interval)
+            if self._stop.is_set():
+                break
+            if self.next_retry and time.time() < self.next_retry:
+                continue
+            try:
+                # Keep going while full batches come back, so a backlog drains quickly
+                flushed = count = self.flush()
+                while count >= self._max_batch:
+                    count = self.flush()
+                    flushed += count
+                # Nothing to do: poll less often, up to max_idle_interval, until wake() or more work
+                interval = self._flush_interval if flushed else min(self._max_idle_interval, interval * 2)
+                self._failures = 0
+                self.last_error = None
+                self.next_retry = None
+            except Exception as e:
+                interval = self._flush_interval
+                self._failures += 1
+                kind = "retrying" if is_retryable(e) else "will retry, needs attention"
+                self.last_error = f"{e} ({kind})"
+                self.next_retry = time.time() + self._backoff()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self._thread_name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, drain=True):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        if drain:
+            while self.flush():
+                pass
+
+    def status(self):
+        return {
+            "pending": self.pending_count(),
+            "last_flush": self.last_flush,
+            "last_flush_count": self.last_flush_count,
+            "last_error": self.last_error,
+            "next_retry": self.next_retry,
+        }
+
+
+# Durable write-behind queue in front of a worksheet
+class SheetWriteQueue(FlushLoop):
+    """
+    Rows are committed to a local SQLite file before the caller returns, and a
+    background flusher sends everything pending to the sheet with one append_rows
+    call per flush interval. Failed flushes keep the rows and retry with
+    exponential backoff. Rows are claimed with a lease before being sent, so several
+    processes can share one queue file without writing a row twice; a crash between
+    the append and the delete can still replay a batch (at-least-once delivery).
+
+    Each row is also kept with its submission time for `recent_seconds` after it is
+    enqueued, written or not, so recent_rows() can answer without the sheet.
+    """
+
+    def __init__(self, sheet, queue_name, path=DEFAULT_QUEUE_PATH, flush_interval=2.0,
+                 max_batch=500, lease_seconds=120, max_backoff=300, recent_seconds=86400):
+        super().__init__(f"sheet-writer-{queue_name}", flush_interval, max_batch, max_backoff)
+        self._sheet = sheet
+        self.queue_name = queue_name
+        self._path = path
+        self._lease_seconds = lease_seconds
+        self._recent_seconds = recent_seconds
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_rows ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " queue TEXT NOT NULL,"
+                " row TEXT NOT NULL,"
+                " enqueued_at REAL NOT NULL,"
+                " claim TEXT,"
+                " claimed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS pending_rows_queue ON pending_rows (queue, id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS recent_rows ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " queue TEXT NOT NULL,"
+                " row TEXT NOT NULL,"
+                " enqueued_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS recent_rows_queue ON recent_rows (queue, enqueued_at)")
+        finally:
+            conn.close()
+
+    def enqueue(self, row):
+        return self.enqueue_many([row])[0]
+
+    def enqueue_many(self, rows):
+        """Durably store rows for the sheet and return their queue IDs."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            encoded = [json.dumps(list(row), default=str) for row in rows]
+            ids = [
+                conn.execute(
+                    "INSERT INTO pending_rows (queue, row, enqueued_at) VALUES (?, ?, ?)",
+                    (self.queue_name, row, now),
+                ).lastrowid
+                for row in encoded
+            ]
+            conn.executemany(
+                "INSERT INTO recent_rows (queue, row, enqueued_at) VALUES (?, ?, ?)",
+                [(self.queue_name, row, now) for row in encoded],
+            )
+            conn.execute(
+                "DELETE FROM recent_rows WHERE queue = ? AND enqueued_at < ?",
+                (self.queue_name, now - self._recent_seconds),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return ids
+
+    def pending_rows(self):
+        """Rows enqueued but not yet confirmed written to the sheet."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "SELECT row FROM pending_rows WHERE queue = ? ORDER BY id", (self.queue_name,)
+            )
+            return [json.loads(row) for (row,) in cursor]
+        finally:
+            conn.close()
+
+    def recent_rows(self, since):
+        """(row, enqueued_at) for rows enqueued at or after `since` (epoch seconds), oldest first."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "SELECT row, enqueued_at FROM recent_rows WHERE queue = ? AND enqueued_at >= ? ORDER BY id",
+                (self.queue_name, since),
+            )
+            return [(json.loads(row), enqueued_at) for row, enqueued_at in cursor]
+        finally:
+            conn.close()
+
+    def pending_count(self):
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM pending_rows WHERE queue = ?", (self.queue_name,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    def _claim_batch(self):
+        token = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE pending_rows SET claim = ?, claimed_at = ? WHERE id IN ("
+                " SELECT id FROM pending_rows WHERE queue = ?"
+                " AND (claim IS NULL OR claimed_at < ?) ORDER BY id LIMIT ?)",
+                (token, now, self.queue_name, now - self._lease_seconds, self._max_batch),
+            )
+            rows = conn.execute(
+                "SELECT row FROM pending_rows WHERE claim = ? ORDER BY id", (token,)
+            ).fetchall()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return token, [json.loads(row) for (row,) in rows]
+
+    def _finish_batch(self, token, written):
+        conn = self._connect()
+        try:
+            if written:
+                conn.execute("DELETE FROM pending_rows WHERE claim = ?", (token,))
+            else:
+                conn.execute(
+                    "UPDATE pending_rows SET claim = NULL, claimed_at = NULL WHERE claim = ?", (token,)
+                )
+        finally:
+            conn.close()
+
+    def flush(self):
+        """Send one batch of pending rows with a single append_rows call."""
+        token, rows = self._claim_batch()
+        if not rows:
+            return 0
+        try:
+            with metrics.span("sheet.append_rows"):
+                self._sheet.append_rows(rows)
+        except Exception:
+            self._finish_batch(token, written=False)
+            raise
+        self._finish_batch(token, written=True)
+        self.last_flush = time.time()
+        self.last_flush_count = len(rows)
+        return len(rows)
+
+
+def describe_status(status):
+    """Short human readable summary of a queue status for the UI."""
+    parts = [f"{status['pending']} row(s) waiting to be written"]
+    if status["last_flush"]:
+        parts.append(f"last write {time.strftime('%H:%M:%S', time.localtime(status['last_flush']))}")
+    if status["last_error"]:
+        parts.append(f"last error: {status['last_error']}")
+    return " · ".join(parts)